@@ -31,27 +31,35 @@
 # interpreted as representing official policies, either expressed
 # or implied, of GRNET S.A.command
 
+import imp
 import logging
 from sys import argv, exit, stdout, stderr
 import os
 from os.path import basename, exists
 from inspect import getargspec
+from threading import Lock
+from json import load, loads, dump, dumps
+from tempfile import mkstemp
 
 from kamaki.cli.argument import (
     ArgumentParseManager, ConfigArgument, ValueArgument, FlagArgument,
     RuntimeConfigArgument, VersionArgument, Argument)
 from kamaki.cli.history import History
+from kamaki.cli.cmdtree import CommandTree
 from kamaki.cli.utils import (
     print_dict, magenta, red, yellow, suggest_missing, remove_colors, pref_enc)
 from kamaki.cli.errors import CLIError, CLICmdSpecError
 from kamaki.cli import logger
 from kamaki.clients.astakos import CachedAstakosClient
+from kamaki.clients.astakos.cache import AuthCache
 from kamaki.clients import ClientError, KamakiSSLError, DEBUGV
 from kamaki.clients.utils import https, escape_ctrl_chars
 
 
 _debug = False
 kloger = None
+#  Authenticated identity clients, kept across commands if not None
+_authenticators = None
 DEF_CLOUD_ENV = 'KAMAKI_DEFAULT_CLOUD'
 
 #  command auxiliary methods
@@ -189,6 +197,45 @@ def _setup_logging(debug=False, verbose=False, _verbose_with_data=False):
     kloger = logger.get_logger(__name__)
 
 
+def _setup_stats():
+    """collect request metrics and print a summary on exit"""
+    from atexit import register
+    from kamaki import clients
+    from kamaki.clients.utils.metrics import MetricsCollector
+    collector = MetricsCollector()
+    clients.Client.TRACER = collector
+    register(_print_stats, collector)
+
+
+def _print_stats(collector, out=stderr):
+    from kamaki.cli.utils import format_size
+
+    def bound(seconds):
+        return ('> %ss' % collector.BUCKETS[-1]) if (
+            seconds is None) else ('<= %ss' % seconds)
+
+    summary = collector.summary()
+    if summary:
+        out.write('\nRequest statistics:\n')
+    for m in summary:
+        out.write('%s %s: %s requests, %s errors, %s retries\n' % (
+            m['method'], m['endpoint'],
+            m['requests'], m['errors'], m['retries']))
+        out.write('  sent %s, received %s\n' % (
+            format_size(m['sent']), format_size(m['received'])))
+        out.write('  %s\n' % ', '.join([
+            '%s %.3fs' % (phase, m['phases'][phase]) for phase in (
+                'connect', 'tls', 'send', 'wait', 'receive')]))
+        out.write('  latency p50 %s, p90 %s, p99 %s\n' % (
+            bound(m['p50']), bound(m['p90']), bound(m['p99'])))
+    for host, pool in sorted(https.pool_stats().items()):
+        if pool['hits'] or pool['misses']:
+            out.write(
+                'Connections to %s: %s reused, %s new, %s evicted\n' % (
+                    host, pool['hits'], pool['misses'], pool['evictions']))
+    out.flush()
+
+
 def _check_config_version(cnf):
     guess = cnf.guess_version()
     if exists(cnf.path) and guess < 0.12:
@@ -235,6 +282,9 @@ def _init_session(arguments, is_non_api=False):
     if _help or is_non_api:
         return None
 
+    if arguments['stats'].value:
+        _setup_stats()
+
     #  Patch https for SSL Authentication
     ca_file = arguments['ca_file'].value or _cnf.get('global', 'ca_certs')
     ignore_ssl = arguments['ignore_ssl'].value or (
@@ -311,18 +361,36 @@ def _init_session(arguments, is_non_api=False):
     return cloud
 
 
+def _auth_cache(cnf):
+    """:returns: (AuthCache) as set in global.auth_cache[_ttl], or None"""
+    path = cnf.get('global', 'auth_cache')
+    if not path:
+        return None
+    try:
+        ttl = int(cnf.get('global', 'auth_cache_ttl') or 0)
+    except ValueError:
+        kloger.warning('Invalid auth_cache_ttl, authentication not cached')
+        return None
+    return AuthCache(path, ttl) if ttl > 0 else None
+
+
 def init_cached_authenticator(config_argument, cloud, logger):
     try:
         _cnf = config_argument.value
         url = _cnf.get_cloud(cloud, 'url')
         tokens = _cnf.get_cloud(cloud, 'token').split()
+        if _authenticators is not None:
+            astakos = _authenticators.get((url, tuple(tokens)))
+            if astakos:
+                return astakos, []
         astakos, failed, help_message = None, [], []
         for token in tokens:
             try:
                 if astakos:
                     astakos.authenticate(token)
                 else:
-                    tmp_base = CachedAstakosClient(url, token)
+                    tmp_base = CachedAstakosClient(
+                        url, token, auth_cache=_auth_cache(_cnf))
                     from kamaki.cli.cmds import CommandInit
                     fake_cmd = CommandInit(dict(config=config_argument))
                     fake_cmd.client = astakos
@@ -357,6 +425,8 @@ def init_cached_authenticator(config_argument, cloud, logger):
                 _cnf.set_cloud(cloud, 'token', ' '.join(tokens))
                 _cnf.write()
         if tokens:
+            if _authenticators is not None:
+                _authenticators[(url, tuple(tokens))] = astakos
             return astakos, help_message
         logger.warning('cloud.%s.token is now empty' % cloud)
         help_message = [
@@ -367,6 +437,73 @@ def init_cached_authenticator(config_argument, cloud, logger):
     return None, help_message
 
 
+class LazyAuthenticator(object):
+    """A proxy to the identity client of a cloud, which is created and
+    authenticated with init_cached_authenticator on first use. Commands
+    that get all their service URLs and tokens from the configuration
+    never contact the identity service.
+    """
+
+    def __init__(self, config_argument, cloud, logger):
+        self._init_args = (config_argument, cloud, logger)
+        self._astakos, self._help_message = None, None
+        self._lock = Lock()
+
+    def _resolve(self):
+        with self._lock:
+            if self._help_message is None:
+                self._astakos, self._help_message = init_cached_authenticator(
+                    *self._init_args)
+        if self._astakos is None:
+            raise CLIError(
+                'Failed to initialize an identity client',
+                importance=3, details=self._help_message)
+        return self._astakos
+
+    def _cached_user_info(self, token=None):
+        """:returns: (dict) the user info of a token (default: the first
+            token of the cloud), if it is in the on-disk authentication
+            cache, or None"""
+        config_argument, cloud, logger = self._init_args
+        _cnf = config_argument.value
+        try:
+            url = _cnf.get_cloud(cloud, 'url')
+            token = token or _cnf.get_cloud(cloud, 'token').split()[0]
+        except (KeyError, IndexError, AttributeError):
+            return None
+        auth_cache = _auth_cache(_cnf)
+        r = auth_cache.get(url, token) if auth_cache else None
+        if r is None:
+            return None
+        user_info = dict(r['access']['user'])
+        user_info['default_project'] = r['access']['token']['tenant']['id']
+        return user_info
+
+    def user_term(self, key, token=None):
+        """Get a user term (e.g., id), from the on-disk authentication cache
+        if possible, without initializing an identity client"""
+        if self._astakos is None:
+            user_info = self._cached_user_info(token)
+            if user_info is not None:
+                return user_info.get(key, None)
+        return self._resolve().user_term(key, token)
+
+    def invalidate(self, token=None):
+        """Invalidate cached authentication, if authenticated at all. The
+        identity client is also dropped from _authenticators (kept by the
+        daemon), so that the next command authenticates again"""
+        if self._astakos is not None:
+            self._astakos.invalidate(token)
+            for key, astakos in (_authenticators or {}).items():
+                if astakos is self._astakos:
+                    _authenticators.pop(key)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+
 def _load_spec_module(spec, arguments, module):
     global kloger
     if not spec:
@@ -390,44 +527,134 @@ def _load_spec_module(spec, arguments, module):
     return pkg
 
 
+def _spec_source(spec):
+    """Locate the source of a spec module like _load_spec_module, without
+    importing it
+
+    :returns: (list) [path, modification time] or None if not found
+    """
+    for location in cmd_spec_locations:
+        name = spec if location == '' else '%s.%s' % (location, spec)
+        search_path = None
+        try:
+            for part in name.split('.'):
+                f, path, description = imp.find_module(part, search_path)
+                if f:
+                    f.close()
+                search_path = [path]
+        except ImportError:
+            continue
+        if os.path.isdir(path):
+            path = os.path.join(path, '__init__.py')
+        try:
+            return [path, os.stat(path).st_mtime]
+        except OSError:
+            return [path, None]
+    return None
+
+
+def _index_path(arguments):
+    path = arguments['config'].get('global', 'command_index')
+    return os.path.expanduser(path) if path else None
+
+
+def _command_index(arguments):
+    """Load the command index, i.e., a description of the command tree of
+    each group, from the file at global.command_index. If it is missing or
+    stale (other kamaki version, specs or spec module files), build it from
+    the command specs and save it
+
+    :returns: (dict) {group: dict(spec=..., tree=description)}
+    """
+    _cnf = arguments['config']
+    from kamaki import __version__
+    specs = sorted(_cnf.cli_specs)
+    key = loads(dumps(dict(version=__version__, specs=specs, sources=[
+        _spec_source(spec) for cmd_group, spec in specs])))
+    path = _index_path(arguments)
+    if path:
+        try:
+            with open(path) as f:
+                index = load(f)
+            if index['key'] == key:
+                return index['groups']
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            if _debug:
+                kloger.warning('Rebuilding command index %s (%s)' % (path, e))
+    groups = dict()
+    for cmd_group, spec in key['specs']:
+        spec_module = _load_spec_module(spec, arguments, 'namespaces')
+        for cmd_tree in getattr(spec_module, 'namespaces', None) or []:
+            if cmd_tree.name == cmd_group:
+                groups[cmd_group] = dict(spec=spec, tree=cmd_tree.describe())
+                break
+        else:
+            if _debug:
+                kloger.warning('Loading of %s cmd spec failed' % cmd_group)
+    if path:
+        try:
+            fd, tmp = mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    dump(dict(key=key, groups=groups), f)
+                os.rename(tmp, path)
+            except Exception:
+                os.remove(tmp)
+                raise
+        except (IOError, OSError, ValueError) as e:
+            if _debug:
+                kloger.warning('Failed to save command index %s: %s' % (
+                    path, e))
+    return groups
+
+
+def _command_loader(arguments, cmd_group, spec):
+    """:returns: a function to load command classes of a group on demand
+    If the command is not in the spec module (the index is stale), the
+    index is dropped, to be rebuilt on the next run, and a CLIError raised
+    """
+    def cmd_loader(path):
+        spec_module = _load_spec_module(spec, arguments, 'namespaces')
+        for cmd_tree in getattr(spec_module, 'namespaces', None) or []:
+            if cmd_tree.name == cmd_group and cmd_tree.has_command(path):
+                return cmd_tree.get_command(path).cmd_class
+        index_path = _index_path(arguments)
+        if index_path and exists(index_path):
+            try:
+                os.remove(index_path)
+            except OSError as e:
+                kloger.warning('Failed to remove %s: %s' % (index_path, e))
+        raise CLIError(
+            'Command %s not found' % path.replace('_', ' '), details=[
+                'The command index was out of date and has been reset',
+                'Please, run the command again'])
+    return cmd_loader
+
+
+def load_command_tree(arguments, cmd_group):
+    """:returns: (CommandTree) the commands of a group, as indexed. Command
+        classes are loaded on first use. None if the group is unknown
+    """
+    entry = _command_index(arguments).get(cmd_group)
+    if entry is None:
+        return None
+    return CommandTree.from_description(
+        entry['tree'], _command_loader(arguments, cmd_group, entry['spec']))
+
+
 def _groups_help(arguments):
-    global _debug
-    global kloger
-    descriptions = {}
     acceptable_groups = arguments['config'].groups
-    for cmd_group, spec in arguments['config'].cli_specs:
-        pkg = _load_spec_module(spec, arguments, 'namespaces')
-        if pkg:
-            namespaces = getattr(pkg, 'namespaces')
-            try:
-                for cmd_tree in namespaces:
-                    if cmd_tree.name in acceptable_groups:
-                        descriptions[cmd_tree.name] = cmd_tree.description
-            except TypeError:
-                if _debug:
-                    kloger.warning(
-                        'No cmd description (help) for module %s' % cmd_group)
-        elif _debug:
-            kloger.warning('Loading of %s cmd spec failed' % cmd_group)
+    descriptions = dict([
+        (cmd_group, entry['tree']['description']) for (
+            cmd_group, entry) in _command_index(arguments).items() if (
+                cmd_group in acceptable_groups)])
     print('\nOptions:\n - - - -')
     print_dict(descriptions)
 
 
 def _load_all_commands(cmd_tree, arguments):
-    _cnf = arguments['config']
-    for cmd_group, spec in _cnf.cli_specs:
-        try:
-            spec_module = _load_spec_module(spec, arguments, 'namespaces')
-            namespaces = getattr(spec_module, 'namespaces')
-        except AttributeError:
-            if _debug:
-                global kloger
-                kloger.warning('No valid description for %s' % cmd_group)
-            continue
-        for spec_tree in namespaces:
-            if spec_tree.name == cmd_group:
-                cmd_tree.add_tree(spec_tree)
-                break
+    for cmd_group in _command_index(arguments):
+        cmd_tree.add_tree(load_command_tree(arguments, cmd_group))
 
 
 #  Methods to be used by CLI implementations
@@ -444,9 +671,8 @@ def print_subcommands_help(cmd):
 
 
 def update_parser_help(parser, cmd):
-    global _best_match
     parser.syntax = parser.syntax.split('<')[0]
-    parser.syntax += ' '.join(_best_match)
+    parser.syntax += ' '.join(cmd.path.split('_'))
 
     description = ''
     if cmd.is_command:
@@ -505,6 +731,9 @@ def get_command_group(unparsed, arguments):
 
 def set_command_params(parameters):
     """Add a parameters list to a command
+    Spec modules imported afterwards register only the matching commands,
+    so the command index (which needs complete command trees) must not be
+    built after a call to this
 
     :param paramters: (list of str) a list of parameters
     """
@@ -571,7 +800,10 @@ def main(func):
                     'Allow connections to SSL sites without certs',
                     ('-k', '--ignore-ssl', '--insecure')),
                 ca_file=ValueArgument(
-                    'CA certificates for SSL authentication', '--ca-certs'),)
+                    'CA certificates for SSL authentication', '--ca-certs'),
+                stats=FlagArgument(
+                    'Print request timing and transfer statistics on exit',
+                    '--stats'),)
             )
             if parser.arguments['version'].value:
                 exit(0)
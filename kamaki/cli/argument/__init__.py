@@ -806,9 +806,12 @@ class ArgumentParseManager(object):
         return required in parsed_args
 
     def parse(self, new_args=None):
-        """Parse user input"""
+        """Parse user input
+
+        :param new_args: (list) terms to parse, if None parse sys.argv
+        """
         try:
-            pkargs = (new_args,) if new_args else ()
+            pkargs = () if new_args is None else (new_args, )
             self._parsed, unparsed = self.parser.parse_known_args(*pkargs)
             parsed_args = [
                 k for k, v in vars(self._parsed).items() if v not in (None, )]
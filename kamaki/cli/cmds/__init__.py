@@ -31,7 +31,8 @@
 # interpreted as representing official policies, either expressed
 # or implied, of GRNET S.A.command
 
-from sys import stdin, stdout, stderr, exit
+import sys
+from sys import stdout, stderr, exit
 from traceback import format_exc
 
 from kamaki.cli.logger import get_logger
@@ -99,7 +100,7 @@ class CommandInit(object):
             arguments={}, astakos=None, cloud=None,
             _in=None, _out=None, _err=None):
         self._in, self._out, self._err = (
-            _in or stdin, _out or stdout, _err or stderr)
+            _in or sys.stdin, _out or stdout, _err or stderr)
         self.required = getattr(self, 'required', None)
         if hasattr(self, 'arguments'):
             arguments.update(self.arguments)
@@ -133,7 +134,25 @@ class CommandInit(object):
                 TOKEN = TOKEN or astakos.token
             else:
                 raise CLIBaseUrlError(service=service)
-        return cls(URL, TOKEN)
+        client = cls(URL, TOKEN)
+        self._set_timeouts(client)
+        return client
+
+    def _set_timeouts(self, client):
+        """Set connect_timeout and read_timeout (in seconds) from the cloud
+        or the global settings"""
+        for term in ('connect_timeout', 'read_timeout'):
+            try:
+                value = self.config.get_cloud(self.cloud, term)
+            except KeyError:
+                value = self.config.get('global', term)
+            if not value:
+                continue
+            try:
+                setattr(client, term.upper(), float(value))
+            except ValueError:
+                log.warning('Invalid %s setting "%s" (seconds expected)' % (
+                    term, value))
 
     @errors.Astakos.project_id
     def _project_id_exists(self, project_id):
@@ -0,0 +1,247 @@
+# Copyright 2011-2015 GRNET S.A. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or
+# without modification, are permitted provided that the following
+# conditions are met:
+#
+#   1. Redistributions of source code must retain the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials
+#      provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY GRNET S.A. ``AS IS'' AND ANY EXPRESS
+# OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL GRNET S.A OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF
+# USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and
+# documentation are those of the authors and should not be
+# interpreted as representing official policies, either expressed
+# or implied, of GRNET S.A.
+
+from copy import copy
+from inspect import getargspec
+from StringIO import StringIO
+
+from kamaki.cli import (
+    command, load_command_tree, exec_cmd, print_error_message)
+from kamaki.cli.argument import (
+    ArgumentParseManager, FlagArgument, IntArgument, ProgressBarArgument)
+from kamaki.cli.cmds import CommandInit, errors
+from kamaki.cli.cmdtree import CommandTree
+from kamaki.cli.errors import CLIError, CLISyntaxError, CLIUnknownCommand
+from kamaki.cli.utils import split_input, pref_enc
+from kamaki.clients import WorkerPool, PooledEvent
+
+
+def _raise(exception):
+    raise exception
+
+
+batch_cmds = CommandTree('batch', 'Run many kamaki commands at once')
+namespaces = [batch_cmds, ]
+
+
+@command(batch_cmds)
+class batch_run(CommandInit):
+    """Run kamaki commands from a file (default: standard input)
+    One command per line, with or without the leading "kamaki", e.g.,
+    .   server list
+    .   kamaki file upload local.file /pithos/remote.file
+    Empty lines and lines starting with # are ignored
+    All commands share the same session (authentication, connections)
+    Options -c/--config, -o/--options and --cloud apply to all commands,
+    and must be given to the batch run command itself
+    With --parallel, commands run concurrently. A line with just "wait"
+    makes the following commands wait for the previous ones to finish.
+    The output of each command is printed when it is over, in order
+    """
+
+    arguments = dict(
+        parallel=IntArgument(
+            'Number of commands to run concurrently (default: 1)',
+            '--parallel', default=1),
+        keep_going=FlagArgument(
+            'Run the rest of the commands after a command fails',
+            '--keep-going'),
+    )
+    shared_arguments = ('config', 'options')
+
+    def _get_tree(self, group):
+        tree = self._trees.get(group)
+        if tree is None and group in self.arguments['config'].groups:
+            tree = self._trees[group] = load_command_tree(
+                self.arguments, group)
+        if tree is None:
+            raise CLIUnknownCommand('Unknown command group: %s' % group)
+        return tree
+
+    def _prepare(self, terms):
+        """Parse a command line and initialize the command
+
+        :returns: (method) run(out, err) to run the command, with its output
+            written on out and err
+        """
+        cmd, args = self._get_tree(terms[0]).find_best_match(terms)
+        if not (cmd and cmd.is_command):
+            raise CLISyntaxError(
+                'Not a terminal command: %s' % ' '.join(terms), details=[
+                    'For a list of commands: kamaki %s -h' % ' '.join(
+                        cmd.path.split('_') if cmd else terms[:1])])
+        cls = cmd.cmd_class
+        instance = cls(dict(self._cmd_arguments), self.astakos, self.cloud)
+        instance.arguments = dict([(k, v if (
+            k in self.shared_arguments) else copy(v)) for k, v in (
+                instance.arguments.items())])
+        parser = ArgumentParseManager(
+            'kamaki', dict([(k, v) for k, v in instance.arguments.items() if (
+                k not in self.shared_arguments)]),
+            required=getattr(cls, 'required', None),
+            syntax='kamaki %s %s' % (
+                ' '.join(cmd.path.split('_')), cls.syntax),
+            description=cmd.help, check_required=False)
+        parser.check_required = True
+        parser.parse(args)
+        spec = getargspec(cls.main.im_func)
+        max_args = len(spec.args) - 1
+        min_args = max_args - len(spec.defaults or ())
+        if len(parser.unparsed) < min_args or (
+                len(parser.unparsed) > max_args and not spec.varargs):
+            raise CLISyntaxError(
+                'Syntax error: %s' % ' '.join(terms), details=[
+                    'Syntax: %s' % parser.syntax])
+        if self['parallel'] > 1:
+            for arg in instance.arguments.values():
+                if isinstance(arg, ProgressBarArgument):
+                    arg.value = True
+
+        def run(out, err):
+            instance._out, instance._err = out, err
+            try:
+                exec_cmd(instance, parser.unparsed, parser.print_help)
+            except SystemExit as se:
+                if se.code:
+                    raise CLIError('Exit status %s' % se.code)
+        return run
+
+    def _report(self, lineno, line, exception, out=None, err=None):
+        """Print the (buffered) output of a finished command
+        :returns: (bool) True if the command succeeded
+        """
+        if out:
+            self._out.write(out.getvalue())
+            self._out.flush()
+        if err:
+            self._err.write(err.getvalue())
+        if exception:
+            if not isinstance(exception, CLIError):
+                exception = CLIError(
+                    '%s' % exception, importance=2,
+                    details=getattr(exception, 'details', []))
+            self._err.write('Line %s: %s\n' % (lineno, line.encode(
+                pref_enc, 'replace')))
+            print_error_message(exception, out=self._err)
+            self.failed.append(lineno)
+        self._err.flush()
+        return not exception
+
+    def _commands(self, script):
+        """:returns: (generator) of (line number, line, terms)"""
+        for lineno, line in enumerate(script, 1):
+            line = line.decode(pref_enc).strip()
+            if not line or line.startswith('#'):
+                continue
+            terms = split_input(line)
+            if terms[0] == 'kamaki':
+                terms = terms[1:]
+            if terms:
+                yield lineno, line, terms
+
+    def _run_serially(self, commands):
+        for lineno, line, terms in commands:
+            if terms == ['wait']:
+                continue
+            self.total += 1
+            try:
+                self._prepare(terms)(self._out, self._err)
+                exception = None
+            except Exception as e:
+                exception = e
+            if not (self._report(lineno, line, exception) or (
+                    self['keep_going'])):
+                break
+
+    def _run_concurrently(self, commands):
+        pool, running = WorkerPool(self['parallel']), []
+
+        def report(block):
+            """Report finished commands, in order
+            :returns: (bool) False if a command failed and not --keep-going
+            """
+            ok = True
+            while running and (block or not running[0][0].isAlive()):
+                event, lineno, line, out, err = running.pop(0)
+                event.join()
+                ok = self._report(
+                    lineno, line, event.exception, out, err) and ok
+            return ok or self['keep_going']
+
+        for lineno, line, terms in commands:
+            if not report(terms == ['wait']):
+                break
+            if terms == ['wait']:
+                continue
+            self.total += 1
+            out, err = StringIO(), StringIO()
+            try:
+                run = self._prepare(terms)
+            except Exception as e:
+                #  Queue the failure as a finished event, to report in order
+                event = PooledEvent(_raise, e)
+                event.run()
+            else:
+                event = pool.submit(run, out, err)
+            running.append((event, lineno, line, out, err))
+            if event.exception and not self['keep_going']:
+                break
+        report(True)
+
+    @errors.Generic.all
+    def _run(self, script):
+        self._trees, self.failed, self.total = dict(), [], 0
+        self._cmd_arguments = dict([
+            (k, v) for k, v in self.arguments.items() if (
+                k not in batch_run.arguments)])
+        commands = self._commands(script)
+        if self['parallel'] > 1:
+            self._run_concurrently(commands)
+        else:
+            self._run_serially(commands)
+        if self.failed:
+            raise CLIError(
+                '%s of %s commands failed' % (len(self.failed), self.total),
+                importance=2, details=['Failed at line%s %s' % (
+                    's' if len(self.failed) > 1 else '',
+                    ', '.join(['%s' % n for n in self.failed]))])
+
+    def main(self, script_file=None):
+        if self['parallel'] < 1:
+            raise CLISyntaxError(
+                'Invalid --parallel value %s' % self['parallel'],
+                details=['Run at least one command at a time'])
+        if script_file in (None, '-'):
+            return self._run(self._in)
+        with open(script_file) as script:
+            return self._run(script)
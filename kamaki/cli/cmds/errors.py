@@ -77,6 +77,9 @@ class Generic(object):
             except ClientError as ce:
                 ce_msg = ('%s' % ce).lower()
                 if ce.status == 401:
+                    astakos = getattr(self, 'astakos', None)
+                    if astakos:
+                        astakos.invalidate()
                     raise CLIError('Authorization failed', details=[
                         'To check if token is valid',
                         '  kamaki user authenticate',
@@ -33,11 +33,14 @@
 
 from time import localtime, strftime
 from io import StringIO
+from itertools import chain
 from pydoc import pager
-from os import path, walk, makedirs
+from os import path, walk, makedirs, remove, rmdir
 from threading import activeCount, enumerate as activethreads
 
+from kamaki.clients import AIMDController
 from kamaki.clients.pithos import PithosClient, ClientError
+from kamaki.clients.pithos.cache import HashmapCache, BlockCache
 from kamaki.clients.utils import escape_ctrl_chars
 
 from kamaki.cli import command
@@ -95,6 +98,32 @@ class _PithosInit(CommandInit):
         self.client.account = self.account
         self.container = self._custom_container() or 'pithos'
         self.client.container = self.container
+        self._set_block_cache()
+        self._set_concurrency()
+
+    def _set_block_cache(self):
+        cache_path = self.config.get('global', 'block_cache')
+        if cache_path:
+            limit = self.config.get('global', 'block_cache_limit')
+            try:
+                self.client.block_cache = BlockCache(cache_path, int(limit))
+            except ValueError:
+                raise CLIError(
+                    'Invalid block_cache_limit value %s' % limit, details=[
+                        'block_cache_limit must be a number of bytes',
+                        'To fix it:',
+                        '  kamaki config set block_cache_limit <bytes>'])
+
+    def _set_concurrency(self):
+        concurrency = self.config.get('global', 'concurrency') or 'fixed'
+        if concurrency == 'adaptive':
+            self.client.CONCURRENCY_CONTROLLER = AIMDController
+        elif concurrency != 'fixed':
+            raise CLIError(
+                'Invalid concurrency value %s' % concurrency, details=[
+                    'concurrency must be fixed or adaptive',
+                    'To fix it:',
+                    '  kamaki config set concurrency adaptive'])
 
     def main(self):
         self._run()
@@ -109,11 +138,13 @@ class _PithosAccount(_PithosInit):
             'A user UUID or name', ('-A', '--account'))
         self.arguments['account'].account_client = astakos
 
-    def print_objects(self, object_list):
-        for index, obj in enumerate(object_list):
+    def print_objects(self, object_list, start=0):
+        """:param start: (int) the enumeration offset of object_list"""
+        width = len(str(start + len(object_list)))
+        for index, obj in enumerate(object_list, start):
             pretty_obj = obj.copy()
             index += 1
-            empty_space = ' ' * (len(str(len(object_list))) - len(str(index)))
+            empty_space = ' ' * (width - len(str(index)))
             if 'subdir' in obj:
                 continue
             if self.object_is_dir(obj):
@@ -290,8 +321,9 @@ class file_list(_PithosContainer, OptionalOutput, NameFilter):
 
     @errors.Pithos.container
     def _container_info(self):
-        r = self.client.container_get(
-            limit=False if self['more'] else self['limit'],
+        """:returns: (iterator) of object lists (pages)"""
+        return self.client.iter_object_pages(
+            limit=None if self['more'] else self['limit'],
             marker=self['marker'],
             prefix=self.path,
             delimiter=self['delimiter'],
@@ -302,14 +334,13 @@ class file_list(_PithosContainer, OptionalOutput, NameFilter):
             if_unmodified_since=self['if_unmodified_since'],
             until=self['until'],
             meta=self['meta'])
-        files = list(r.json or [])
-        return files
 
     @errors.Generic.all
     @errors.Pithos.connection
     @errors.Pithos.object_path
     def _run(self):
-        r = self._container_info()
+        pages = self._container_info()
+        r = next(pages, [])
         if not r:
             if self.path:
                 obj_path = '/%s/%s' % (self.container, self.path)
@@ -333,7 +364,17 @@ class file_list(_PithosContainer, OptionalOutput, NameFilter):
             else:
                 self.error('Container "%s" is empty' % self.client.container)
 
-        files = self._filter_by_name(r)
+        pages = chain([r], pages)
+        if not (self['more'] or self['output_format']):
+            #  Print each page as soon as it arrives
+            start = 0
+            for page in pages:
+                files = self._filter_by_name(page)
+                self.print_objects(files, start)
+                start += len(files)
+            return
+
+        files = self._filter_by_name([obj for page in pages for obj in page])
         if self['more']:
             outbu, self._out = self._out, StringIO()
         try:
@@ -508,7 +549,10 @@ class file_mkdir(_PithosContainer):
 
 @command(file_cmds)
 class file_delete(_PithosContainer):
-    """Delete a file or directory object"""
+    """Delete a file or directory object
+    With any of the filter arguments (e.g., --match), delete the object at
+    the given path (if any) and all objects under it, which pass all filters
+    """
 
     arguments = dict(
         until_date=DateArgument('remove history until then', '--until'),
@@ -516,9 +560,66 @@ class file_delete(_PithosContainer):
         recursive=FlagArgument(
             'If a directory, empty first', ('-r', '--recursive')),
         delimiter=ValueArgument(
-            'delete objects prefixed with <object><delimiter>', '--delimiter')
+            'delete objects prefixed with <object><delimiter>', '--delimiter'),
+        name_pattern=ValueArgument(
+            'filter: delete objects with names matching a shell-style '
+            'pattern (e.g., "*.log")', '--match'),
+        older_than=DateArgument(
+            'filter: delete objects modified before then', '--older-than'),
+        newer_than=DateArgument(
+            'filter: delete objects modified after then', '--newer-than'),
+        larger_than=DataSizeArgument(
+            'filter: delete objects larger than that (e.g., 10MiB)',
+            '--larger-than'),
+        smaller_than=DataSizeArgument(
+            'filter: delete objects smaller than that (e.g., 1KiB)',
+            '--smaller-than'),
+        dry_run=FlagArgument(
+            'list the objects to be deleted, but do not delete them',
+            '--dry-run'),
+        retries=IntArgument(
+            'retries per object on server errors (default: 3)', '--retries'),
+        max_threads=IntArgument('default: 5', '--threads'),
     )
 
+    def _filters(self):
+        return dict(
+            name_pattern=self['name_pattern'],
+            modified_before=self['older_than'],
+            modified_after=self['newer_than'],
+            min_size=(self['larger_than'] + 1) if (
+                self['larger_than'] is not None) else None,
+            max_size=(self['smaller_than'] - 1) if (
+                self['smaller_than'] is not None) else None)
+
+    @errors.Pithos.container
+    def _delete_filtered(self, filters):
+        location = '/%s/%s' % (self.container, self.path or '')
+        if not (self['dry_run'] or self['yes'] or self.ask_user(
+                'Delete the matching objects under %s ?' % location)):
+            return self.error('Aborted')
+        self.client.MAX_THREADS = int(self['max_threads'] or 5)
+        retries = self['retries']
+        report = self.client.delete_objects(
+            tree=self.path or None,
+            until=self['until_date'],
+            dry_run=self['dry_run'],
+            retries=3 if retries is None else retries,
+            **filters)
+        if self['dry_run']:
+            for obj in report['objects']:
+                self.writeln('%9s %s' % (
+                    format_size(obj['bytes']), escape_ctrl_chars(obj['name'])))
+            self.error('%d object(s), %s would be deleted' % (
+                report['matched'], format_size(report['bytes'])))
+            return
+        self.error('%d object(s) deleted' % report['deleted'])
+        if report['failed']:
+            raise CLIError(
+                'Failed to delete %d object(s)' % len(report['failed']),
+                details=['%s: %s' % (name, error) for name, error in sorted(
+                    report['failed'].items())])
+
     @errors.Pithos.object_path
     def _delete_object(self):
         self.client.get_object_info(self.path)
@@ -527,10 +628,10 @@ class file_delete(_PithosContainer):
             # See if any objects exist under prefix
             # Add a trailing / to object's name
             prefix = self.path.rstrip('/') + '/'
-            result = self.client.container_get(prefix=prefix)
+            count = sum(len(page) for page in self.client.iter_object_pages(
+                prefix=prefix))
 
-            if result.json:
-                count = len(result.json)
+            if count:
                 self.error(' * %d other object(s) with %s as prefix found' % (
                     count, prefix))
 
@@ -544,7 +645,7 @@ class file_delete(_PithosContainer):
 
                 self.error(' * %s!' % msg)
 
-            if not result.json or self.ask_user("Continue?"):
+            if not count or self.ask_user("Continue?"):
                 self.client.del_object(
                     self.path,
                     until=self['until_date'],
@@ -564,7 +665,10 @@ class file_delete(_PithosContainer):
     @errors.Generic.all
     @errors.Pithos.connection
     def _run(self):
-        if self.path:
+        filters = self._filters()
+        if self['dry_run'] or any(v is not None for v in filters.values()):
+            self._delete_filtered(filters)
+        elif self.path:
             self._delete_object()
         else:
             self._empty_container()
@@ -952,6 +1056,14 @@ class file_upload(_PithosContainer):
             'Confirm upload with a custom checksum (MD5)', '--etag'),
         use_hashes=FlagArgument(
             'Source file contains hashmap not data', '--source-is-hashmap'),
+        pipeline=FlagArgument(
+            'Upload blocks while hashing (faster for new files, but blocks '
+            'already on the server are sent again)', '--pipeline'),
+        file_threads=IntArgument(
+            'Files to upload at once, with -r (default: 4)', '--file-threads'),
+        delta=FlagArgument(
+            'Update existing objects by uploading only the blocks that are '
+            'not in their remote hashmap (requires -f)', '--delta'),
     )
 
     def _sharing(self):
@@ -970,8 +1082,7 @@ class file_upload(_PithosContainer):
             container_limit = int(cl_dict['x-container-policy-quota'])
         except KeyError:
             container_limit = 0
-        r = self.client.container_get()
-        used_bytes = sum(int(o['bytes']) for o in r.json)
+        used_bytes = sum(int(o['bytes']) for o in self.client.iter_objects())
         path_size = get_path_size(path)
         if container_limit and path_size > (container_limit - used_bytes):
             raise CLIError(
@@ -1032,13 +1143,13 @@ class file_upload(_PithosContainer):
                     rel_path = rel_path.replace(path.sep, '/')
                     self.error('remote: mkdir /%s/%s' % (
                         self.client.container, rel_path))
-                    self.client.create_directory(rel_path)
+                    yield None, rel_path
                 for f in files:
                     fpath = path.join(top, f)
                     if path.isfile(fpath):
                         rel_path = rel_path.replace(path.sep, '/')
                         pathfix = f.replace(path.sep, '/')
-                        yield open(fpath, 'rb'), '%s/%s' % (rel_path, pathfix)
+                        yield fpath, '%s/%s' % (rel_path, pathfix)
                     else:
                         self.error('%s not a regular file' % fpath)
         else:
@@ -1061,7 +1172,39 @@ class file_upload(_PithosContainer):
                 else:
                     raise
             self._check_container_limit(lpath)
-            yield open(lpath, 'rb'), rpath
+            yield lpath, rpath
+
+    def _mime_type(self, local_path):
+        """:returns: (dict) the content type and encoding of a local file"""
+        ctype, cenc = (None, None) if (
+            self['content_type'] and self['content_encoding']) else (
+                guess_mime_type(local_path))
+        return dict(
+            content_type=self['content_type'] or ctype,
+            content_encoding=self['content_encoding'] or cenc)
+
+    def _upload_tree(self, uploads, params, rpref):
+        """Upload the files of a directory tree, several at once"""
+        failed = []
+        uploads = ((lpath, rpath, lpath and dict(
+            self._mime_type(lpath), delta=self['delta'])) for (
+                lpath, rpath) in uploads)
+        for lpath, rpath, r in self.client.upload_objects(
+                uploads, threads=self['file_threads'] or 4, **params):
+            if isinstance(r, Exception):
+                failed.append('%s: %s' % (lpath or rpath, r))
+                self.error('Failed to upload %s' % (lpath or rpath))
+                continue
+            if lpath:
+                self.error('%s --> %s/%s/%s' % (
+                    lpath, rpref, self.client.container, rpath))
+            if self['public'] and lpath:
+                obj = self.client.get_object_info(rpath)
+                self.write('%s\n' % obj.get('x-object-public', ''))
+        if failed:
+            raise CLIError(
+                'Failed to upload %d file(s)' % len(failed), details=failed)
+        self.error('Upload completed')
 
     def _run(self, local_path, remote_path):
         self.client.MAX_THREADS = int(self['max_threads'] or 5)
@@ -1072,14 +1215,31 @@ class file_upload(_PithosContainer):
             sharing=self._sharing(),
             public=self['public'])
         container_info_cache = dict()
+        cache_path = self.config.get('global', 'hashmap_cache')
+        hashmap_cache = HashmapCache(cache_path) if cache_path else None
         rpref = ('pithos://%s' % self['account']) if self['account'] else ''
-        for f, rpath in self._src_dst(local_path, remote_path):
+        uploads = self._src_dst(local_path, remote_path)
+        if path.isdir(path.abspath(local_path)) and not self['unchunked']:
+            caller_id = self.account
+            if self.client.account != caller_id:
+                params['target_account'], self.client.account = (
+                    self.client.account, caller_id)
+            try:
+                return self._upload_tree(uploads, dict(
+                    params,
+                    container_info_cache=container_info_cache,
+                    hashmap_cache=hashmap_cache,
+                    pipeline=self['pipeline']), rpref)
+            except KeyboardInterrupt:
+                raise CLIError('Upload canceled by user')
+        for lpath, rpath in uploads:
+            if lpath is None:
+                self.client.create_directory(rpath)
+                continue
+            f = open(lpath, 'rb')
             self.error('%s --> %s/%s/%s' % (
                 f.name, rpref, self.client.container, rpath))
-            if not (self['content_type'] and self['content_encoding']):
-                ctype, cenc = guess_mime_type(f.name)
-                params['content_type'] = self['content_type'] or ctype
-                params['content_encoding'] = self['content_encoding'] or cenc
+            params.update(self._mime_type(f.name))
             if self['unchunked']:
                 self.client.upload_object_unchunked(
                     rpath, f,
@@ -1096,16 +1256,27 @@ class file_upload(_PithosContainer):
                     else:
                         hash_cb = None
 
-                    caller_id = self.astakos.user_term('id')
+                    caller_id = self.account
                     if self.client.account != caller_id:
                         params['target_account'], self.client.account = (
                             self.client.account, caller_id)
-                    self.client.upload_object(
-                        rpath, f,
-                        hash_cb=hash_cb,
-                        upload_cb=upload_cb,
-                        container_info_cache=container_info_cache,
-                        **params)
+                    if self['delta']:
+                        self.client.update_object(
+                            rpath, f,
+                            hash_cb=hash_cb,
+                            upload_cb=upload_cb,
+                            container_info_cache=container_info_cache,
+                            hashmap_cache=hashmap_cache,
+                            **params)
+                    else:
+                        self.client.upload_object(
+                            rpath, f,
+                            hash_cb=hash_cb,
+                            upload_cb=upload_cb,
+                            container_info_cache=container_info_cache,
+                            hashmap_cache=hashmap_cache,
+                            pipeline=self['pipeline'],
+                            **params)
                 except KeyboardInterrupt:
                     timeout = 0.5
                     msg = '\n'
@@ -1214,7 +1385,7 @@ class file_cat(_PithosContainer):
                 if_none_match=self['if_none_match'],
                 if_modified_since=self['if_modified_since'],
                 if_unmodified_since=self['if_unmodified_since'],
-                buffer_blocks=self['buffer_blocks'])
+                buffer_blocks=self['buffer_blocks'] or 4)
         except ClientError as ce:
             if ce.status in (404, ):
                 self._container_exists()
@@ -1258,14 +1429,18 @@ class file_download(_PithosContainer):
             default=False),
         recursive=FlagArgument(
             'Download a remote directory object and its contents',
-            ('-r', '--recursive'))
+            ('-r', '--recursive')),
+        file_threads=IntArgument(
+            'Files to download at once, with -r (default: 4)',
+            '--file-threads'),
         )
 
     def _src_dst(self, local_path):
-        """Create a list of (src, dst) where src is a remote location and dst
-        is an open file descriptor. Directories are denoted as (None, dirpath)
-        and they are pretended to other objects in a very strict order (shorter
-        to longer path)."""
+        """Create a list of (src, dst, resume, info) where src is a remote
+        location, dst a local path and info the listing of src, if listed.
+        Directories are denoted as (None, dirpath, None, None) and they are
+        pretended to other objects in a very strict order (shorter to longer
+        path)."""
         ret, obj = [], None
         # The prefix is actually the relative remote path without
         # the trailing separator.
@@ -1303,14 +1478,14 @@ class file_download(_PithosContainer):
                 obj = obj or dict(
                     name='', content_type='application/directory')
                 dirs, files = [], []
-                result = self.client.container_get(
+                objects = self.client.iter_objects(
                     prefix=prefix,
                     if_modified_since=self['modified_since_date'],
                     if_unmodified_since=self['unmodified_since_date'])
 
                 # Find the final local path for each remote object
                 # [(remote name, final local path),.]
-                for o in result.json:
+                for o in objects:
                     remote = o['name']
                     # First find the relative path of the object
                     # without the prefix and any leading '/'
@@ -1322,7 +1497,7 @@ class file_download(_PithosContainer):
                     if self.object_is_dir(o):
                         dirs.append((remote, final))
                     else:
-                        files.append((remote, final))
+                        files.append((remote, final, o))
                     self.error(r"%s -> %s" % (remote, final))
 
                 #  Put the directories on top of the list
@@ -1336,10 +1511,10 @@ class file_download(_PithosContainer):
                             details=[
                                 'Either remove the file or specify a'
                                 'different target location'])
-                    ret.append((None, dpath, None))
+                    ret.append((None, dpath, None, None))
 
                 #  Append the file objects
-                for opath, lpath in files:
+                for opath, lpath, info in files:
                     if self['resume']:
                         fxists = path.exists(lpath)
                         if fxists and path.isdir(lpath):
@@ -1349,14 +1524,14 @@ class file_download(_PithosContainer):
                                 details=[
                                     'Either remove the file or specify a'
                                     'different target location'])
-                        ret.append((opath, lpath, fxists))
+                        ret.append((opath, lpath, fxists, info))
                     elif path.exists(lpath):
                         raise CLIError(
                             'Cannot overwrite %s' % lpath,
                             details=['To overwrite/resume, use  %s' % (
                                 self.arguments['resume'].lvalue)])
                     else:
-                        ret.append((opath, lpath, None))
+                        ret.append((opath, lpath, None, info))
             elif prefix:
                 raise CLIError(
                     'Remote object /%s/%s is a directory' % (
@@ -1385,16 +1560,36 @@ class file_download(_PithosContainer):
                 # Delegate intermediate local dir cration
                 # to makedirs() inside _run()
                 d = path.dirname(local_path)
-                ret.append((None, d, None))
-            ret.append((prefix, local_path, self['resume']))
-
-        for r, l, resume in ret:
-            if r:
-                mode = 'rb+' if resume and path.exists(l) else 'wb+'
-                with open(l, mode) as f:
-                    yield (r, f)
+                ret.append((None, d, None, None))
+            ret.append((prefix, local_path, self['resume'], None))
+        return ret
+
+    def _download_kwargs(self):
+        return dict(
+            range_str=self['range'],
+            version=self['object_version'],
+            if_match=self['matching_etag'],
+            if_none_match=self['non_matching_etag'],
+            if_modified_since=self['modified_since_date'],
+            if_unmodified_since=self['unmodified_since_date'])
+
+    def _download_tree(self, files):
+        """Download the files of a directory tree, several at once"""
+        failed = []
+        downloads = ((rpath, lpath, info, dict(resume=resume)) for (
+            rpath, lpath, resume, info) in files)
+        for rpath, lpath, r in self.client.download_objects(
+                downloads, threads=self['file_threads'] or 4,
+                **self._download_kwargs()):
+            if isinstance(r, Exception):
+                failed.append('/%s/%s: %s' % (self.container, rpath, r))
+                self.error('Failed to download /%s/%s' % (
+                    self.container, rpath))
             else:
-                yield (r, l)
+                self.error('/%s/%s --> %s' % (self.container, rpath, lpath))
+        if failed:
+            raise CLIError(
+                'Failed to download %d file(s)' % len(failed), details=failed)
 
     @errors.Generic.all
     @errors.Pithos.connection
@@ -1408,29 +1603,33 @@ class file_download(_PithosContainer):
         try:
             # From _src_dst():
             # If rpath is None output_file is a directory.
-            # If rpath is not None output_file is a file descriptor.
-            for rpath, output_file in self._src_dst(local_path):
+            # If info is not None, rpath is a listed file of a directory.
+            files = []
+            for rpath, output_file, resume, info in self._src_dst(
+                    local_path):
                 # Create a directory
                 if not rpath:
                     if not path.exists(output_file):
                         self.error('Create local directory %s' % output_file)
                         makedirs(output_file)
                     continue
+                files.append((rpath, output_file, resume, info))
+            if any(info is not None for _, _, _, info in files):
+                self._download_tree(files)
+                files = []
+            for rpath, output_file, resume, info in files:
                 # Download a file
                 self.error('/%s/%s --> %s' % (
-                    self.container, rpath, output_file.name))
+                    self.container, rpath, output_file))
                 progress_bar, download_cb = self._safe_progress_bar(
                     '  download')
-                self.client.download_object(
-                    rpath, output_file,
-                    download_cb=download_cb,
-                    range_str=self['range'],
-                    version=self['object_version'],
-                    if_match=self['matching_etag'],
-                    resume=self['resume'],
-                    if_none_match=self['non_matching_etag'],
-                    if_modified_since=self['modified_since_date'],
-                    if_unmodified_since=self['unmodified_since_date'])
+                mode = 'rb+' if resume and path.exists(output_file) else 'wb+'
+                with open(output_file, mode) as f:
+                    self.client.download_object(
+                        rpath, f,
+                        download_cb=download_cb,
+                        resume=self['resume'],
+                        **self._download_kwargs())
         except KeyboardInterrupt:
             timeout = 0.5
             msg = '\n'
@@ -1469,6 +1668,145 @@ class file_download(_PithosContainer):
         self._run(local_path=local_path)
 
 
+@command(file_cmds)
+class file_sync(_PithosContainer):
+    """Synchronize a remote directory with a local one
+    Transfer the files which are missing or differ at the destination. Files
+    are compared by size and hashmap, and only the missing blocks of modified
+    files are transferred. The local directory is the source, unless
+    --download is set.
+    """
+
+    arguments = dict(
+        download=FlagArgument(
+            'synchronize the local directory from the remote one',
+            '--download'),
+        delete=FlagArgument(
+            'delete destination files missing from the source', '--delete'),
+        dry_run=FlagArgument(
+            'list the transfers and deletions, but do not run them',
+            '--dry-run'),
+        max_threads=IntArgument('default: 5', '--threads'),
+        file_threads=IntArgument(
+            'Files to transfer at once (default: 4)', '--file-threads'),
+    )
+
+    def _remote(self, name):
+        prefix = (self.path or '').strip('/')
+        return '%s/%s' % (prefix, name) if prefix else name
+
+    def _report(self, failed, transfer):
+        if failed:
+            raise CLIError(
+                'Failed to %s %d file(s)' % (transfer, len(failed)),
+                details=failed)
+
+    def _sync_up(self, changes, **kwargs):
+        uploads, deletions = [], []
+        for name, lpath, obj, equal in changes:
+            rpath = self._remote(name)
+            if lpath is None:
+                if self['delete']:
+                    deletions.append(obj)
+                    self.error('delete /%s/%s' % (self.container, rpath))
+            elif path.isdir(lpath):
+                uploads.append((None, rpath, None))
+                self.error('mkdir /%s/%s' % (self.container, rpath))
+            else:
+                ctype, cenc = guess_mime_type(lpath)
+                uploads.append((lpath, rpath, dict(
+                    content_type=ctype, content_encoding=cenc,
+                    delta=obj is not None and not self.object_is_dir(obj))))
+                self.error('%s --> /%s/%s' % (lpath, self.container, rpath))
+        if self['dry_run']:
+            return
+        failed = ['%s: %s' % (lpath or rpath, r) for (
+            lpath, rpath, r) in self.client.upload_objects(
+                uploads, threads=self['file_threads'] or 4, **kwargs) if (
+                    isinstance(r, Exception))]
+        if deletions:
+            report = self.client.delete_objects(objects=deletions)
+            failed += ['/%s/%s: %s' % (self.container, rpath, error) for (
+                rpath, error) in sorted(report['failed'].items())]
+        self._report(failed, 'upload')
+
+    def _sync_down(self, local_dir, changes, **kwargs):
+        downloads, deletions, failed = [], [], []
+        for name, lpath, obj, equal in changes:
+            lpath = lpath or path.join(local_dir, *name.split('/'))
+            if obj is None:
+                if self['delete']:
+                    deletions.append(lpath)
+                    self.error('delete %s' % lpath)
+            elif self.object_is_dir(obj):
+                if path.isfile(lpath):
+                    failed.append('/%s/%s: %s is a file, not a directory' % (
+                        self.container, obj['name'], lpath))
+                    self.error('conflict /%s/%s <-> %s' % (
+                        self.container, obj['name'], lpath))
+                    continue
+                self.error('mkdir %s' % lpath)
+                if not (self['dry_run'] or path.isdir(lpath)):
+                    try:
+                        makedirs(lpath)
+                    except OSError as ose:
+                        failed.append('%s: %s' % (lpath, ose))
+            else:
+                downloads.append((obj['name'], lpath, obj, dict(
+                    resume=path.isfile(lpath))))
+                self.error('/%s/%s --> %s' % (
+                    self.container, obj['name'], lpath))
+        if self['dry_run']:
+            return
+        ready = []
+        for download in downloads:
+            rpath, lpath, obj, kw = download
+            try:
+                if not path.isdir(path.dirname(lpath)):
+                    makedirs(path.dirname(lpath))
+                ready.append(download)
+            except OSError as ose:
+                failed.append('/%s/%s: %s' % (self.container, rpath, ose))
+        failed += ['/%s/%s: %s' % (self.container, rpath, r) for (
+            rpath, lpath, r) in self.client.download_objects(
+                ready, threads=self['file_threads'] or 4, **kwargs) if (
+                    isinstance(r, Exception))]
+        for lpath in sorted(deletions, reverse=True):
+            (rmdir if path.isdir(lpath) else remove)(lpath)
+        self._report(failed, 'download')
+
+    @errors.Generic.all
+    @errors.Pithos.connection
+    @errors.Pithos.container
+    @errors.Pithos.local_path
+    def _run(self, local_path):
+        if not path.isdir(local_path):
+            raise CLIError('%s is not a directory' % local_path, details=[
+                'To transfer a single file, use file upload or download'])
+        self.client.MAX_THREADS = int(self['max_threads'] or 5)
+        container_info_cache = dict()
+        cache_path = self.config.get('global', 'hashmap_cache')
+        hashmap_cache = HashmapCache(cache_path) if cache_path else None
+        changes = [d for d in self.client.diff_tree(
+            local_path, self.path or '',
+            hashmap_cache=hashmap_cache,
+            container_info_cache=container_info_cache) if not d[3]]
+        if self['download']:
+            self._sync_down(
+                local_path, changes, container_info_cache=container_info_cache)
+        else:
+            self._sync_up(
+                changes,
+                container_info_cache=container_info_cache,
+                hashmap_cache=hashmap_cache)
+        self.error('%s %d change(s)' % (
+            'Found' if self['dry_run'] else 'Synchronized', len(changes)))
+
+    def main(self, local_path, remote_path_or_url=None):
+        super(self.__class__, self)._run(remote_path_or_url)
+        self._run(local_path=local_path)
+
+
 @command(container_cmds)
 class container_info(_PithosAccount, OptionalOutput):
     """Get information about a container"""
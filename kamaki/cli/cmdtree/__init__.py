@@ -37,14 +37,36 @@ class Command(object):
 
     def __init__(
             self, path,
-            help='', subcommands={}, cmd_class=None, long_help=''):
+            help='', subcommands={}, cmd_class=None, long_help='',
+            cmd_loader=None):
+        """
+        :param cmd_loader: (callable) cmd_loader(path) returns the command
+            class. It is called on first use, if cmd_class is not given
+        """
         assert path, 'Cannot initialize a command without a command path'
         self.path = path
         self.help = help or ''
         self.subcommands = dict(subcommands) if subcommands else {}
         self.cmd_class = cmd_class
+        self.cmd_loader = cmd_loader
         self.long_help = '%s' % (long_help or '')
 
+    @property
+    def cmd_class(self):
+        if self._cmd_class is None and self.cmd_loader:
+            cmd_loader, self.cmd_loader = self.cmd_loader, None
+            self._cmd_class = cmd_loader(self.path)
+        return self._cmd_class
+
+    @cmd_class.setter
+    def cmd_class(self, cmd_class):
+        self._cmd_class = cmd_class
+
+    @property
+    def has_class(self):
+        """Whether there is a command class, without loading it"""
+        return bool(self._cmd_class or self.cmd_loader)
+
     @property
     def name(self):
         if not getattr(self, '_name', None):
@@ -69,7 +91,7 @@ class Command(object):
 
     @property
     def is_command(self):
-        return len(self.subcommands) == 0 if self.cmd_class else False
+        return len(self.subcommands) == 0 if self.has_class else False
 
     @property
     def parent_path(self):
@@ -120,7 +142,8 @@ class CommandTree(object):
 
     def add_command(
             self, command_path,
-            description=None, cmd_class=None, long_description=''):
+            description=None, cmd_class=None, long_description='',
+            cmd_loader=None):
         terms = command_path.split('_')
         try:
             cmd = self.groups[terms[0]]
@@ -139,6 +162,7 @@ class CommandTree(object):
                 cmd.add_subcmd(new_cmd)
                 cmd = new_cmd
         cmd.cmd_class = cmd_class or None
+        cmd.cmd_loader = cmd_loader
         cmd.help = description or None
         cmd.long_help = long_description or cmd.long_help
 
@@ -171,6 +195,34 @@ class CommandTree(object):
         except KeyError:
             self.add_command(tname, tdesc)
 
+    def describe(self):
+        """:returns: (dict) a json-serializable description of the tree,
+            without the command classes (see from_description)
+        """
+        return dict(
+            name=self.name, description=self.description,
+            long_description=self.long_description,
+            commands=[[path, cmd.help, cmd.long_help, cmd.has_class] for (
+                path, cmd) in sorted(self._all_commands.items())])
+
+    @classmethod
+    def from_description(cls, description, cmd_loader):
+        """Build a tree from a description, loading command classes on use
+
+        :param description: (dict) as returned by describe()
+
+        :param cmd_loader: (callable) cmd_loader(path) returns the class of
+            the command with this path
+        """
+        tree = cls(
+            description['name'], description['description'],
+            description['long_description'])
+        for path, help, long_help, has_class in description['commands']:
+            tree.add_command(
+                path, help, long_description=long_help,
+                cmd_loader=cmd_loader if has_class else None)
+        return tree
+
     def has_command(self, path):
         return path in self._all_commands
 
@@ -373,6 +373,34 @@ class CommandTree(TestCase):
             l1.sort(), l2.sort(), self.assertEqual(l1, l2)
         self.assertRaises(KeyError, ctree.get_subcommands, 'NON_EXISTNG_CMD')
 
+    def test_describe(self):
+        from json import dumps, loads
+        ctree = cmdtree.CommandTree('treeDesc', 'test describe', 'long')
+        self._add_commands(ctree)
+        loaded = []
+
+        def cmd_loader(path):
+            loaded.append(path)
+            return ctree.get_command(path).cmd_class
+
+        description = loads(dumps(ctree.describe()))
+        ltree = cmdtree.CommandTree.from_description(description, cmd_loader)
+        self.assertEqual(
+            (ltree.name, ltree.description, ltree.long_description),
+            ('treeDesc', 'test describe', 'long'))
+        self.assertEqual(
+            sorted(ltree._all_commands), sorted(ctree._all_commands))
+        for path, cmd in ctree._all_commands.items():
+            lcmd = ltree.get_command(path)
+            self.assertEqual(lcmd.is_command, cmd.is_command)
+            self.assertEqual(lcmd.help, cmd.help)
+        self.assertEqual(loaded, [])
+        self.assertEqual(ltree.get_command('cmd_cmd0b').cmd_class, None)
+        cmd = ltree.get_command('cmd_cmd0c_cmd1b_cmd2')
+        self.assertEqual(cmd.cmd_class, Command)
+        self.assertEqual(cmd.cmd_class, Command)
+        self.assertEqual(loaded, ['cmd_cmd0c_cmd1b_cmd2'])
+
 
 if __name__ == '__main__':
     from sys import argv
@@ -96,8 +96,19 @@ DOCUMENTATION['global']['ignore_ssl'] = (
     'allow insecure HTTP connections (on / off)'),
 DOCUMENTATION['global']['ca_certs'] = (
     'path to CA certificates bundle (system depended)'),
+DOCUMENTATION['global']['hashmap_cache'] = (
+    'directory to cache block hashes of uploaded files (empty: no caching)'),
+DOCUMENTATION['global']['block_cache'] = (
+    'directory to cache downloaded blocks (empty: no caching)'),
+DOCUMENTATION['global']['block_cache_limit'] = (
+    'maximum size of the block cache in bytes'),
+DOCUMENTATION['global']['concurrency'] = (
+    'block transfers in flight, --threads or adaptive (fixed / adaptive)'),
+DOCUMENTATION['global']['command_index'] = (
+    'file to index command groups in (empty: load all specs every time)'),
 DOCUMENTATION['global']['config_cli'] = 'CLI specs for config commands',
 DOCUMENTATION['global']['history_cli'] = 'CLI specs for history commands',
+DOCUMENTATION['global']['batch_cli'] = 'CLI specs for batch commands',
 DOCUMENTATION['global']['user_cli'] = 'CLI specs for user commands',
 DOCUMENTATION['global']['quota_cli'] = 'CLI specs for quota commands',
 DOCUMENTATION['global']['project_cli'] = 'CLI specs for project commands',
@@ -169,9 +180,17 @@ DEFAULTS = {
         'imagecompute_cli': 'image',
         'config_cli': 'config',
         'history_cli': 'history',
+        'batch_cli': 'batch',
         'ignore_ssl': 'off',
         'scripts_cli': 'contrib.scripts',
         'ca_certs': CACERTS_DEFAULT_PATH,
+        'hashmap_cache': os.path.expanduser('~/.kamaki.hashmaps'),
+        'block_cache': '',
+        'block_cache_limit': 1024 ** 3,
+        'auth_cache': os.path.expanduser('~/.kamaki.auth'),
+        'auth_cache_ttl': 300,
+        'command_index': os.path.expanduser('~/.kamaki.index'),
+        'concurrency': 'fixed',
         #  Optional command specs:
         #  'service_cli': 'astakos'
         #  'endpoint_cli': 'astakos'
@@ -67,8 +67,7 @@ class scripts_verifyfs(_PithosAccount, OptionalOutput):
     @errors.Pithos.container
     def _run(self):
         dirs, files, empty_files = [], [], []
-        result = self.client.container_get()
-        for o in result.json:
+        for o in self.client.iter_objects():
             name = o['name']
             if self.object_is_dir(o):
                 dirs.append(name)
@@ -0,0 +1,267 @@
+# Copyright 2011-2015 GRNET S.A. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or
+# without modification, are permitted provided that the following
+# conditions are met:
+#
+#   1. Redistributions of source code must retain the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials
+#      provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY GRNET S.A. ``AS IS'' AND ANY EXPRESS
+# OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL GRNET S.A OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF
+# USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and
+# documentation are those of the authors and should not be
+# interpreted as representing official policies, either expressed
+# or implied, of GRNET S.A.
+
+"""A long-running kamaki process, which runs the commands it receives from
+kamaki-client over a UNIX socket (protocol in kamaki.daemon)
+
+Commands run one at a time, in the daemon process, with their standard
+streams redirected to the client. Imported command specs, authenticated
+identity clients and connection pools outlive each command, while the
+configuration file is read again for every command.
+"""
+
+import atexit
+import logging
+import os
+import socket
+import sys
+from sys import argv, exit, stdout, stderr
+from threading import Thread, Lock
+
+import kamaki.cli
+from kamaki.cli import run_one_cmd
+from kamaki.clients import Client
+from kamaki.daemon import (
+    socket_path, send_chunk, recv_chunk, BUFFER_SIZE,
+    ARG, ENV, CWD, RUN, STDIN, STDOUT, STDERR, EXIT)
+
+
+LOG_FLAGS = ('LOG_TOKEN', 'LOG_DATA', 'LOG_PID')
+
+
+def _log_state():
+    manager = logging.Logger.manager
+    loggers = [logging.getLogger()] + [
+        log for log in manager.loggerDict.values() if (
+            isinstance(log, logging.Logger))]
+    return dict([(log, (list(log.handlers), log.level)) for log in loggers])
+
+
+def _restore_log_state(state):
+    """Drop the log handlers added since state was taken"""
+    for log in _log_state():
+        handlers, level = state.get(log, ([], log.level))
+        for h in [h for h in log.handlers if h not in handlers]:
+            log.removeHandler(h)
+            h.close()
+        log.setLevel(level)
+
+
+def read_request(conn):
+    """:returns: (argv, environment, working directory) of a command"""
+    args, env, cwd = [], dict(), None
+    while True:
+        chunk_type, payload = recv_chunk(conn)
+        if chunk_type == ARG:
+            args.append(payload)
+        elif chunk_type == ENV:
+            key, _, value = payload.partition('=')
+            env[key] = value
+        elif chunk_type == CWD:
+            cwd = payload
+        elif chunk_type == RUN:
+            return args, env, cwd
+        else:
+            raise ValueError('Unexpected chunk type %r' % chunk_type)
+
+
+def _pump_input(conn, fd):
+    """Feed fd with the input of the client, until EOF"""
+    try:
+        while True:
+            chunk_type, data = recv_chunk(conn)
+            if chunk_type != STDIN or not data:
+                break
+            while data:
+                data = data[os.write(fd, data):]
+    except (EOFError, OSError, socket.error):
+        pass
+    finally:
+        os.close(fd)
+
+
+def _pump_output(fd, conn, chunk_type, lock):
+    """Send whatever is written on fd to the client, until EOF. Keep reading
+    if the client is gone, so that the command does not block"""
+    connected = True
+    while True:
+        data = os.read(fd, BUFFER_SIZE)
+        if not data:
+            break
+        if connected:
+            try:
+                with lock:
+                    send_chunk(conn, chunk_type, data)
+            except socket.error:
+                connected = False
+    os.close(fd)
+
+
+def run_command(args, env, cwd):
+    """Run a one-command invocation in this process, as if it was executed
+    with args, env and cwd. At exit handlers registered by the command
+    (e.g., for --stats) run when the command is over. Process-wide logging
+    settings of the command (e.g., -vv) are reverted
+
+    :returns: (int) the exit status
+    """
+    saved_argv, saved_env, saved_cwd = argv[:], dict(os.environ), os.getcwd()
+    tracer, log_state = Client.TRACER, _log_state()
+    log_flags = [(flag, getattr(Client, flag)) for flag in LOG_FLAGS]
+    exit_handlers = len(atexit._exithandlers)
+    argv[:] = args
+    try:
+        os.environ.clear()
+        os.environ.update(env)
+        os.chdir(cwd or saved_cwd)
+        run_one_cmd()
+        status = 0
+    except SystemExit as se:
+        status = se.code
+    except Exception as e:
+        stderr.write('Unknown Error: %s\n' % e)
+        status = 1
+    finally:
+        handlers = atexit._exithandlers[exit_handlers:]
+        del atexit._exithandlers[exit_handlers:]
+        for func, targs, kwargs in reversed(handlers):
+            try:
+                func(*targs, **kwargs)
+            except Exception as e:
+                stderr.write('Error at exit: %s\n' % e)
+        Client.TRACER = tracer
+        for flag, value in log_flags:
+            setattr(Client, flag, value)
+        _restore_log_state(log_state)
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+        argv[:] = saved_argv
+    if status is None:
+        return 0
+    if isinstance(status, int):
+        return status
+    stderr.write('%s\n' % status)
+    return 1
+
+
+def handle(conn):
+    """Run the command of a client connection, with the standard streams
+    of the process redirected to the client"""
+    args, env, cwd = read_request(conn)
+    lock = Lock()
+    (in_r, in_w), (out_r, out_w), (err_r, err_w) = (
+        os.pipe(), os.pipe(), os.pipe())
+    stdout.flush()
+    stderr.flush()
+    saved = [os.dup(fd) for fd in (0, 1, 2)]
+    for fd, target in ((0, in_r), (1, out_w), (2, err_w)):
+        os.dup2(target, fd)
+        os.close(target)
+    #  A fresh stdin, since sys.stdin may buffer the input of a former client
+    saved_stdin, sys.stdin = sys.stdin, os.fdopen(os.dup(0))
+    threads = [
+        Thread(target=_pump_input, args=(conn, in_w)),
+        Thread(target=_pump_output, args=(out_r, conn, STDOUT, lock)),
+        Thread(target=_pump_output, args=(err_r, conn, STDERR, lock))]
+    for t in threads:
+        t.daemon = True
+        t.start()
+    try:
+        status = run_command(args, env, cwd)
+    finally:
+        sys.stdin.close()
+        sys.stdin = saved_stdin
+        stdout.flush()
+        stderr.flush()
+        for fd, original in zip((0, 1, 2), saved):
+            os.dup2(original, fd)
+            os.close(original)
+    for t in threads[1:]:
+        t.join()
+    with lock:
+        send_chunk(conn, EXIT, '%s' % status)
+
+
+def serve(path):
+    """Accept client connections on a UNIX socket at path and run their
+    commands one at a time. Only the current user can connect"""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except socket.error:
+            os.remove(path)
+        else:
+            raise IOError('A kamaki daemon is already listening on %s' % path)
+        finally:
+            probe.close()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0077)
+    try:
+        sock.bind(path)
+    finally:
+        os.umask(umask)
+    sock.listen(16)
+    try:
+        while True:
+            conn, _ = sock.accept()
+            try:
+                handle(conn)
+            except EOFError:
+                pass
+            except (ValueError, socket.error) as e:
+                stderr.write('Client connection failed: %s\n' % e)
+            finally:
+                try:
+                    conn.shutdown(socket.SHUT_RDWR)
+                except socket.error:
+                    pass
+                conn.close()
+    finally:
+        sock.close()
+        os.remove(path)
+
+
+def run_daemon():
+    """kamaki-daemon [SOCKET PATH]"""
+    path = os.path.abspath(argv[1] if len(argv) > 1 else socket_path())
+    kamaki.cli._authenticators = dict()
+    stderr.write('kamaki daemon listening on %s\n' % path)
+    try:
+        serve(path)
+    except IOError as e:
+        stderr.write('%s\n' % e)
+        exit(1)
+    except KeyboardInterrupt:
+        pass
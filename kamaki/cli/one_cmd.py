@@ -32,9 +32,9 @@
 # or implied, of GRNET S.A.command
 
 from kamaki.cli import (
-    get_command_group, set_command_params, print_subcommands_help, exec_cmd,
-    update_parser_help, _groups_help, _load_spec_module,
-    init_cached_authenticator, kloger)
+    get_command_group, print_subcommands_help, exec_cmd,
+    update_parser_help, _groups_help, load_command_tree,
+    LazyAuthenticator, kloger)
 from kamaki.cli.errors import CLIUnknownCommand, CLIError
 
 
@@ -45,27 +45,18 @@ def run(cloud, parser):
         _groups_help(parser.arguments)
         exit(0)
 
-    nonargs = [term for term in parser.unparsed if not term.startswith('-')]
-    set_command_params(nonargs)
-
     global _best_match
     _best_match = []
 
     _cnf = parser.arguments['config']
-    group_spec = _cnf.get('global', '%s_cli' % group)
-    spec_module = _load_spec_module(group_spec, parser.arguments, 'namespaces')
-    if spec_module is None:
+    cmd_tree = load_command_tree(parser.arguments, group)
+    if cmd_tree is None:
         raise CLIUnknownCommand(
             'Could not find specs for %s commands' % group,
             details=[
                 'Make sure %s is a valid command group' % group,
                 'Refer to kamaki documentation for setting custom command',
                 'groups or overide existing ones'])
-    #  Get command tree from group
-    try:
-        cmd_tree = [t for t in spec_module.namespaces if t.name == group][0]
-    except IndexError:
-        raise CLIUnknownCommand('Unknown command group: %s' % group)
 
     cmd = None
     if _best_match:
@@ -87,7 +78,7 @@ def run(cloud, parser):
 
     _help = parser.arguments['help'].value
     if _help or not cmd.is_command:
-        if cmd.cmd_class:
+        if cmd.has_class:
             parser.required = getattr(cmd.cmd_class, 'required', None)
         parser.print_help()
         if getattr(cmd, 'long_help', False):
@@ -96,14 +87,12 @@ def run(cloud, parser):
         exit(0)
 
     cls = cmd.cmd_class
-    astakos, help_message = init_cached_authenticator(_cnf, cloud, kloger) if (
-        cloud) else (None, [])
+    #  Authenticate only if and when the command needs the identity service
+    astakos = LazyAuthenticator(_cnf, cloud, kloger) if cloud else None
     if not astakos:
         from kamaki.cli import is_non_api
         if not is_non_api(parser):
-            raise CLIError(
-                'Failed to initialize an identity client',
-                importance=3, details=help_message)
+            raise CLIError('Failed to initialize an identity client')
     executable = cls(parser.arguments, astakos, cloud)
     parser.required = getattr(cls, 'required', None)
     parser.update_arguments(executable.arguments)
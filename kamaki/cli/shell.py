@@ -176,6 +176,7 @@ class Shell(Cmd):
         tmp_args.pop('config', None)
         tmp_args.pop('ignore_ssl', None)
         tmp_args.pop('ca_file', None)
+        tmp_args.pop('stats', None)
         help_parser = ArgumentParseManager(
             cmd_name, tmp_args, required,
             syntax=syntax, description=descr, check_required=False)
@@ -227,7 +228,7 @@ class Shell(Cmd):
                             print('\nDetails:')
                             print('%s' % ldescr)
                         return
-                    cmd_parser.parse(cmd_args)
+                    cmd_parser.parse(cmd_args or None)
 
                     for name, arg in instance.arguments.items():
                         arg.value = getattr(
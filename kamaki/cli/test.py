@@ -34,7 +34,7 @@
 from unittest import makeSuite, TestSuite, TextTestRunner, TestCase
 from inspect import getmembers, isclass
 from tempfile import NamedTemporaryFile
-from mock import patch, call
+from mock import patch, call, MagicMock
 from itertools import product
 
 
@@ -408,6 +408,204 @@ class CLICmdSpecError(TestCase):
         self.assertEqual(clicse.importance, 0)
 
 
+class LazyAuthenticator(TestCase):
+
+    @patch('kamaki.cli.init_cached_authenticator')
+    def test_resolve(self, ICA):
+        from kamaki.cli import LazyAuthenticator, CLIError
+        astakos = LazyAuthenticator('config', 'cloud', 'logger')
+        astakos.invalidate()
+        self.assertFalse(ICA.mock_calls)
+
+        ICA.return_value = (type('C', (), dict(term='t')), [])
+        self.assertEqual(astakos.term, 't')
+        self.assertEqual(astakos.term, 't')
+        ICA.assert_called_once_with('config', 'cloud', 'logger')
+        self.assertRaises(AttributeError, getattr, astakos, '__nope__')
+
+        ICA.return_value = (None, ['help'])
+        astakos = LazyAuthenticator('config', 'cloud', 'logger')
+        try:
+            astakos.term
+            self.fail('CLIError not raised')
+        except CLIError as ce:
+            self.assertEqual(ce.details, ['help'])
+
+    @patch('kamaki.cli.init_cached_authenticator')
+    def test_user_term(self, ICA):
+        from kamaki.cli import LazyAuthenticator
+        from kamaki.clients.astakos.cache import AuthCache
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        path = mkdtemp()
+        try:
+            cnf = MagicMock()
+            cnf.get_cloud.side_effect = lambda c, k: dict(
+                url='http://a.u.th', token='t1 t2')[k]
+            cnf.get.side_effect = lambda s, k: dict(
+                auth_cache=path, auth_cache_ttl='300')[k]
+            config = type('A', (), dict(value=cnf))
+            astakos = LazyAuthenticator(config, 'cloud', 'logger')
+            AuthCache(path).set('http://a.u.th', 't1', dict(access=dict(
+                token=dict(id='t1', tenant=dict(id='p1')),
+                user=dict(id='u1', name='user'))))
+            self.assertEqual(astakos.user_term('id'), 'u1')
+            self.assertEqual(astakos.user_term('default_project'), 'p1')
+            self.assertEqual(astakos.user_term('id', 't1'), 'u1')
+            self.assertFalse(ICA.mock_calls)
+
+            identity = MagicMock()
+            identity.user_term.return_value = 'u2'
+            ICA.return_value = (identity, [])
+            self.assertEqual(astakos.user_term('id', 't2'), 'u2')
+            identity.user_term.assert_called_once_with('id', 't2')
+        finally:
+            rmtree(path)
+
+    def test_invalidate(self):
+        from kamaki import cli
+        identity, other = MagicMock(), MagicMock()
+        cli._authenticators = {('url', ('t1', )): identity, 'k': other}
+        try:
+            astakos = cli.LazyAuthenticator('config', 'cloud', 'logger')
+            astakos._astakos = identity
+            astakos.invalidate('t1')
+            identity.invalidate.assert_called_once_with('t1')
+            self.assertEqual(cli._authenticators, {'k': other})
+        finally:
+            cli._authenticators = None
+
+
+class CommandIndex(TestCase):
+
+    def test__spec_source(self):
+        from os import stat
+        from kamaki.cli import _spec_source
+        from kamaki.cli.cmds import pithos
+        path, mtime = _spec_source('pithos')
+        self.assertEqual(path, pithos.__file__.rstrip('c'))
+        self.assertEqual(mtime, stat(path).st_mtime)
+        self.assertEqual(_spec_source('n0n3x1st3nt'), None)
+
+    @patch('kamaki.cli.kloger')
+    def test__command_loader(self, kloger):
+        from kamaki.cli import _command_loader, CLIError
+        from kamaki.cli.cmds.config import config_get
+        config = type('Config', (), dict(get=lambda *args: None))()
+        loader = _command_loader(dict(config=config), 'config', 'config')
+        self.assertEqual(loader('config_get'), config_get)
+        self.assertRaises(CLIError, loader, 'config_gone')
+
+
+class Daemon(TestCase):
+
+    def setUp(self):
+        import socket
+        self.client, self.server = socket.socketpair()
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def test_chunks(self):
+        from kamaki.daemon import send_chunk, recv_chunk
+        for chunk in (('A', 'term'), ('R', ''), ('1', 'x' * 100000)):
+            send_chunk(self.client, *chunk)
+            self.assertEqual(recv_chunk(self.server), chunk)
+        self.client.close()
+        self.assertRaises(EOFError, recv_chunk, self.server)
+
+    def test_handle(self):
+        import os
+        import sys
+        from sys import stdout, stderr
+        from kamaki import daemon
+        from kamaki.clients import Client
+        from kamaki.cli.daemon import handle, read_request
+
+        def run_one_cmd():
+            from kamaki.cli import argv
+            Client.LOG_DATA = True
+            stdout.write('%s %s\n' % (
+                ' '.join(argv), os.environ['KAMAKI_TEST']))
+            stderr.write(sys.stdin.read())
+            exit(3)
+
+        for term in ('kamaki', 'file', 'list'):
+            daemon.send_chunk(self.client, daemon.ARG, term)
+        daemon.send_chunk(self.client, daemon.ENV, 'KAMAKI_TEST=a=b')
+        daemon.send_chunk(self.client, daemon.CWD, '/')
+        daemon.send_chunk(self.client, daemon.RUN)
+        daemon.send_chunk(self.client, daemon.STDIN, 'some input')
+        daemon.send_chunk(self.client, daemon.STDIN)
+        cwd, argv, stdin = os.getcwd(), sys.argv[:], sys.stdin
+        log_data = Client.LOG_DATA
+        with patch('kamaki.cli.daemon.run_one_cmd', run_one_cmd):
+            handle(self.server)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(sys.argv, argv)
+        self.assertTrue(sys.stdin is stdin)
+        self.assertEqual(Client.LOG_DATA, log_data)
+        self.assertFalse('KAMAKI_TEST' in os.environ)
+
+        outputs = {daemon.STDOUT: '', daemon.STDERR: ''}
+        chunk_type, payload = daemon.recv_chunk(self.client)
+        while chunk_type != daemon.EXIT:
+            outputs[chunk_type] += payload
+            chunk_type, payload = daemon.recv_chunk(self.client)
+        self.assertEqual(payload, '3')
+        self.assertEqual(outputs, {
+            daemon.STDOUT: 'kamaki file list a=b\n',
+            daemon.STDERR: 'some input'})
+
+        daemon.send_chunk(self.client, daemon.STDOUT, 'unexpected')
+        self.assertRaises(ValueError, read_request, self.server)
+
+
+class BatchRun(TestCase):
+
+    def test__commands(self):
+        from kamaki.cli.cmds.batch import batch_run
+        script = [
+            'server list\n', '\n', '# a comment\n',
+            '  kamaki file upload "my file" /pithos/f\n', 'kamaki\n',
+            'wait\n']
+        self.assertEqual(list(batch_run._commands.im_func(None, script)), [
+            (1, u'server list', ['server', 'list']),
+            (4, u'kamaki file upload "my file" /pithos/f', [
+                'file', 'upload', 'my file', '/pithos/f']),
+            (6, u'wait', ['wait'])])
+
+    def test__run_concurrently(self):
+        from time import sleep
+        from kamaki.cli.cmds.batch import batch_run
+        from kamaki.cli.errors import CLISyntaxError
+        reports, options = [], dict(parallel=2, keep_going=False)
+
+        def _prepare(terms):
+            if terms == ['bad']:
+                raise CLISyntaxError('bad')
+            return lambda out, err: sleep(0.1)
+
+        def _report(lineno, line, exception, out=None, err=None):
+            reports.append((lineno, bool(exception)))
+            return not exception
+
+        batch = type('B', (), dict(
+            _prepare=staticmethod(_prepare), _report=staticmethod(_report),
+            __getitem__=lambda self, key: options[key], total=0))()
+        commands = [
+            (1, 'slow', ['slow']), (2, 'bad', ['bad']),
+            (3, 'slow', ['slow']), (4, 'never', ['slow'])]
+        batch_run._run_concurrently.im_func(batch, iter(commands))
+        self.assertEqual(reports, [(1, False), (2, True)])
+
+        reports[:], options['keep_going'] = [], True
+        batch_run._run_concurrently.im_func(batch, iter(commands))
+        self.assertEqual(
+            reports, [(1, False), (2, True), (3, False), (4, False)])
+
+
 #  TestCase auxiliary methods
 
 def runTestCase(cls, test_name, args=[], failure_collector=[]):
@@ -32,13 +32,14 @@
 
 from urllib2 import quote, unquote
 from urlparse import urlparse
-from threading import Thread
+from threading import Thread, Condition, Event, Lock
+from Queue import Queue, Empty
 from json import dumps, loads
 from time import time
-from httplib import ResponseNotReady, HTTPException
+from httplib import HTTPException
 from time import sleep
-from random import random
 import logging
+import socket
 import ssl
 import re
 
@@ -46,7 +47,8 @@ from kamaki.clients.utils import https
 from kamaki.clients import utils
 
 
-TIMEOUT = 60.0   # seconds
+CONNECT_TIMEOUT = 10.0   # seconds
+TIMEOUT = 60.0   # seconds, for each read of a response
 HTTP_METHODS = ['GET', 'POST', 'PUT', 'HEAD', 'DELETE', 'COPY', 'MOVE']
 DEBUGV = logging.DEBUG + 1
 
@@ -106,11 +108,23 @@ class KamakiSSLError(ClientError):
     """SSL Connection Error"""
 
 
+def _trace(tracer, event, **info):
+    """Call tracer(event, info), never let a tracer break a request"""
+    try:
+        tracer(event, info)
+    except Exception as e:
+        log.debug('Tracer %s failed on %s: %s', tracer, event, e)
+
+
 class Logged(object):
 
     LOG_TOKEN = False
     LOG_DATA = False
     LOG_PID = False
+    #  A callable(event, info) to receive structured request traces, where
+    #  event is "request", "response", "stream" or "error" and info a dict
+    #  (see kamaki.clients.utils.metrics.MetricsCollector)
+    TRACER = None
     _token = None
 
 
@@ -153,22 +167,34 @@ class RequestManager(Logged):
         self.method, self.data = method, data
         self.scheme, self.netloc = self._connection_info(url, path, params)
         self._headers_to_quote, self._header_prefices = [], []
+        #  Seconds spent on each phase of the last perform
+        self.timings = dict()
+        self.connect_timeout, self.read_timeout = CONNECT_TIMEOUT, TIMEOUT
 
     def dump_log(self):
+        if self.TRACER:
+            _trace(
+                self.TRACER, 'request', method=self.method,
+                url='%s://%s%s' % (self.scheme, self.netloc, self.path),
+                size=len(self.data) if self.data else 0)
+        if not sendlog.isEnabledFor(DEBUGV):
+            return
         plog = ('\t[%s]' % self) if self.LOG_PID else ''
-        sendlog.log(DEBUGV, '%s %s://%s%s%s' % (
-            self.method, self.scheme, self.netloc, self.path, plog))
+        sendlog.log(
+            DEBUGV, '%s %s://%s%s%s',
+            self.method, self.scheme, self.netloc, self.path, plog)
         for key, val in self.headers.items():
             if key.lower() in ('x-auth-token', ) and not self.LOG_TOKEN:
                 self._token, val = val, '...'
-            sendlog.log(DEBUGV, '  %s: %s%s' % (key, val, plog))
+            sendlog.log(DEBUGV, '  %s: %s%s', key, val, plog)
         if self.data:
-            sendlog.log(DEBUGV, 'data size: %s%s' % (len(self.data), plog))
+            sendlog.log(DEBUGV, 'data size: %s%s', len(self.data), plog)
             if self.LOG_DATA:
-                sendlog.log(DEBUGV, utils.escape_ctrl_chars(self.data.replace(
-                    self._token, '...') if self._token else self.data))
+                data = '%s' % self.data
+                sendlog.log(DEBUGV, utils.escape_ctrl_chars(data.replace(
+                    self._token, '...') if self._token else data))
         else:
-            sendlog.log(DEBUGV, 'data size: 0%s' % plog)
+            sendlog.log(DEBUGV, 'data size: 0%s', plog)
 
     def _encode_headers(self):
         headers = dict()
@@ -189,23 +215,41 @@ class RequestManager(Logged):
         """
         self._encode_headers()
         self.dump_log()
+        timings = self.timings = dict()
         try:
+            if getattr(conn, 'sock', True) is None:
+                #  Connect explicitly, to bound and time connection setup
+                conn.timeout = self.connect_timeout
+                start = time()
+                try:
+                    conn.connect()
+                except socket.timeout:
+                    raise ClientError('Connection to %s timed out (%ss)' % (
+                        self.netloc, self.connect_timeout))
+                timings.update(
+                    getattr(conn, 'timings', None) or dict(
+                        connect=time() - start))
+            #  Blocking reads, bounded by read_timeout, also on reconnects
+            conn.timeout = self.read_timeout
+            if getattr(conn, 'sock', None) is not None:
+                conn.sock.settimeout(self.read_timeout)
+            start = time()
             conn.request(
                 method=self.method.upper(),
                 url=self.path.encode('utf-8'),
                 headers=self.headers,
                 body=self.data)
+            timings['send'] = time() - start
             sendlog.log(DEBUGV, '')
-            keep_trying = TIMEOUT
-            while keep_trying > 0:
-                try:
-                    return conn.getresponse()
-                except ResponseNotReady:
-                    wait = 0.03 * random()
-                    sleep(wait)
-                    keep_trying -= wait
+            start = time()
+            r = conn.getresponse()
+            timings['wait'] = time() - start
+            return r
+        except socket.timeout:
+            pass
         except ssl.SSLError as ssle:
-            raise KamakiSSLError('SSL Connection error (%s)' % ssle)
+            if 'timed out' not in ('%s' % ssle):
+                raise KamakiSSLError('SSL Connection error (%s)' % ssle)
         plog = ('\t[%s]' % self) if self.LOG_PID else ''
         logmsg = 'Kamaki Timeout %s %s%s' % (self.method, self.path, plog)
         recvlog.log(DEBUGV, logmsg)
@@ -233,18 +277,29 @@ class RequestManager(Logged):
 class ResponseManager(Logged):
     """Manage the http request and handle the response data, headers, etc."""
 
-    def __init__(self, request, poolsize=None, connection_retry_limit=0):
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+            self, request, poolsize=None, connection_retry_limit=0,
+            stream=False):
         """
         :param request: (RequestManager)
 
         :param poolsize: (int) the size of the connection pool
 
         :param connection_retry_limit: (int)
+
+        :param stream: (bool) do not read the response body with the headers.
+            Read it with iter_content, which keeps the connection out of the
+            pool until the body is consumed, or with content
         """
         self.CONNECTION_TRY_LIMIT = 1 + connection_retry_limit
         self.request = request
         self._request_performed = False
         self.poolsize = poolsize
+        self.stream = stream
+        self.streamed_bytes = 0
+        self._connection, self._response = None, None
         self._headers_to_decode, self._header_prefices = [], []
 
     def _get_headers_to_decode(self, headers):
@@ -263,45 +318,63 @@ class ResponseManager(Logged):
             return
 
         pool_kw = dict(size=self.poolsize) if self.poolsize else dict()
+        debug = recvlog.isEnabledFor(DEBUGV)
         for retries in range(1, self.CONNECTION_TRY_LIMIT + 1):
+            pooled, connection = https.PooledHTTPConnection(
+                self.request.netloc, self.request.scheme, **pool_kw), None
+            start = time()
             try:
-                with https.PooledHTTPConnection(
-                        self.request.netloc, self.request.scheme,
-                        **pool_kw) as connection:
-                    self.request.LOG_TOKEN = self.LOG_TOKEN
-                    self.request.LOG_DATA = self.LOG_DATA
-                    self.request.LOG_PID = self.LOG_PID
-                    r = self.request.perform(connection)
-                    plog = ''
-                    if self.LOG_PID:
-                        recvlog.log(DEBUGV, '\n%s <-- %s <-- [req: %s]\n' % (
-                            self, r, self.request))
-                        plog = '\t[%s]' % self
-                    self._request_performed = True
-                    self._status_code, self._status = r.status, unquote(
-                        r.reason)
+                connection = pooled.acquire()
+                self.request.LOG_TOKEN = self.LOG_TOKEN
+                self.request.LOG_DATA = self.LOG_DATA
+                self.request.LOG_PID = self.LOG_PID
+                self.request.TRACER = self.TRACER
+                r = self.request.perform(connection)
+                plog = ''
+                if self.LOG_PID and debug:
                     recvlog.log(
-                        DEBUGV,
-                        '%d %s%s' % (self.status_code, self.status, plog))
-                    self._headers = dict()
-
-                    r_headers = r.getheaders()
-                    enc_headers = self._get_headers_to_decode(r_headers)
+                        DEBUGV, '\n%s <-- %s <-- [req: %s]\n',
+                        self, r, self.request)
+                    plog = '\t[%s]' % self
+                self._request_performed = True
+                self._status_code, self._status = r.status, unquote(
+                    r.reason)
+                if debug:
+                    recvlog.log(
+                        DEBUGV, '%d %s%s', self.status_code, self.status, plog)
+                self._headers = dict()
+
+                r_headers = r.getheaders()
+                enc_headers = self._get_headers_to_decode(r_headers)
+                for k, v in r_headers:
+                    self._headers[k] = unquote(v).decode('utf-8') if (
+                        k.lower()) in enc_headers else v
+                if debug:
                     for k, v in r_headers:
-                        self._headers[k] = unquote(v).decode('utf-8') if (
-                            k.lower()) in enc_headers else v
-                        recvlog.log(DEBUGV, '  %s: %s%s' % (k, v, plog))
+                        recvlog.log(DEBUGV, '  %s: %s%s', k, v, plog)
+                if self.stream:
+                    self._content = ''
+                    self._connection, self._response = pooled, r
+                    pooled = None
+                else:
+                    receive_start = time()
                     self._content = r.read()
-                    recvlog.log(DEBUGV, 'data size: %s%s' % (
-                        len(self._content) if self._content else 0, plog))
-                    if self.LOG_DATA and self._content:
-                        data = '%s%s' % (self._content, plog)
-                        data = utils.escape_ctrl_chars(data)
-                        if self._token:
-                            data = data.replace(self._token, '...')
-                        recvlog.log(DEBUGV, data)
+                    self.request.timings['receive'] = time() - receive_start
+                    self._log_content(plog)
+                if self.TRACER:
+                    _trace(
+                        self.TRACER, 'response', method=self.request.method,
+                        url=self.request.url, status=self.status_code,
+                        size=None if self.stream else len(self._content),
+                        elapsed=time() - start, retries=retries - 1,
+                        timings=dict(self.request.timings))
                 break
             except Exception as err:
+                if self.TRACER:
+                    _trace(
+                        self.TRACER, 'error', method=self.request.method,
+                        url=self.request.url, error=err,
+                        elapsed=time() - start)
                 if isinstance(err, HTTPException):
                     if retries >= self.CONNECTION_TRY_LIMIT:
                         raise ClientError(
@@ -312,6 +385,82 @@ class ResponseManager(Logged):
                     recvlog.log(
                         DEBUGV, '\n'.join(['%s' % type(err)] + format_stack()))
                     raise
+            finally:
+                if pooled and connection is not None:
+                    pooled.release()
+
+    def _log_content(self, plog=''):
+        if not recvlog.isEnabledFor(DEBUGV):
+            return
+        recvlog.log(
+            DEBUGV, 'data size: %s%s',
+            len(self._content) if self._content else 0, plog)
+        if self.LOG_DATA and self._content:
+            data = '%s%s' % (self._content, plog)
+            data = utils.escape_ctrl_chars(data)
+            if self._token:
+                data = data.replace(self._token, '...')
+            recvlog.log(DEBUGV, data)
+
+    def iter_content(self, chunk_size=None):
+        """Iterate over the response body in chunks of up to chunk_size bytes
+        A streamed body is read from the connection while iterating and can
+        be iterated only once
+
+        :param chunk_size: (int) default: CHUNK_SIZE
+        """
+        self._get_response()
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        r, self._response = self._response, None
+        if r is None:
+            content = self._content or ''
+            for start in xrange(0, len(content), chunk_size):
+                yield content[start:start + chunk_size]
+            return
+        receiving = 0.0
+        try:
+            while True:
+                start = time()
+                try:
+                    chunk = r.read(chunk_size)
+                except HTTPException as err:
+                    raise ClientError('Connection to %s failed (%s: %s)' % (
+                        self.request.url, type(err), err))
+                receiving += time() - start
+                if not chunk:
+                    break
+                self.streamed_bytes += len(chunk)
+                yield chunk
+            #  httplib stops at a truncated body without an error
+            missing = getattr(r, 'length', None)
+            if missing:
+                raise ClientError(
+                    'Connection to %s failed (%s bytes read, %s more '
+                    'expected)' % (
+                        self.request.url, self.streamed_bytes, missing))
+        finally:
+            self._release(r)
+            recvlog.log(
+                DEBUGV, 'data size: %s (streamed)', self.streamed_bytes)
+            if self.TRACER:
+                _trace(
+                    self.TRACER, 'stream', method=self.request.method,
+                    url=self.request.url, size=self.streamed_bytes,
+                    elapsed=receiving)
+
+    def _release(self, r):
+        """Return the connection of a streamed response to the pool"""
+        if not r.isclosed():
+            #  Unread data would spoil the next response on this connection
+            self._connection.obj.close()
+        self._connection.release()
+        self._connection = None
+
+    def close(self):
+        """Drop the unread body of a streamed response, if any"""
+        r, self._response = self._response, None
+        if r is not None:
+            self._release(r)
 
     @property
     def status_code(self):
@@ -328,9 +477,15 @@ class ResponseManager(Logged):
         self._get_response()
         return self._headers
 
+    def _read_stream(self):
+        if self._response is not None:
+            self._content = ''.join(self.iter_content())
+            self._log_content()
+
     @property
     def content(self):
         self._get_response()
+        self._read_stream()
         return self._content
 
     @property
@@ -339,6 +494,7 @@ class ResponseManager(Logged):
         :returns: (str) content
         """
         self._get_response()
+        self._read_stream()
         return '%s' % self._content
 
     @property
@@ -365,6 +521,7 @@ class ResponseManager(Logged):
         :returns: (dict) squeezed from json-formated content
         """
         self._get_response()
+        self._read_stream()
         try:
             return loads(self._content)
         except ValueError as err:
@@ -385,14 +542,257 @@ class SilentEvent(Thread):
     def value(self):
         return getattr(self, '_value', None)
 
+    def run(self):
+        _run_silently(self)
+
+
+def _run_silently(event):
+    """Run event.method, store the result in event._value and any exception
+    in event._exception"""
+    try:
+        event._value = event.method(*(event.args), **(event.kwargs))
+    except Exception as e:
+        estatus = e.status if isinstance(e, ClientError) else ''
+        recvlog.debug('Thread %s got exception %s\n<%s %s' % (
+            event, type(e), estatus, e))
+        event._exception = e
+
+
+class PooledEvent(object):
+    """A method(*args, **kwargs) call, to be run by a WorkerPool thread
+    It exposes the SilentEvent interface (value, exception, isAlive, join)
+    """
+
+    def __init__(self, method, *args, **kwargs):
+        self.method, self.args, self.kwargs = method, args, kwargs
+        self._finished = Event()
+
+    @property
+    def exception(self):
+        return getattr(self, '_exception', False)
+
+    @property
+    def value(self):
+        return getattr(self, '_value', None)
+
+    def isAlive(self):
+        return not self._finished.isSet()
+
+    is_alive = isAlive
+
+    def join(self, timeout=None):
+        self._finished.wait(timeout)
+
     def run(self):
         try:
-            self._value = self.method(*(self.args), **(self.kwargs))
-        except Exception as e:
-            estatus = e.status if isinstance(e, ClientError) else ''
-            recvlog.debug('Thread %s got exception %s\n<%s %s' % (
-                self, type(e), estatus, e))
-            self._exception = e
+            _run_silently(self)
+        finally:
+            self._finished.set()
+
+
+class WorkerPool(object):
+    """A bounded pool of reusable threads for running PooledEvents
+
+    At most "size" events are in flight (queued or running) at any time. A
+    submit call blocks until there is a free slot. Threads are started on
+    demand and retire after idle_timeout seconds without work.
+    """
+
+    def __init__(self, size=1, idle_timeout=2.0):
+        assert isinstance(size, int) and size > 0, 'Pool size not a +int'
+        self.size, self.idle_timeout = size, idle_timeout
+        self._queue = Queue()
+        self._cond = Condition()
+        self._pending, self._workers = 0, 0
+
+    @property
+    def pending(self):
+        """:returns: (int) the number of queued or running events"""
+        return self._pending
+
+    @property
+    def workers(self):
+        """:returns: (int) the number of live worker threads"""
+        return self._workers
+
+    def resize(self, size):
+        """Change the maximum number of events in flight"""
+        assert isinstance(size, int) and size > 0, 'Pool size not a +int'
+        with self._cond:
+            self.size = size
+            self._cond.notify_all()
+
+    def submit(self, method, *args, **kwargs):
+        """Schedule method(*args, **kwargs), block while the pool is full
+
+        :returns: (PooledEvent)
+        """
+        event = PooledEvent(method, *args, **kwargs)
+        with self._cond:
+            while self._pending >= self.size:
+                self._cond.wait()
+            self._pending += 1
+            if self._workers < self._pending:
+                self._workers += 1
+                worker = Thread(target=self._work)
+                worker.daemon = True
+                worker.start()
+        self._queue.put(event)
+        return event
+
+    def join(self):
+        """Block until all submitted events are finished"""
+        with self._cond:
+            while self._pending:
+                self._cond.wait()
+
+    def _work(self):
+        while True:
+            try:
+                event = self._queue.get(timeout=self.idle_timeout)
+            except Empty:
+                with self._cond:
+                    if self._workers > self._pending:
+                        self._workers -= 1
+                        return
+                continue
+            try:
+                event.run()
+            finally:
+                with self._cond:
+                    self._pending -= 1
+                    self._cond.notify_all()
+
+
+class ConcurrencyController(object):
+    """Decide how many block transfers may be in flight (the window)
+
+    Transfer methods report each finished transfer with record. Every time
+    "window" transfers are reported, a round is complete and update is
+    called with the round throughput (bytes/sec) and error rate. This class
+    keeps a fixed window; subclasses override update to adapt it.
+    """
+
+    def __init__(self, max_window=1, min_window=1, window=None):
+        assert max_window >= min_window > 0, 'Invalid window limits'
+        self.min_window, self._max_window = min_window, max_window
+        self._window = max_window if window is None else window
+        self._window = min(max(self._window, min_window), max_window)
+        self._lock = Lock()
+        self.throughput, self.error_rate = 0.0, 0.0
+        self.transfers, self.errors, self.transferred_bytes = 0, 0, 0
+        self._round_start, self._round_bytes = None, 0
+        self._round_transfers, self._round_errors = 0, 0
+
+    @property
+    def window(self):
+        """(int) the number of transfers allowed in flight"""
+        return self._window
+
+    @window.setter
+    def window(self, window):
+        self._window = min(max(int(window), self.min_window), self.max_window)
+
+    @property
+    def max_window(self):
+        return self._max_window
+
+    @max_window.setter
+    def max_window(self, max_window):
+        if max_window != self._max_window:
+            self._max_window = max(max_window, self.min_window)
+            self.window = self._window
+
+    def record(self, nbytes, elapsed, failed=False):
+        """Report a finished transfer (thread safe)
+
+        :param nbytes: (int) bytes transferred
+
+        :param elapsed: (float) duration of the transfer in seconds
+
+        :param failed: (bool) whether the transfer failed
+        """
+        with self._lock:
+            now = time()
+            if self._round_start is None:
+                self._round_start = now - elapsed
+            self.transfers += 1
+            self.transferred_bytes += nbytes
+            self._round_transfers += 1
+            self._round_bytes += nbytes
+            if failed:
+                self.errors += 1
+                self._round_errors += 1
+            if self._round_transfers < self._window:
+                return
+            duration = now - self._round_start
+            self.throughput = (
+                self._round_bytes / duration) if duration > 0 else 0.0
+            self.error_rate = float(
+                self._round_errors) / self._round_transfers
+            old_window = self._window
+            self.update(self.throughput, self.error_rate)
+            if old_window != self._window:
+                log.debug('Transfer window %s -> %s (%d B/s, %.2f errors)' % (
+                    old_window, self._window, self.throughput,
+                    self.error_rate))
+            self._round_start, self._round_bytes = now, 0
+            self._round_transfers, self._round_errors = 0, 0
+
+    def update(self, throughput, error_rate):
+        """Called at the end of each round, to adjust self.window"""
+
+
+class AIMDController(ConcurrencyController):
+    """Additive increase, multiplicative decrease of the transfer window
+
+    The window starts small and doubles every round (slow start), then grows
+    by one per round while the throughput does not drop. A round with an
+    error rate over error_threshold (e.g., 502 backpressure) multiplies the
+    window by decrease_factor. A throughput drop over tolerance (as a ratio)
+    shrinks the window by one.
+
+    Clients keep a fixed window of MAX_THREADS by default. To adapt it, set
+    client.concurrency = AIMDController(client.MAX_THREADS), or set the
+    CONCURRENCY_CONTROLLER of a client class to AIMDController.
+    """
+
+    def __init__(
+            self, max_window=1, min_window=1, window=None,
+            decrease_factor=0.5, tolerance=0.1, error_threshold=0.0):
+        super(AIMDController, self).__init__(
+            max_window, min_window, min_window if window is None else window)
+        self.decrease_factor = decrease_factor
+        self.tolerance = tolerance
+        self.error_threshold = error_threshold
+        self._threshold = max_window
+        self._last_throughput = 0.0
+
+    def update(self, throughput, error_rate):
+        if error_rate > self.error_threshold:
+            self._threshold = max(
+                self.min_window, int(self.window * self.decrease_factor))
+            self.window = self._threshold
+        elif throughput < self._last_throughput * (1.0 - self.tolerance):
+            self._threshold = max(self.min_window, self.window - 1)
+            self.window = self._threshold
+        elif self.window < self._threshold:
+            self.window = min(2 * self.window, self._threshold)
+        else:
+            self.window += 1
+        self._last_throughput = throughput
+
+
+def _response_size(r):
+    """The body size of a response. The body of a streamed response is not
+    read here: it may not be consumed yet, so use Content-Length instead"""
+    try:
+        if isinstance(r, ResponseManager) and r.stream:
+            return r.streamed_bytes or int(
+                r.headers.get('content-length', 0))
+        return len(r.content or '')
+    except Exception:
+        return 0
 
 
 def strip_version(url):
@@ -411,8 +811,13 @@ def strip_version(url):
 class Client(Logged):
     service_type = ''
     MAX_THREADS = 1
+    CONCURRENCY_CONTROLLER = ConcurrencyController
     DATE_FORMATS = ['%a %b %d %H:%M:%S %Y', ]
     CONNECTION_RETRY_LIMIT = 0
+    CONNECT_TIMEOUT = CONNECT_TIMEOUT
+    READ_TIMEOUT = TIMEOUT
+    #  Open connections ahead of concurrent transfers, see worker_pool
+    PREWARM = False
 
     def __init__(self, endpoint_url, token):
         endpoint_url = endpoint_url.rstrip('/')
@@ -463,6 +868,64 @@ class Client(Logged):
         for old, new in new_keys.items():
             headers[new] = headers.pop(old)
 
+    @property
+    def concurrency(self):
+        """The controller of the transfer window, up to MAX_THREADS
+        By default, an instance of CONCURRENCY_CONTROLLER, i.e., a fixed
+        window of MAX_THREADS transfers
+        """
+        controller = getattr(self, '_concurrency', None)
+        if controller is None:
+            controller = self._concurrency = self.CONCURRENCY_CONTROLLER(
+                self.MAX_THREADS)
+        controller.max_window = self.MAX_THREADS
+        return controller
+
+    @concurrency.setter
+    def concurrency(self, controller):
+        self._concurrency = controller
+
+    @property
+    def worker_pool(self):
+        """The bounded thread pool of this client, sized by the current
+        concurrency window. The connection pool of the endpoint host grows
+        to serve the window (plus the calling thread) and, if PREWARM, is
+        filled with connections in the background"""
+        window = self.concurrency.window
+        pool = getattr(self, '_worker_pool', None)
+        if pool is None:
+            pool = self._worker_pool = WorkerPool(window)
+        elif pool.size != window:
+            pool.resize(window)
+        else:
+            return pool
+        endpoint = urlparse(self.endpoint_url)
+        connections = https.get_pool(
+            endpoint.netloc, endpoint.scheme, size=window + 1)
+        if self.PREWARM:
+            connections.prewarm(window, timeout=self.CONNECT_TIMEOUT)
+        return pool
+
+    def _transfer_async(self, method, *args, **kwargs):
+        """Run a transfer method(*args, **kwargs) on the worker pool and
+        report its size, duration and outcome to the concurrency controller
+
+        :returns: (PooledEvent)
+        """
+        controller = self.concurrency
+
+        def transfer(*args, **kwargs):
+            start, nbytes = time(), len(kwargs.get('data', None) or '')
+            try:
+                r = method(*args, **kwargs)
+            except Exception:
+                controller.record(0, time() - start, failed=True)
+                raise
+            controller.record(nbytes + _response_size(r), time() - start)
+            return r
+
+        return self.worker_pool.submit(transfer, *args, **kwargs)
+
     def _init_thread_limit(self, limit=1):
         assert isinstance(limit, int) and limit > 0, 'Thread limit not a +int'
         self._thread_limit = limit
@@ -544,6 +1007,7 @@ class Client(Logged):
         These classes perform a lazy http request. Present method, by default,
         enforces them to perform the http call. Hint: call present method with
         success=None to get a non-performed ResponseManager object.
+        Call with stream=True to read the response body with iter_content.
         """
         assert isinstance(method, str) or isinstance(method, unicode)
         assert method
@@ -554,6 +1018,7 @@ class Client(Logged):
             params = dict(self.params)
             params.update(async_params)
             success = kwargs.pop('success', 200)
+            stream = kwargs.pop('stream', False)
             data = kwargs.pop('data', None)
             headers.setdefault('X-Auth-Token', self.token)
             if 'json' in kwargs:
@@ -569,15 +1034,18 @@ class Client(Logged):
                 data=data, headers=headers, params=params)
             req.headers_to_quote = self.request_headers_to_quote
             req.header_prefices = self.request_header_prefices_to_quote
+            req.connect_timeout = self.CONNECT_TIMEOUT
+            req.read_timeout = self.READ_TIMEOUT
             #  req.log()
             r = ResponseManager(
                 req,
                 poolsize=self.poolsize,
-                connection_retry_limit=self.CONNECTION_RETRY_LIMIT)
+                connection_retry_limit=self.CONNECTION_RETRY_LIMIT,
+                stream=stream)
             r.headers_to_decode = self.response_headers
             r.header_prefices = self.response_header_prefices
-            r.LOG_TOKEN, r.LOG_DATA, r.LOG_PID = (
-                self.LOG_TOKEN, self.LOG_DATA, self.LOG_PID)
+            r.LOG_TOKEN, r.LOG_DATA, r.LOG_PID, r.TRACER = (
+                self.LOG_TOKEN, self.LOG_DATA, self.LOG_PID, self.TRACER)
             r._token = headers['X-Auth-Token']
         finally:
             self.headers = dict()
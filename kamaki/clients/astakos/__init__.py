@@ -182,8 +182,13 @@ class CachedAstakosClient(Client):
     DEFAULT_API_VERSION = '2.0'
 
     @_astakos_error
-    def __init__(self, endpoint_url, token=None):
+    def __init__(self, endpoint_url, token=None, auth_cache=None):
+        """
+        :param auth_cache: (AuthCache) keep authentication responses on disk,
+            across client instances and processes
+        """
         super(CachedAstakosClient, self).__init__(endpoint_url, token)
+        self.auth_cache = auth_cache
         self._astakos = dict()
         self._uuids = dict()
         self._cache = dict()
@@ -219,7 +224,12 @@ class CachedAstakosClient(Client):
         astakos = LoggedAstakosClient(self.endpoint_url, token, logger=log)
         astakos.LOG_TOKEN = getattr(self, 'LOG_TOKEN', False)
         astakos.LOG_DATA = getattr(self, 'LOG_DATA', False)
-        r = astakos.authenticate()
+        r = self.auth_cache.get(self.endpoint_url, token) if (
+            self.auth_cache) else None
+        if r is None:
+            r = astakos.authenticate()
+            if self.auth_cache:
+                self.auth_cache.set(self.endpoint_url, token, r)
         uuid = r['access']['user']['id']
         self._uuids[token] = uuid
         self._cache[uuid] = r
@@ -228,6 +238,14 @@ class CachedAstakosClient(Client):
         self._usernames2uuids[uuid] = dict()
         return self._cache[uuid]
 
+    def invalidate(self, token=None):
+        """Drop the (cached) authentication information of a token, e.g.,
+        after a 401 response, so that it is authenticated again"""
+        token = self._resolve_token(token)
+        if self.auth_cache:
+            self.auth_cache.remove(self.endpoint_url, token)
+        self._uuids.pop(token, None)
+
     def remove_user(self, uuid):
         self._uuids.pop(self.get_token(uuid))
         self._cache.pop(uuid)
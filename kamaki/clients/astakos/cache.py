@@ -0,0 +1,139 @@
+# Copyright 2011-2015 GRNET S.A. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or
+# without modification, are permitted provided that the following
+# conditions are met:
+#
+#   1. Redistributions of source code must retain the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials
+#      provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY GRNET S.A. ``AS IS'' AND ANY EXPRESS
+# OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL GRNET S.A OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF
+# USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and
+# documentation are those of the authors and should not be
+# interpreted as representing official policies, either expressed
+# or implied, of GRNET S.A.
+
+
+import os
+import json
+from calendar import timegm
+from hashlib import sha256
+from logging import getLogger
+from tempfile import mkstemp
+from time import time, strptime
+
+LOG = getLogger(__name__)
+
+
+def _token_expires(r):
+    """:returns: (float) the expiration timestamp of the token of an
+    authentication response (ISO 8601, e.g., 2013-07-14T10:07:42.48+00:00),
+    or None if it is missing or unparsable
+    """
+    try:
+        date = r['access']['token']['expires']
+        offset = date[19:].lstrip('.0123456789')
+        timestamp = timegm(strptime(date[:19], '%Y-%m-%dT%H:%M:%S'))
+        if offset and offset[0] in '+-':
+            digits = offset[1:].replace(':', '')
+            delta = 3600 * int(digits[:2]) + 60 * int(digits[2:4] or 0)
+            timestamp -= delta if offset[0] == '+' else -delta
+    except (KeyError, TypeError, ValueError):
+        return None
+    return timestamp
+
+
+class AuthCache(object):
+    """On-disk cache of authentication responses
+
+    Each entry holds the response of an authentication call (user info and
+    service catalog) for an authentication URL and token, for up to ttl
+    seconds, or until the token expires, if sooner. Entries are named after
+    a hash of the URL and the token and are readable by their owner only,
+    since they contain the token.
+    """
+
+    def __init__(self, path, ttl=300):
+        """
+        :param path: (str) the directory to store cache entries in. It is
+            created (with user-only permissions) if it does not exist
+
+        :param ttl: (int) the lifetime of entries in seconds, 0 to disable
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.ttl = ttl
+
+    def _entry(self, url, token):
+        key = '%s\n%s' % (url, token)
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return os.path.join(self.path, sha256(key).hexdigest())
+
+    def get(self, url, token):
+        """
+        :returns: (dict) the cached authentication response or None on
+            cache miss
+        """
+        if self.ttl <= 0:
+            return None
+        entry = self._entry(url, token)
+        try:
+            with open(entry) as f:
+                cached = json.load(f)
+            expires, r = cached['expires'], cached['access']
+            valid = cached['url'] == url and r['token']['id'] == token
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+        if not valid or expires < time() or expires > time() + self.ttl:
+            return None
+        LOG.debug('Authentication cache hit for %s' % url)
+        return dict(access=r)
+
+    def set(self, url, token, r):
+        """Store an authentication response, silently fail on I/O errors"""
+        if self.ttl <= 0:
+            return
+        entry = self._entry(url, token)
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0700)
+            expires = time() + self.ttl
+            token_expires = _token_expires(r)
+            if token_expires is not None:
+                expires = min(expires, token_expires)
+            fd, tmp = mkstemp(dir=self.path)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(dict(
+                        url=url, expires=expires, access=r['access']), f)
+                os.rename(tmp, entry)
+            except Exception:
+                os.remove(tmp)
+                raise
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            LOG.debug('Failed to cache authentication for %s: %s' % (url, e))
+
+    def remove(self, url, token):
+        """Invalidate the cached entry of a token, if any"""
+        try:
+            os.remove(self._entry(url, token))
+        except OSError:
+            pass
@@ -251,6 +251,61 @@ class CachedAstakosClient(TestCase):
         self.assertEqual(self.client._astakos[uuid].LOG_TOKEN, 'tkn')
         self.assertEqual(self.client._astakos[uuid].LOG_DATA, 'dt')
 
+    @patch(
+        '%s.LoggedAstakosClient.authenticate' % astakos_pkg,
+        return_value=example)
+    def test_auth_cache(self, authenticate):
+        from copy import deepcopy
+        from json import load
+        from os import listdir, stat
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from time import gmtime, strftime, time
+        from kamaki.clients.astakos.cache import AuthCache
+        valid = deepcopy(example)
+        valid['access']['token']['expires'] = strftime(
+            '%Y-%m-%dT%H:%M:%S.123456+00:00', gmtime(time() + 3600))
+        authenticate.return_value = valid
+        cache_dir = mkdtemp()
+        try:
+            cache = AuthCache(cache_dir, ttl=60)
+            self.client.auth_cache = cache
+            self.assertEqual(self.client.authenticate(), valid)
+            url = self.client.endpoint_url
+            self.assertEqual(cache.get(url, self.token), valid)
+            self.assertEqual(cache.get(url, 'other token'), None)
+            self.assertEqual(cache.get('http://other.url', self.token), None)
+            entry = listdir(cache_dir)[0]
+            self.assertFalse(self.token in entry)
+            mode = stat('%s/%s' % (cache_dir, entry)).st_mode
+            self.assertEqual(mode & 0077, 0)
+
+            other = astakos.CachedAstakosClient(
+                self.url, self.token, auth_cache=cache)
+            self.assertEqual(other.authenticate(), valid)
+            authenticate.assert_called_once_with()
+
+            other.invalidate()
+            self.assertEqual(listdir(cache_dir), [])
+            self.assertFalse(self.token in other._uuids)
+            other.user_info()
+            self.assertEqual(authenticate.call_count, 2)
+
+            #  Tokens that expire before the ttl are cached until then
+            cache.set(url, self.token, example)
+            self.assertEqual(cache.get(url, self.token), None)
+            valid['access']['token']['expires'] = strftime(
+                '%Y-%m-%dT%H:%M:%S+02:00', gmtime(time() + 7210))
+            cache.set(url, self.token, valid)
+            self.assertEqual(cache.get(url, self.token), valid)
+            with open('%s/%s' % (cache_dir, listdir(cache_dir)[0])) as f:
+                self.assertTrue(load(f)['expires'] <= time() + 10)
+
+            cache.ttl = 0
+            self.assertEqual(cache.get(url, self.token), None)
+        finally:
+            rmtree(cache_dir)
+
     @patch(
         '%s.CachedAstakosClient.get_token' % astakos_pkg, return_value='t1')
     def test_remove_user(self, get_token):
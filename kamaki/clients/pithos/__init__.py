@@ -31,17 +31,24 @@
 # interpreted as representing official policies, either expressed
 # or implied, of GRNET S.A.
 
-from threading import enumerate as activethreads
-
+import os
 from os import fstat
+from mmap import mmap, ACCESS_READ
 from hashlib import new as newhashlib
-from time import time
+from time import time, sleep, strptime
+from calendar import timegm
+from fnmatch import fnmatchcase
 from StringIO import StringIO
 from logging import getLogger
 
-from binascii import hexlify
+from binascii import hexlify, unhexlify
+from collections import deque
+from itertools import chain
+from copy import copy
+from threading import Lock
+from multiprocessing import cpu_count
 
-from kamaki.clients import SilentEvent
+from kamaki.clients import WorkerPool, SilentEvent
 from kamaki.clients.pithos.rest_api import PithosRestClient
 from kamaki.clients.storage import ClientError
 from kamaki.clients.utils import path4url, filter_in, readall
@@ -49,18 +56,81 @@ from kamaki.clients.utils import path4url, filter_in, readall
 LOG = getLogger(__name__)
 
 
-def _dump_buffer(buffer_, destination):
-    """Append buffer to destination (file descriptor)"""
-    destination.write(buffer_)
-    destination.flush()
+def _zero_padding_start(block, chunk=65536):
+    """:returns: (int) the offset of the trailing zero bytes of block"""
+    end = len(block)
+    while end and block[end - 1] == '\x00':
+        start = max(end - chunk, 0)
+        data = block[start:end].rstrip('\x00')
+        if data:
+            return start + len(data)
+        end = start
+    return end
 
 
 def _pithos_hash(block, blockhash):
+    """Hash a block (str or buffer) without its trailing zero bytes"""
     h = newhashlib(blockhash)
-    h.update(block.rstrip('\x00'))
+    block = str(block) if isinstance(block, unicode) else block
+    h.update(buffer(block, 0, _zero_padding_start(block)))
     return h.hexdigest()
 
 
+_seek_and_write_lock = Lock()
+
+
+def _pwrite(fd, data, offset):
+    """Write all data to fd at offset. Use os.pwrite where available, so
+    that concurrent writers do not share the file offset
+    """
+    pwrite, written = getattr(os, 'pwrite', None), 0
+    while written < len(data):
+        chunk = buffer(data, written)
+        if pwrite:
+            written += pwrite(fd, chunk, offset + written)
+            continue
+        with _seek_and_write_lock:
+            os.lseek(fd, offset + written, os.SEEK_SET)
+            written += os.write(fd, chunk)
+
+
+def _preallocate(fileobj, size):
+    """Extend fileobj to size bytes before writing blocks in random order.
+    Use os.posix_fallocate to reserve disk space where available
+    """
+    fileobj.flush()
+    fd = fileobj.fileno()
+    if fstat(fd).st_size >= size:
+        return
+    fallocate = getattr(os, 'posix_fallocate', None)
+    if fallocate:
+        try:
+            return fallocate(fd, 0, size)
+        except EnvironmentError as ee:
+            LOG.debug('Failed to fallocate %s bytes: %s' % (size, ee))
+    os.ftruncate(fd, size)
+
+
+def _map_file(fileobj):
+    """:returns: a read-only memory map of fileobj, None if not mappable"""
+    try:
+        return mmap(fileobj.fileno(), 0, access=ACCESS_READ)
+    except (AttributeError, EnvironmentError, ValueError, OverflowError):
+        return None
+
+
+def _read_block(fileobj, mapped, offset, bytes):
+    """:returns: a block of fileobj, a buffer of mapped if not None"""
+    if mapped is not None:
+        return buffer(mapped, offset, bytes)
+    position = fileobj.tell()
+    fileobj.seek(offset)
+    try:
+        return readall(fileobj, bytes)
+    finally:
+        fileobj.seek(position)
+
+
 def _range_up(start, end, max_value, a_range):
     """
     :param start: (int) the window bottom
@@ -108,13 +178,106 @@ def _range_up(start, end, max_value, a_range):
     return ','.join(selected)
 
 
+def _merkle(hashes, blockhash):
+    """:returns: (str) the hex top hash of a hashmap, as listed by Pithos"""
+    if len(hashes) == 1:
+        return hashes[0]
+    if not hashes:
+        return newhashlib(blockhash).hexdigest()
+    level, size = [unhexlify(h) for h in hashes], 2
+    while size < len(level):
+        size *= 2
+    level += ['\x00' * len(level[0])] * (size - len(level))
+    while len(level) > 1:
+        level = [newhashlib(blockhash, level[i] + level[i + 1]).digest() for (
+            i) in range(0, len(level), 2)]
+    return hexlify(level[0])
+
+
+def _parse_last_modified(value):
+    """:returns: (float) the timestamp of an ISO 8601 date, as listed by
+    Pithos (e.g., 2013-02-07T11:51:55.702751+00:00)
+    """
+    date, offset = value[:19], value[19:].lstrip('.0123456789')
+    timestamp = timegm(strptime(date, '%Y-%m-%dT%H:%M:%S'))
+    if offset and offset[0] in '+-':
+        hours, _, minutes = offset[1:].partition(':')
+        delta = 3600 * int(hours) + 60 * int(minutes or 0)
+        timestamp -= delta if offset[0] == '+' else -delta
+    return timestamp
+
+
+def _object_matches(
+        obj, name_pattern=None, modified_before=None, modified_after=None,
+        min_size=None, max_size=None):
+    """:returns: (bool) whether a listed object passes all given filters"""
+    if name_pattern and not fnmatchcase(obj['name'], name_pattern):
+        return False
+    size = int(obj.get('bytes', 0))
+    if (min_size is not None and size < min_size) or (
+            max_size is not None and size > max_size):
+        return False
+    if modified_before is not None or modified_after is not None:
+        modified = _parse_last_modified(obj['last_modified'])
+        if (modified_before is not None and modified >= modified_before) or (
+                modified_after is not None and modified <= modified_after):
+            return False
+    return True
+
+
+def _is_directory(obj):
+    """:returns: (bool) whether a listed object is a directory object"""
+    content_type = obj.get('content_type', '')
+    return any(t in content_type for t in (
+        'application/directory', 'application/folder'))
+
+
+def _is_transient(client_error):
+    """:returns: (bool) whether a failed request is worth retrying"""
+    return client_error.status in (0, 408, 429) or client_error.status >= 500
+
+
+def _hash_threads():
+    try:
+        return cpu_count()
+    except NotImplementedError:
+        return 1
+
+
 class PithosClient(PithosRestClient):
     """Synnefo Pithos+ API client"""
 
+    #  Block hashing threads (hashlib releases the GIL), None: one per CPU
+    HASH_THREADS = None
+
+    #  A local store of downloaded blocks (pithos.cache.BlockCache) or None
+    block_cache = None
+
     def __init__(self, endpoint_url, token, account=None, container=None):
         super(PithosClient, self).__init__(
             endpoint_url, token, account, container)
 
+    @property
+    def hash_pool(self):
+        """The bounded thread pool for calculating block hashes"""
+        size = self.HASH_THREADS or _hash_threads()
+        pool = getattr(self, '_hash_pool', None)
+        if pool is None:
+            pool = self._hash_pool = WorkerPool(size)
+        elif pool.size != size:
+            pool.resize(size)
+        return pool
+
+    def _clone(self):
+        """:returns: a copy of this client, to make requests from another
+        thread. The copy shares the worker pools and concurrency controller
+        """
+        #  Instantiate the pools to share, before copying
+        self.worker_pool, self.hash_pool
+        clone = copy(self)
+        clone.headers, clone.params = dict(), dict()
+        return clone
+
     def use_alternative_account(self, func, *args, **kwargs):
         """Run method with an alternative account UUID, as long as kwargs
            contain a non-None "alternative_account" argument
@@ -266,9 +429,7 @@ class PithosClient(PithosRestClient):
 
     # upload_* auxiliary methods
     def _put_block_async(self, data, hash):
-        event = SilentEvent(method=self._put_block, data=data, hash=hash)
-        event.start()
-        return event
+        return self._transfer_async(self._put_block, data=data, hash=hash)
 
     def _put_block(self, data, hash):
         r = self.container_post(
@@ -330,52 +491,166 @@ class PithosClient(PithosRestClient):
             success=success)
         return (None if r.status_code == 201 else r.json), r.headers
 
+    def _hash_blocks(self, fileobj, blocksize, blockhash, size, mapped=None):
+        """Read blocks sequentially and hash them in the hash pool threads
+        Blocks of mappable files are buffers of a memory map, not copies
+
+        :param mapped: the memory map of fileobj, if the caller has one
+
+        :yields: (hash, offset, bytes) for each block, in file order
+        """
+        def hashed(event, offset, bytes):
+            event.join()
+            if event.exception:
+                raise event.exception
+            return event.value, offset, bytes
+
+        flying, offset = deque(), 0
+        mapped = _map_file(fileobj) if mapped is None else mapped
+        start = 0 if mapped is None else fileobj.tell()
+        while offset < size:
+            bytes = min(blocksize, size - offset)
+            block = readall(fileobj, bytes) if mapped is None else buffer(
+                mapped, start + offset, bytes)
+            bytes = len(block)
+            if bytes <= 0:
+                break
+            flying.append((
+                self.hash_pool.submit(_pithos_hash, block, blockhash),
+                offset,
+                bytes))
+            offset += bytes
+            while flying and not flying[0][0].isAlive():
+                yield hashed(*flying.popleft())
+        while flying:
+            yield hashed(*flying.popleft())
+
     def _calculate_blocks_for_upload(
             self, blocksize, blockhash, size, nblocks, hashes, hmap, fileobj,
             hash_cb=None):
-        offset = 0
+        total = 0
         if hash_cb:
             hash_gen = hash_cb(nblocks)
             hash_gen.next()
 
-        for i in xrange(nblocks):
-            block = readall(fileobj, min(blocksize, size - offset))
-            bytes = len(block)
-            if bytes <= 0:
-                break
-            hash = _pithos_hash(block, blockhash)
+        for hash, offset, bytes in self._hash_blocks(
+                fileobj, blocksize, blockhash, size):
             hashes.append(hash)
             hmap[hash] = (offset, bytes)
-            offset += bytes
+            total += bytes
             if hash_cb:
                 hash_gen.next()
         msg = ('Failed to calculate uploading blocks: '
-               'read bytes(%s) != requested size (%s)' % (offset, size))
-        assert offset == size, msg
+               'read bytes(%s) != requested size (%s)' % (total, size))
+        assert total == size, msg
 
-    def _upload_missing_blocks(self, missing, hmap, fileobj, upload_gen=None):
-        """upload missing blocks asynchronously"""
+    def _pipeline_blocks_for_upload(
+            self, blocksize, blockhash, size, nblocks, hashes, hmap, fileobj,
+            hash_cb=None, upload_cb=None):
+        """Calculate block hashes like _calculate_blocks_for_upload, but
+        upload each block as soon as it is hashed
+
+        The server is not asked for the missing blocks first, since it only
+        tells in response to a hashmap PUT, which creates an object. So,
+        blocks already on the server are sent again (and stored once).
+        Repeated blocks of the file are sent once.
 
-        self._init_thread_limit()
+        The uploads stay in flight while the next blocks are hashed, and
+        are waited for only when the worker pool is full, or in the end.
+        Blocks that fail to upload are left to upload_object.
 
+        :returns: the upload progress generator, if upload_cb is given
+        """
+        if hash_cb:
+            hash_gen = hash_cb(nblocks)
+            hash_gen.next()
+        upload_gen = None
+        if upload_cb:
+            upload_gen = upload_cb(nblocks)
+            upload_gen.next()
+
+        def advance_upload():
+            if upload_gen:
+                try:
+                    upload_gen.next()
+                except Exception:
+                    LOG.debug('Progress bar failure')
+
+        def reap(flying, block=False):
+            unfinished = []
+            for event in flying:
+                if block:
+                    event.join()
+                if event.isAlive():
+                    unfinished.append(event)
+                elif event.exception:
+                    submitted.discard(event.kwargs['hash'])
+                else:
+                    advance_upload()
+            return unfinished
+
+        submitted, flying, total = set(), [], 0
+        mapped = _map_file(fileobj)
+        try:
+            for hash, offset, bytes in self._hash_blocks(
+                    fileobj, blocksize, blockhash, size, mapped):
+                hashes.append(hash)
+                hmap[hash] = (offset, bytes)
+                total += bytes
+                if hash_cb:
+                    hash_gen.next()
+                if hash in submitted:
+                    advance_upload()
+                else:
+                    submitted.add(hash)
+                    flying.append(self._put_block_async(
+                        _read_block(fileobj, mapped, offset, bytes), hash))
+                flying = reap(flying)
+        finally:
+            reap(flying, block=True)
+        msg = ('Failed to calculate uploading blocks: '
+               'read bytes(%s) != requested size (%s)' % (total, size))
+        assert total == size, msg
+        return upload_gen
+
+    def _load_cached_blocks_for_upload(
+            self, blocksize, blockhash, size, nblocks, hashes, hmap, cached,
+            hash_cb=None):
+        """Fill hashes and hmap from a cached hashmap instead of hashing"""
+        if len(cached) != nblocks:
+            return False
+        for i, hash in enumerate(cached):
+            offset = i * blocksize
+            hashes.append(hash)
+            hmap[hash] = (offset, min(blocksize, size - offset))
+        if hash_cb:
+            hash_gen = hash_cb(nblocks)
+            for i in xrange(nblocks + 1):
+                hash_gen.next()
+        return True
+
+    def _upload_missing_blocks(self, missing, hmap, fileobj, upload_gen=None):
+        """upload missing blocks asynchronously
+
+        :returns: (list) the events of the blocks that failed to upload
+        """
         flying = []
         failures = []
+        mapped = _map_file(fileobj)
         for hash in missing:
             offset, bytes = hmap[hash]
-            fileobj.seek(offset)
-            data = readall(fileobj, bytes)
-            r = self._put_block_async(data, hash)
-            flying.append(r)
-            unfinished = self._watch_thread_limit(flying)
-            for thread in set(flying).difference(unfinished):
-                if thread.exception:
+            if mapped is None:
+                fileobj.seek(offset)
+                data = readall(fileobj, bytes)
+            else:
+                data = buffer(mapped, offset, bytes)
+            flying.append(self._put_block_async(data, hash))
+            unfinished = []
+            for thread in flying:
+                if thread.isAlive():
+                    unfinished.append(thread)
+                elif thread.exception:
                     failures.append(thread)
-                    if isinstance(
-                            thread.exception,
-                            ClientError) and thread.exception.status == 502:
-                        self.POOLSIZE = self._thread_limit
-                elif thread.isAlive():
-                    flying.append(thread)
                 elif upload_gen:
                     try:
                         upload_gen.next()
@@ -393,7 +668,7 @@ class PithosClient(PithosRestClient):
                 except:
                     pass
 
-        return [failure.kwargs['hash'] for failure in failures]
+        return failures
 
     def upload_object(
             self, obj, f,
@@ -409,7 +684,9 @@ class PithosClient(PithosRestClient):
             sharing=None,
             public=None,
             container_info_cache=None,
-            target_account=None):
+            target_account=None,
+            hashmap_cache=None,
+            pipeline=False):
         """Upload an object using multiple connections (threads)
 
         :param obj: (str) remote object path
@@ -447,6 +724,14 @@ class PithosClient(PithosRestClient):
         :param target_account: (str) the UUID of the account the object will be
             allocated at, if different to the client account (e.g., when
             user A uploads something to a location owned by user B)
+
+        :param hashmap_cache: (HashmapCache) if given, reuse the block hashes
+            of a previous upload of the same, unmodified local file and store
+            the hashes of the file, if they had to be calculated
+
+        :param pipeline: (bool) upload blocks while hashing, instead of
+            waiting for the whole hashmap to upload the missing ones only.
+            Faster for new files, but blocks already on the server are sent
         """
         self._assert_container()
 
@@ -458,12 +743,30 @@ class PithosClient(PithosRestClient):
         hashes, hmap = [], {}
         content_type = content_type or 'application/octet-stream'
 
-        self._calculate_blocks_for_upload(
-            *block_info,
-            hashes=hashes,
-            hmap=hmap,
-            fileobj=f,
-            hash_cb=hash_cb)
+        cache_key, cached, upload_gen = None, None, None
+        if hashmap_cache:
+            cache_key = hashmap_cache.key(f, size, blocksize, blockhash)
+            cached = hashmap_cache.get(cache_key)
+        if not (cached and self._load_cached_blocks_for_upload(
+                *block_info, hashes=hashes, hmap=hmap, cached=cached,
+                hash_cb=hash_cb)):
+            if pipeline:
+                upload_gen = self._pipeline_blocks_for_upload(
+                    *block_info,
+                    hashes=hashes,
+                    hmap=hmap,
+                    fileobj=f,
+                    hash_cb=hash_cb,
+                    upload_cb=upload_cb)
+            else:
+                self._calculate_blocks_for_upload(
+                    *block_info,
+                    hashes=hashes,
+                    hmap=hmap,
+                    fileobj=f,
+                    hash_cb=hash_cb)
+            if hashmap_cache:
+                hashmap_cache.set(cache_key, hashes)
 
         hashmap = dict(bytes=size, hashes=hashes)
         missing, obj_headers = self.use_alternative_account(
@@ -481,7 +784,7 @@ class PithosClient(PithosRestClient):
         if missing is None:
             return obj_headers
 
-        if upload_cb:
+        if upload_cb and not upload_gen:
             upload_gen = upload_cb(len(hashmap['hashes']))
             for i in range(len(hashmap['hashes']) + 1 - len(missing)):
                 try:
@@ -489,15 +792,14 @@ class PithosClient(PithosRestClient):
                 except:
                     LOG.debug('Progress bar failure')
                     break
-        else:
-            upload_gen = None
 
         retries = 7
         while retries:
             LOG.debug('%s blocks missing' % len(missing))
             num_of_blocks = len(missing)
-            missing = self._upload_missing_blocks(
+            failures = self._upload_missing_blocks(
                 missing, hmap, f, upload_gen)
+            missing = [failure.kwargs['hash'] for failure in failures]
             if missing:
                 if num_of_blocks == len(missing):
                     retries -= 1
@@ -506,10 +808,9 @@ class PithosClient(PithosRestClient):
             else:
                 break
         if missing:
-            try:
-                details = ['%s' % thread.exception for thread in missing]
-            except Exception:
-                details = ['Also, failed to read thread exceptions']
+            if hashmap_cache:
+                hashmap_cache.remove(cache_key)
+            details = ['%s' % failure.exception for failure in failures]
             raise ClientError(
                 '%s blocks failed to upload' % len(missing),
                 details=details)
@@ -531,6 +832,153 @@ class PithosClient(PithosRestClient):
             alternative_account=target_account)
         return r.headers
 
+    def update_object(
+            self, obj, f,
+            size=None,
+            hash_cb=None,
+            upload_cb=None,
+            if_etag_match=None,
+            content_encoding=None,
+            content_disposition=None,
+            content_type=None,
+            sharing=None,
+            public=None,
+            container_info_cache=None,
+            target_account=None,
+            hashmap_cache=None):
+        """Update an object by uploading only the blocks of the local file
+        which are not in the remote object hashmap (block-delta update)
+
+        The local block hashes (from hashmap_cache, if possible) are compared
+        to the remote hashmap, the new blocks are uploaded and the object is
+        updated with a single hashmap PUT. If the object does not exist or
+        has a different block size or hash, upload it with upload_object
+
+        Arguments are as in upload_object
+
+        :returns: (dict) response headers
+        """
+        self._assert_container()
+        upload_args = dict(
+            size=size, hash_cb=hash_cb, upload_cb=upload_cb,
+            if_etag_match=if_etag_match, content_encoding=content_encoding,
+            content_disposition=content_disposition,
+            content_type=content_type, sharing=sharing, public=public,
+            container_info_cache=container_info_cache,
+            target_account=target_account, hashmap_cache=hashmap_cache)
+        block_info = self.use_alternative_account(
+            self._get_file_block_info, f, size, container_info_cache,
+            alternative_account=target_account)
+        blocksize, blockhash, size, nblocks = block_info
+        try:
+            remote = self.use_alternative_account(
+                self.get_object_hashmap, obj,
+                alternative_account=target_account)
+        except ClientError as ce:
+            if ce.status not in (404, ):
+                raise
+            remote = None
+        if not remote or (
+                int(remote.get('block_size', 0)) != blocksize or (
+                    remote.get('block_hash') != blockhash)):
+            return self.upload_object(obj, f, **upload_args)
+
+        hashes, hmap, cache_key, cached = [], {}, None, None
+        if hashmap_cache:
+            cache_key = hashmap_cache.key(f, size, blocksize, blockhash)
+            cached = hashmap_cache.get(cache_key)
+        if not (cached and self._load_cached_blocks_for_upload(
+                *block_info, hashes=hashes, hmap=hmap, cached=cached,
+                hash_cb=hash_cb)):
+            self._calculate_blocks_for_upload(
+                *block_info, hashes=hashes, hmap=hmap, fileobj=f,
+                hash_cb=hash_cb)
+            if hashmap_cache:
+                hashmap_cache.set(cache_key, hashes)
+
+        known = set(remote.get('hashes', []))
+        missing = [h for h in hmap if h not in known]
+        LOG.debug('%s of %s blocks changed' % (len(missing), nblocks))
+        upload_gen = upload_cb(len(missing)) if upload_cb else None
+        if upload_gen:
+            upload_gen.next()
+        for attempt in range(3):
+            if missing:
+                missing = [failure.kwargs['hash'] for failure in (
+                    self._upload_missing_blocks(
+                        missing, hmap, f, upload_gen))]
+                if missing:
+                    continue
+            missing, obj_headers = self.use_alternative_account(
+                self._create_object_or_get_missing_hashes, obj,
+                dict(bytes=size, hashes=hashes),
+                content_type=content_type or 'application/octet-stream',
+                size=size,
+                if_etag_match=if_etag_match,
+                content_encoding=content_encoding,
+                content_disposition=content_disposition,
+                permissions=sharing,
+                public=public,
+                alternative_account=target_account)
+            if missing is None:
+                return obj_headers
+        if hashmap_cache:
+            hashmap_cache.remove(cache_key)
+        raise ClientError('%s blocks failed to upload' % len(missing))
+
+    def _upload_file(self, local_path, obj, delta=False, **kwargs):
+        client = self._clone()
+        if local_path is None:
+            client.account = kwargs.get('target_account') or client.account
+            return client.create_directory(obj)
+        upload = client.update_object if delta else client.upload_object
+        if delta:
+            kwargs.pop('pipeline', None)
+        with open(local_path, 'rb') as f:
+            return upload(obj, f, **kwargs)
+
+    def upload_objects(self, uploads, threads=4, **kwargs):
+        """Upload local files and create directory objects, several at once
+
+        Each upload runs on a clone of this client. All clones share a
+        container info cache, the block transfer pool and the concurrency
+        controller, so MAX_THREADS still bounds the block uploads in flight
+
+        :param uploads: iterable of (local path, remote object, kwargs), where
+            kwargs are upload_object arguments for this file only, or
+            delta=True to update an existing object with update_object. A
+            None local path stands for a directory object. Files are opened
+            just before they are uploaded
+
+        :param threads: (int) the number of files to upload at once
+
+        :param kwargs: upload_object arguments for all files (e.g.,
+            hashmap_cache, target_account), but no progress callbacks
+
+        :returns: (generator) of (local path, remote object, result) in the
+            order of uploads, where result is either the response headers or
+            the exception that failed the upload
+        """
+        pool = WorkerPool(threads)
+        kwargs.setdefault('container_info_cache', dict())
+        flying = deque()
+        try:
+            for local_path, obj, file_kwargs in uploads:
+                file_kwargs = dict(kwargs, **(file_kwargs or {}))
+                flying.append((local_path, obj, pool.submit(
+                    self._upload_file, local_path, obj, **file_kwargs)))
+                while flying and not flying[0][2].isAlive():
+                    local_path, obj, event = flying.popleft()
+                    yield local_path, obj, event.exception or event.value
+            while flying:
+                local_path, obj, event = flying.popleft()
+                event.join()
+                yield local_path, obj, event.exception or event.value
+        except KeyboardInterrupt:
+            LOG.debug('- - - wait for threads to finish')
+            pool.join()
+            raise
+
     def upload_from_string(
             self, obj, input_str,
             hash_cb=None,
@@ -590,7 +1038,8 @@ class PithosClient(PithosRestClient):
         hmap = {}
         for blockid in range(nblocks):
             start = blockid * blocksize
-            block = input_str[start: (start + blocksize)]
+            block = buffer(input_str, start, blocksize) if isinstance(
+                input_str, str) else input_str[start: (start + blocksize)]
             hashes.append(_pithos_hash(block, blockhash))
             hmap[hashes[blockid]] = (start, block)
 
@@ -622,16 +1071,15 @@ class PithosClient(PithosRestClient):
                 failures = []
                 for hash in missing:
                     offset, block = hmap[hash]
-                    bird = self._put_block_async(block, hash)
-                    flying.append(bird)
-                    unfinished = self._watch_thread_limit(flying)
-                    for thread in set(flying).difference(unfinished):
+                    flying.append(self._put_block_async(block, hash))
+                    unfinished = []
+                    for thread in flying:
+                        if thread.isAlive():
+                            unfinished.append(thread)
+                            continue
                         if thread.exception:
                             failures.append(thread.kwargs['hash'])
-                        if thread.isAlive():
-                            flying.append(thread)
-                        else:
-                            self._cb_next()
+                        self._cb_next()
                     flying = unfinished
                 for thread in flying:
                     thread.join()
@@ -646,8 +1094,7 @@ class PithosClient(PithosRestClient):
                 raise ClientError('%s blocks failed to upload' % len(missing))
         except KeyboardInterrupt:
             LOG.debug('- - - wait for threads to finish')
-            for thread in activethreads():
-                thread.join()
+            self.worker_pool.join()
             raise
         self._cb_next()
 
@@ -701,15 +1148,16 @@ class PithosClient(PithosRestClient):
                     self._cb_next()
                     continue
                 args['data_range'] = 'bytes=%s' % data_range
-                r = self.object_get(obj, success=(200, 206), **args)
+                r = self.object_get(
+                    obj, success=(200, 206), stream=True, **args)
+                for chunk in r.iter_content():
+                    dst.write(chunk)
                 self._cb_next()
-                dst.write(r.content)
                 dst.flush()
 
     def _get_block_async(self, obj, **args):
-        event = SilentEvent(self.object_get, obj, success=(200, 206), **args)
-        event.start()
-        return event
+        return self._transfer_async(
+            self.object_get, obj, success=(200, 206), **args)
 
     def _hash_from_file(self, fp, start, size, blockhash):
         fp.seek(start)
@@ -718,8 +1166,60 @@ class PithosClient(PithosRestClient):
         h.update(block.strip('\x00'))
         return hexlify(h.digest())
 
+    def _cached_block(self, block_hash, length, blockhash):
+        """:returns: (str) the block from the local block cache or None"""
+        if self.block_cache:
+            return self.block_cache.get(block_hash, length, blockhash)
+        return None
+
+    def _cache_block(self, block_hash, block, blockhash):
+        """Store a downloaded block in the cache, if it matches its hash"""
+        if not (self.block_cache and blockhash):
+            return
+        if _pithos_hash(block, blockhash) != block_hash:
+            LOG.debug('Block %s failed verification, not cached' % block_hash)
+            return
+        self.block_cache.put(block_hash, block)
+
+    def _get_block_to_file_async(self, obj, fd, positions, **args):
+        return self._transfer_async(
+            self._get_block_to_file, obj, fd, positions, **args)
+
+    def _get_block_to_file(
+            self, obj, fd, positions, block_hash=None, length=None,
+            blockhash=None, **args):
+        """GET a block and write it at every position of a file descriptor,
+        as it is received
+
+        :param block_hash: (str) if given, also store the block in the cache
+
+        :param blockhash: (str) the hash algorithm of block_hash
+
+        :param length: (int) the expected size of the block. The file is
+            preallocated, so a short block would leave zeros in it unnoticed
+
+        :raises ClientError: if less or more than length bytes are received
+        """
+        r = self.object_get(obj, success=(200, 206), stream=True, **args)
+        written, chunks = 0, []
+        for chunk in r.iter_content():
+            for position in positions:
+                _pwrite(fd, chunk, position + written)
+            written += len(chunk)
+            if block_hash and self.block_cache:
+                chunks.append(chunk)
+        if length is not None and written != length:
+            raise ClientError(
+                'Received %s bytes instead of %s for a block of %s' % (
+                    written, length, obj),
+                details=['Range: %s' % args.get(
+                    'async_headers', {}).get('Range')])
+        if chunks:
+            self._cache_block(block_hash, ''.join(chunks), blockhash)
+        return r
+
     def _thread2file(self, flying, blockids, local_file, offset=0, **restargs):
-        """write the results of a greenleted rest call to a file
+        """collect the finished block downloads (they write to the file)
 
         :param offset: the offset of the file up to blocksize
         - e.g. if the range is 10-100, all blocks will be written to
@@ -729,26 +1229,25 @@ class PithosClient(PithosRestClient):
             if g.isAlive():
                 continue
             if g.exception:
+                #  Blocks in flight write to the file, let them finish first
+                for thread in flying.values():
+                    thread.join()
                 raise g.exception
-            block = g.value.content
-            for block_start in blockids[key]:
-                # This should not be used in all cases
-                local_file.seek(block_start + offset)
-                local_file.write(block)
-                self._cb_next()
+            self._cb_next(len(blockids[key]))
             flying.pop(key)
             blockids.pop(key)
-        local_file.flush()
 
     def _dump_blocks_async(
             self, obj, remote_hashes, blocksize, total_size, local_file,
             blockhash=None, resume=False, filerange=None, **restargs):
         file_size = fstat(local_file.fileno()).st_size if resume else 0
+        if not filerange:
+            _preallocate(local_file, total_size)
+        fd = local_file.fileno()
         flying = dict()
         blockid_dict = dict()
         offset = 0
 
-        self._init_thread_limit()
         for block_hash, blockids in remote_hashes.items():
             blockids = [blk * blocksize for blk in blockids]
             unsaved = [blk for blk in blockids if not (
@@ -757,7 +1256,6 @@ class PithosClient(PithosRestClient):
             self._cb_next(len(blockids) - len(unsaved))
             if unsaved:
                 key = unsaved[0]
-                self._watch_thread_limit(flying.values())
                 self._thread2file(
                     flying, blockid_dict, local_file, offset,
                     **restargs)
@@ -770,9 +1268,25 @@ class PithosClient(PithosRestClient):
                 if not data_range:
                     self._cb_next()
                     continue
+                positions = [blk + offset for blk in unsaved]
+                whole = data_range == '%s-%s' % (key, end)
+                block = whole and self._cached_block(
+                    block_hash, end - key + 1, blockhash)
+                if block:
+                    for position in positions:
+                        _pwrite(fd, block, position)
+                    self._cb_next(len(unsaved))
+                    continue
                 restargs[
                     'async_headers'] = {'Range': 'bytes=%s' % data_range}
-                flying[key] = self._get_block_async(obj, **restargs)
+                first, _, last = data_range.partition('-')
+                flying[key] = self._get_block_to_file_async(
+                    obj, fd, positions,
+                    block_hash=block_hash if whole else None,
+                    length=None if ',' in data_range else (
+                        int(last) - int(first) + 1),
+                    blockhash=blockhash,
+                    **restargs)
                 blockid_dict[key] = unsaved
 
         for thread in flying.values():
@@ -862,6 +1376,174 @@ class PithosClient(PithosRestClient):
 
         self._complete_cb()
 
+    def _container_meta(self, cache=None):
+        """:returns: (dict) the container info, from cache if possible"""
+        if not isinstance(cache, dict):
+            return self.get_container_info()
+        if self.container not in cache:
+            cache[self.container] = self.get_container_info()
+        return cache[self.container]
+
+    def _download_small_object(self, obj, dst, info, blockhash):
+        """Download the current version of an object of up to one block with
+        a single GET. The object hash of the listing is the hash of its only
+        block, so it is used to look up the block cache instead of the object
+        hashmap
+        """
+        size, obj_hash = int(info['bytes']), info.get('hash')
+        data = self._cached_block(
+            obj_hash, size, blockhash) if obj_hash else None
+        if data is None:
+            r = self.object_get(obj)
+            data = r.content
+            if len(data) != size:
+                raise ClientError(
+                    'Received %s bytes instead of %s for object %s' % (
+                        len(data), size, obj),
+                    details=['The object may have changed after listing'])
+            if obj_hash:
+                self._cache_block(obj_hash, data, blockhash)
+        dst.seek(0)
+        dst.write(data)
+        dst.truncate(len(data))
+        return dict(info)
+
+    def _download_file(
+            self, obj, local_path, info=None, resume=False,
+            container_info_cache=None, **kwargs):
+        client = self._clone()
+        mode = 'rb+' if resume and os.path.exists(local_path) else 'wb+'
+        with open(local_path, mode) as dst:
+            meta = client._container_meta(container_info_cache)
+            #  The listing describes the current version, unconditionally
+            listed = not any(kwargs.get(k) for k in (
+                'range_str', 'version', 'if_match', 'if_none_match',
+                'if_modified_since', 'if_unmodified_since'))
+            if listed and info and 'bytes' in info and (
+                    int(info['bytes']) <= int(meta['x-container-block-size'])):
+                return client._download_small_object(
+                    obj, dst, info, meta['x-container-block-hash'])
+            headers = dict()
+            client.download_object(
+                obj, dst, resume=resume, headers=headers, **kwargs)
+            return headers
+
+    def download_objects(self, downloads, threads=4, **kwargs):
+        """Download remote objects to local files, several at once
+
+        Each download runs on a clone of this client. All clones share the
+        block transfer pool and the concurrency controller, so MAX_THREADS
+        bounds the block downloads in flight across all files. Objects of up
+        to one block (according to their listing info) are downloaded with
+        a single GET, skipping the hashmap request
+
+        :param downloads: iterable of (remote object, local path, info, kwargs)
+            where info is the object dict from the container listing (or
+            None) and kwargs are download arguments for this object only
+            (e.g., resume). Local files are opened just before they are
+            downloaded
+
+        :param threads: (int) the number of objects to download at once
+
+        :param kwargs: download_object arguments for all objects (e.g.,
+            if_modified_since), but no progress callbacks
+
+        :returns: (generator) of (remote object, local path, result) in the
+            order of downloads, where result is either the object headers or
+            the exception that failed the download
+        """
+        pool = WorkerPool(threads)
+        kwargs.setdefault('container_info_cache', dict())
+        self._container_meta(kwargs['container_info_cache'])
+        flying = deque()
+        try:
+            for obj, local_path, info, obj_kwargs in downloads:
+                obj_kwargs = dict(kwargs, **(obj_kwargs or {}))
+                flying.append((obj, local_path, pool.submit(
+                    self._download_file, obj, local_path, info, **obj_kwargs)))
+                while flying and not flying[0][2].isAlive():
+                    obj, local_path, event = flying.popleft()
+                    yield obj, local_path, event.exception or event.value
+            while flying:
+                obj, local_path, event = flying.popleft()
+                event.join()
+                yield obj, local_path, event.exception or event.value
+        except KeyboardInterrupt:
+            LOG.debug('- - - wait for threads to finish')
+            pool.join()
+            raise
+
+    def _local_hashes(self, local_path, blocksize, blockhash, cache=None):
+        """:returns: (list) the block hashes of a local file"""
+        with open(local_path, 'rb') as f:
+            size = fstat(f.fileno()).st_size
+            key = cache.key(f, size, blocksize, blockhash) if cache else None
+            hashes = cache.get(key) if cache else None
+            if hashes is None:
+                hashes = [h for h, offset, bytes in self._hash_blocks(
+                    f, blocksize, blockhash, size)]
+                if cache:
+                    cache.set(key, hashes)
+        return hashes
+
+    def diff_tree(
+            self, local_dir, prefix='',
+            hashmap_cache=None, container_info_cache=None):
+        """Compare a local directory tree with the objects under a prefix
+
+        Files and objects of the same size are compared by the top hash of
+        their hashmaps. Local files are hashed with the container block
+        size and hash, unless their hashes are found in hashmap_cache
+
+        :param local_dir: (str) the local directory
+
+        :param prefix: (str) the remote directory, the container if empty
+
+        :param hashmap_cache: (HashmapCache) to avoid re-hashing files
+
+        :param container_info_cache: (dict) see upload_object
+
+        :returns: (list) of (name, local path, remote info, equal) sorted by
+            name, where name is relative to local_dir and prefix (with "/"
+            separators), local path is None for remote-only objects, remote
+            info is the listed object (None for local-only files) and equal
+            is True if both exist and have the same contents. Directories
+            are paired with directory objects
+        """
+        meta = self._container_meta(container_info_cache)
+        blocksize = int(meta['x-container-block-size'])
+        blockhash = meta['x-container-block-hash']
+        prefix = prefix.strip('/')
+        start = len(prefix) + 1 if prefix else 0
+        remote = dict()
+        for obj in self.iter_objects(prefix=(prefix + '/') if prefix else ''):
+            name = obj['name'][start:].strip('/')
+            if name:
+                remote[name] = obj
+
+        diff, local_dir = [], os.path.abspath(local_dir)
+        for top, dirs, files in os.walk(local_dir):
+            rel = os.path.relpath(top, local_dir).replace(os.path.sep, '/')
+            rel = '' if rel == '.' else rel + '/'
+            for name in dirs + files:
+                local_path = os.path.join(top, name)
+                obj = remote.pop(rel + name, None)
+                if not obj:
+                    equal = False
+                elif name in dirs:
+                    equal = _is_directory(obj)
+                elif _is_directory(obj) or not os.path.isfile(local_path):
+                    equal = False
+                else:
+                    equal = int(obj['bytes']) == os.path.getsize(
+                        local_path) and obj.get('hash') == _merkle(
+                            self._local_hashes(
+                                local_path, blocksize, blockhash,
+                                hashmap_cache), blockhash)
+                diff.append((rel + name, local_path, obj, equal))
+        diff += [(name, None, obj, False) for name, obj in remote.items()]
+        return sorted(diff)
+
     def download_to_string(
             self, obj,
             download_cb=None,
@@ -927,18 +1609,24 @@ class PithosClient(PithosRestClient):
             self.progress_bar_gen = download_cb(len(hash_list))
             self._cb_next()
 
-        num_of_blocks = len(remote_hashes)
+        num_of_blocks = len(hash_list)
         ret = [''] * num_of_blocks
-        self._init_thread_limit()
-        flying = dict()
+        flying, cacheable = dict(), dict()
         try:
-            for blockid, blockhash in enumerate(remote_hashes):
+            for blockid, block_hash in enumerate(hash_list):
                 start = blocksize * blockid
                 is_last = start + blocksize > total_size
                 end = (total_size - 1) if is_last else (start + blocksize - 1)
                 data_range_str = _range_up(start, end, end, range_str)
-                if data_range_str:
-                    self._watch_thread_limit(flying.values())
+                block = None
+                if data_range_str == '%s-%s' % (start, end):
+                    cacheable[blockid] = block_hash
+                    block = self._cached_block(
+                        block_hash, end - start + 1, blockhash)
+                if block:
+                    ret[blockid] = block
+                    self._cb_next()
+                elif data_range_str:
                     restargs['data_range'] = 'bytes=%s' % data_range_str
                     flying[blockid] = self._get_block_async(obj, **restargs)
                 for runid, thread in flying.items():
@@ -949,33 +1637,49 @@ class PithosClient(PithosRestClient):
                     if thread.exception:
                         raise thread.exception
                     ret[runid] = thread.value.content
+                    if runid in cacheable:
+                        self._cache_block(
+                            cacheable[runid], ret[runid], blockhash)
                     self._cb_next()
                     flying.pop(runid)
             return ''.join(ret)
         except KeyboardInterrupt:
             LOG.debug('- - - wait for threads to finish')
-            for thread in activethreads():
-                thread.join()
+            self.worker_pool.join()
 
     def stream_down(self, obj, dst, buffer_blocks=4, **kwargs):
         """
-        Download obj to dst as a stream. Buffer-sized chunks are downloaded
-            sequentially, but the blocks of each chunk are downloaded
-            asynchronously, using the download_to_string method
+        Download obj to dst as a stream. Up to buffer_blocks block requests
+            are kept in flight and finished blocks are written to dst in
+            order, so at most buffer_blocks blocks are held in memory
         :param obj: (str) the remote object
         :param dst: a file descriptor allowing sequential writing
         :param buffer_blocks: (int) the size of the buffer in blocks. If it is
-            1, all blocks will be downloaded sequentially
+            1, the object is streamed to dst with a single request
         :param kwargs: (dict) keyword arguments for download_to_string method
         """
         buffer_blocks = 1 if buffer_blocks < 2 else buffer_blocks
-        hashmap = kwargs.get('hashmap', None)
         range_str = kwargs.pop('range_str', None)
+        #  Every request is conditional, so that changes are detected
+        restargs = dict(
+            version=kwargs.get('version', None),
+            if_etag_match=kwargs.get('if_match', None),
+            if_etag_not_match=kwargs.get('if_none_match', None),
+            if_modified_since=kwargs.get('if_modified_since', None),
+            if_unmodified_since=kwargs.get('if_unmodified_since', None))
+        if buffer_blocks == 1:
+            r = self.object_get(
+                obj,
+                data_range='bytes=%s' % range_str if range_str else None,
+                success=(200, 206),
+                stream=True,
+                **restargs)
+            for chunk in r.iter_content():
+                dst.write(chunk)
+            return
+        hashmap = kwargs.get('hashmap', None)
         if hashmap is None:
-            # Clean kwargs if it contains hashmap=None
-            kwargs.pop('hashmap', None)
-            # Get new hashmap
-            hashmap = kwargs['hashmap'] = self.get_object_hashmap(
+            hashmap = self.get_object_hashmap(
                 obj,
                 kwargs.get('version', None),
                 kwargs.get('if_match', None),
@@ -983,27 +1687,43 @@ class PithosClient(PithosRestClient):
                 kwargs.get('if_modified_since', None),
                 kwargs.get('if_unmodified_since', None))
         block_size, obj_size = int(hashmap['block_size']), hashmap['bytes']
-        buffer_size = buffer_blocks * block_size
-        event = None
-
-        def finish_event(e):
-            """Blocking: stop until e is finished or raise error"""
-            if e is not None:
-                if e.isAlive():
-                    e.join()
-                if e.exception:
-                    raise e.exception
-
-        for chunk_number in range(1 + obj_size // buffer_size):
-            start = chunk_number * buffer_size
-            end = start + buffer_size
-            end = (obj_size if (end > obj_size) else end) - 1
-            kwargs['range_str'] = _range_up(start, end, obj_size, range_str)
-            buffer_ = self.download_to_string(obj, **kwargs)
-            finish_event(event)
-            event = SilentEvent(_dump_buffer, buffer_, dst)
-            event.start()
-        finish_event(event)
+        blockhash = hashmap.get('block_hash')
+
+        def dump(entry):
+            """Blocking: wait for a block and write it, or raise its error"""
+            event, block, block_hash = entry
+            if event:
+                event.join()
+                if event.exception:
+                    raise event.exception
+                block = event.value.content
+                if block_hash:
+                    self._cache_block(block_hash, block, blockhash)
+            dst.write(block)
+
+        flying = deque()
+        for blockid, block_hash in enumerate(hashmap['hashes']):
+            start = blockid * block_size
+            end = min(start + block_size, obj_size) - 1
+            data_range = _range_up(start, end, obj_size, range_str)
+            if not data_range:
+                continue
+            while len(flying) >= buffer_blocks or (flying and not (
+                    flying[0][0] and flying[0][0].isAlive())):
+                dump(flying.popleft())
+            if data_range != '%s-%s' % (start, end):
+                block_hash = None
+            block = block_hash and self._cached_block(
+                block_hash, end - start + 1, blockhash)
+            if block:
+                flying.append((None, block, None))
+                continue
+            restargs['data_range'] = 'bytes=%s' % data_range
+            flying.append(
+                (self._get_block_async(obj, **restargs), None, block_hash))
+        while flying:
+            dump(flying.popleft())
+        dst.flush()
 
     # Command Progress Bar method
     def _cb_next(self, step=1):
@@ -1129,6 +1849,76 @@ class PithosClient(PithosRestClient):
         r = self.account_get()
         return r.json
 
+    def iter_object_pages(
+            self, page_size=10000, limit=None, marker=None, prefetch=True,
+            **kwargs):
+        """Follow limit/marker pagination of the container listing
+
+        The first page is requested before this method returns, so that
+        errors (e.g., missing container) are raised by the call itself.
+        Pages are requested through a clone of this client, so it is safe to
+        use the client while iterating.
+
+        :param page_size: (int) objects per request (the server may return
+            fewer than that)
+
+        :param limit: (int) the maximum number of objects to list in total
+
+        :param marker: (str) list objects lexicographically after marker
+
+        :param prefetch: (bool) request the next page in the background,
+            while the current one is being consumed
+
+        :param kwargs: container_get arguments (e.g., prefix, delimiter, path,
+            if_modified_since, if_unmodified_since, until, meta, public,
+            show_only_shared)
+
+        :returns: (iterator) of object lists (pages)
+        """
+        lister = self._clone()
+        kwargs.pop('format', None)
+
+        def get_page(marker, remaining):
+            size = page_size if remaining is None else min(
+                page_size, remaining)
+            r = lister.container_get(
+                limit=size, marker=marker, success=(200, 204), **kwargs)
+            return list(r.json or []) if r.status_code == 200 else []
+
+        def pages(page, remaining):
+            while page:
+                if remaining is not None:
+                    page = page[:remaining]
+                    remaining -= len(page)
+                last = page[-1]
+                next_marker = last.get('name', last.get('subdir'))
+                fetch = None
+                if prefetch and remaining != 0:
+                    fetch = SilentEvent(get_page, next_marker, remaining)
+                    fetch.start()
+                yield page
+                if remaining == 0:
+                    return
+                if fetch:
+                    fetch.join()
+                    if fetch.exception:
+                        raise fetch.exception
+                    page = fetch.value
+                else:
+                    page = get_page(next_marker, remaining)
+
+        return pages(get_page(marker, limit) if limit != 0 else [], limit)
+
+    def iter_objects(self, **kwargs):
+        """Iterate over the objects of the container, one page at a time
+
+        :param kwargs: iter_object_pages arguments
+
+        :returns: (iterator) of object info dicts
+        """
+        pages = self.iter_object_pages(**kwargs)
+        return (obj for page in pages for obj in page)
+
     def del_container(self, until=None, delimiter=None):
         """
         :param until: (str) formated date
@@ -1265,6 +2055,116 @@ class PithosClient(PithosRestClient):
         r = self.object_delete(obj, until=until, delimiter=delimiter)
         return r.headers
 
+    def _del_object_with_retries(self, obj, until=None, retries=3):
+        """Delete an object, retry on server or connection errors with an
+        exponential backoff. Deleting a missing object is not an error
+        """
+        path = path4url(self.account, self.container, obj)
+        params = dict(until=until) if until else dict()
+        for attempt in range(retries + 1):
+            try:
+                return self.delete(path, async_params=params, success=204)
+            except ClientError as ce:
+                if ce.status == 404:
+                    return None
+                if attempt >= retries or not _is_transient(ce):
+                    raise
+            sleep(0.1 * 2 ** attempt)
+
+    def delete_objects(
+            self, prefix=None, tree=None, objects=None, name_pattern=None,
+            modified_before=None, modified_after=None,
+            min_size=None, max_size=None,
+            until=None, dry_run=False, retries=3, **kwargs):
+        """Delete the objects of the container which match all filters
+
+        The container listing is paginated (see iter_object_pages) and the
+        deletions run concurrently, MAX_THREADS at most, on a pool of their
+        own. They are not block transfers, so they are not reported to the
+        concurrency controller
+
+        :param prefix: (str) only consider objects starting with prefix
+
+        :param tree: (str) only consider the object at this path and the
+            objects under it (i.e., prefixed with tree/). Unlike a prefix,
+            it does not reach siblings like tree2/...
+
+        :param objects: (iterable) listing dicts of the objects to consider,
+            instead of listing the container (e.g., from diff_tree)
+
+        :param name_pattern: (str) a shell-style pattern (e.g., "*.log")
+            matched against the whole object name
+
+        :param modified_before: (float) a timestamp, e.g., time() - 86400
+
+        :param modified_after: (float) a timestamp
+
+        :param min_size: (int) in bytes
+
+        :param max_size: (int) in bytes
+
+        :param until: (str) formated date, remove history until then
+
+        :param dry_run: (bool) report the matching objects, delete nothing
+
+        :param retries: (int) retries per object on transient errors
+
+        :param kwargs: iter_object_pages arguments (e.g., page_size)
+
+        :returns: (dict) a report with the number of "matched" and "deleted"
+            objects, the "failed" {name: error} deletions, the total "bytes"
+            of the matched objects and, on dry_run only, the matched
+            "objects" (the listing is not kept in memory otherwise)
+        """
+        self._assert_container()
+        report = dict(matched=0, deleted=0, failed=dict(), bytes=0)
+        if dry_run:
+            report['objects'] = []
+        pool, flying = WorkerPool(self.MAX_THREADS), deque()
+        if objects is not None:
+            listing = objects
+        elif tree:
+            tree = tree.rstrip('/')
+            #  If there is an object at tree, it is listed first
+            listing = chain([obj for obj in self.iter_objects(
+                prefix=tree, limit=1) if obj.get('name') == tree], (
+                    self.iter_objects(prefix=tree + '/', **kwargs)))
+        else:
+            listing = self.iter_objects(prefix=prefix, **kwargs)
+
+        def collect(block=False):
+            while flying and (block or not flying[0][1].isAlive()):
+                name, event = flying.popleft()
+                event.join()
+                if event.exception:
+                    LOG.debug('Failed to delete %s: %s' % (
+                        name, event.exception))
+                    report['failed'][name] = event.exception
+                else:
+                    report['deleted'] += 1
+
+        try:
+            for obj in listing:
+                if 'subdir' in obj or not _object_matches(
+                        obj, name_pattern, modified_before, modified_after,
+                        min_size, max_size):
+                    continue
+                report['matched'] += 1
+                report['bytes'] += int(obj.get('bytes', 0))
+                if dry_run:
+                    report['objects'].append(obj)
+                    continue
+                flying.append((obj['name'], pool.submit(
+                    self._del_object_with_retries, obj['name'],
+                    until=until, retries=retries)))
+                collect()
+            collect(block=True)
+        except KeyboardInterrupt:
+            LOG.debug('- - - wait for threads to finish')
+            pool.join()
+            raise
+        return report
+
     def set_object_meta(self, obj, metapairs):
         """
         :param obj: (str) remote object path
@@ -1401,23 +2301,20 @@ class PithosClient(PithosRestClient):
             self.progress_bar_gen = upload_cb(nblocks)
             self._cb_next()
         flying = {}
-        self._init_thread_limit()
         try:
             for i in range(nblocks):
                 block = source_file.read(min(blocksize, filesize - offset))
                 offset += len(block)
 
-                self._watch_thread_limit(flying.values())
                 unfinished = {}
-                flying[i] = SilentEvent(
-                    method=self.object_post,
+                flying[i] = self._transfer_async(
+                    self.object_post,
                     obj=obj,
                     update=True,
                     content_range='bytes */*',
                     content_type='application/octet-stream',
                     content_length=len(block),
                     data=block)
-                flying[i].start()
 
                 for key, thread in flying.items():
                     if thread.isAlive():
@@ -1432,11 +2329,8 @@ class PithosClient(PithosRestClient):
                 flying = unfinished
         except KeyboardInterrupt:
             LOG.debug('- - - wait for threads to finish')
-            for thread in activethreads():
-                thread.join()
+            self.worker_pool.join()
         finally:
-            from time import sleep
-            sleep(2 * len(activethreads()))
             self._cb_next()
         return headers.values()
 
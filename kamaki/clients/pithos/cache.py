@@ -0,0 +1,255 @@
+# Copyright 2011-2015 GRNET S.A. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or
+# without modification, are permitted provided that the following
+# conditions are met:
+#
+#   1. Redistributions of source code must retain the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials
+#      provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY GRNET S.A. ``AS IS'' AND ANY EXPRESS
+# OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL GRNET S.A OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF
+# USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and
+# documentation are those of the authors and should not be
+# interpreted as representing official policies, either expressed
+# or implied, of GRNET S.A.
+
+import os
+import json
+from hashlib import sha256, new as newhashlib
+from logging import getLogger
+from string import hexdigits
+from tempfile import mkstemp
+from threading import Lock
+
+LOG = getLogger(__name__)
+
+
+class HashmapCache(object):
+    """On-disk cache of local file hashmaps
+
+    Each entry holds the block hashes of a local file, as computed for a
+    given container block size and hash algorithm. An entry is valid as
+    long as the file path, inode, size and modification time are the same
+    as when the hashes were computed. Entries are stored as one json file
+    per (path, blocksize, blockhash), so re-hashing a file replaces its
+    previous entry.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: (str) the directory to store cache entries in. It is
+            created (with user-only permissions) if it does not exist
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+
+    @staticmethod
+    def _stat(fileobj):
+        """:returns: (path, stat) of a regular file at position 0, or None"""
+        try:
+            path, position = os.path.abspath(fileobj.name), fileobj.tell()
+            st = os.fstat(fileobj.fileno())
+        except (AttributeError, TypeError, IOError, OSError):
+            return None
+        if position or not os.path.isfile(path):
+            return None
+        return path, st
+
+    def _entry(self, path, blocksize, blockhash):
+        name = sha256('%s\n%s\n%s' % (
+            path.encode('utf-8') if isinstance(path, unicode) else path,
+            blocksize, blockhash)).hexdigest()
+        return os.path.join(self.path, name)
+
+    def key(self, fileobj, size, blocksize, blockhash):
+        """:returns: (dict) the cache key of a file or None if uncacheable"""
+        stat = self._stat(fileobj)
+        if not stat:
+            return None
+        path, st = stat
+        return dict(
+            path=path, inode=st.st_ino, size=size, mtime=st.st_mtime,
+            blocksize=blocksize, blockhash=blockhash)
+
+    def get(self, key):
+        """
+        :param key: (dict) as returned by key()
+
+        :returns: (list) the cached block hashes or None on cache miss
+        """
+        if not key:
+            return None
+        entry = self._entry(key['path'], key['blocksize'], key['blockhash'])
+        try:
+            with open(entry) as f:
+                cached = json.load(f)
+            key = json.loads(json.dumps(key))
+        except (IOError, OSError, ValueError):
+            return None
+        hashes = cached.pop('hashes', None)
+        if cached != key or not isinstance(hashes, list):
+            return None
+        LOG.debug('Hashmap cache hit for %s' % key['path'])
+        return hashes
+
+    def set(self, key, hashes):
+        """Store the block hashes of a file, silently fail on I/O errors
+
+        :param key: (dict) as returned by key() before hashing the file
+
+        :param hashes: (list) the block hashes of the file
+        """
+        if not key:
+            return
+        entry = self._entry(key['path'], key['blocksize'], key['blockhash'])
+        try:
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0700)
+            fd, tmp = mkstemp(dir=self.path)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(dict(key, hashes=hashes), f)
+                os.rename(tmp, entry)
+            except Exception:
+                os.remove(tmp)
+                raise
+        except (IOError, OSError, ValueError) as e:
+            LOG.debug('Failed to cache hashmap of %s: %s' % (key['path'], e))
+
+    def remove(self, key):
+        """Invalidate the cached entry of a file, if any"""
+        if key:
+            try:
+                os.remove(self._entry(
+                    key['path'], key['blocksize'], key['blockhash']))
+            except OSError:
+                pass
+
+
+class BlockCache(object):
+    """On-disk store of Pithos blocks, named after their block hashes
+
+    Blocks are stored without their trailing zero bytes (these are not
+    covered by the block hash) and are padded back on retrieval. When the
+    store grows larger than limit bytes, the least recently used blocks
+    are evicted.
+    """
+
+    def __init__(self, path, limit=1024 ** 3):
+        """
+        :param path: (str) the directory to store blocks in. It is created
+            (with user-only permissions) if it does not exist
+
+        :param limit: (int) the maximum size of the store in bytes
+        """
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.limit = limit
+        self._size = None
+        self._lock = Lock()
+
+    def _entry(self, block_hash):
+        if not block_hash or block_hash.strip(hexdigits):
+            return None
+        return os.path.join(self.path, block_hash.lower())
+
+    def get(self, block_hash, length, blockhash=None):
+        """
+        :param block_hash: (str) the (hex) block hash
+
+        :param length: (int) the block size in bytes, including trailing zeros
+
+        :param blockhash: (str) the hash algorithm of block_hash. If given,
+            a stored block that does not match block_hash is removed
+
+        :returns: (str) the block or None on cache miss
+        """
+        entry = self._entry(block_hash)
+        if not entry:
+            return None
+        try:
+            with open(entry, 'rb') as f:
+                block = f.read(length + 1)
+            os.utime(entry, None)
+        except (IOError, OSError):
+            return None
+        if len(block) > length:
+            return None
+        if blockhash and newhashlib(blockhash, block).hexdigest() != (
+                block_hash.lower()):
+            LOG.debug('Cached block %s is corrupted, removed' % block_hash)
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            return None
+        return block + '\x00' * (length - len(block))
+
+    def put(self, block_hash, block):
+        """Store a block, silently fail on I/O errors"""
+        entry = self._entry(block_hash)
+        if not entry:
+            return
+        block = ('%s' % block).rstrip('\x00')
+        try:
+            if os.path.exists(entry):
+                return os.utime(entry, None)
+            if not os.path.isdir(self.path):
+                os.makedirs(self.path, 0700)
+            fd, tmp = mkstemp(dir=self.path)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(block)
+                os.rename(tmp, entry)
+            except Exception:
+                os.remove(tmp)
+                raise
+        except (IOError, OSError) as e:
+            LOG.debug('Failed to cache block %s: %s' % (block_hash, e))
+            return
+        with self._lock:
+            if self._size is not None:
+                self._size += len(block)
+            if self._size is None or self._size > self.limit:
+                self._size = self._evict()
+
+    def _evict(self):
+        """Remove least recently used blocks to fit in limit
+
+        :returns: (int) the size of the store
+        """
+        entries, size = [], 0
+        for name in os.listdir(self.path):
+            if name.strip(hexdigits):
+                continue
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+            size += st.st_size
+        for mtime, bytes, name in sorted(entries):
+            if size <= self.limit:
+                break
+            try:
+                os.remove(os.path.join(self.path, name))
+                size -= bytes
+            except OSError:
+                pass
+        return size
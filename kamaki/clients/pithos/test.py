@@ -34,7 +34,7 @@
 from unittest import TestCase
 from mock import patch, call
 from tempfile import NamedTemporaryFile
-from os import urandom
+from os import urandom, listdir
 from itertools import product
 from random import randint
 
@@ -150,6 +150,9 @@ class FR(object):
     status = None
     status_code = 200
 
+    def iter_content(self, chunk_size=None):
+        yield self.content
+
 
 class PithosRestClient(TestCase):
 
@@ -769,6 +772,83 @@ class PithosMethods(TestCase):
                 ((42, 333, 800, '100,50-200,-600',), '42-100,50-200,200-333')):
             self.assertEqual(_range_up(*args), expected)
 
+    def test__pithos_hash(self):
+        from hashlib import sha256
+        from kamaki.clients.pithos import _pithos_hash
+        for block in (
+                '', '\x00' * 10, 'abc', 'abc\x00\x00', '\x00abc\x00',
+                'a' + '\x00' * 200000, 'a' * 70000 + '\x00' * 65536,
+                urandom(100000) + '\x00' * 3):
+            expected = sha256(block.rstrip('\x00')).hexdigest()
+            self.assertEqual(_pithos_hash(block, 'sha256'), expected)
+            self.assertEqual(
+                _pithos_hash(buffer('xy' + block, 2), 'sha256'), expected)
+        self.assertEqual(
+            _pithos_hash(u'abc\x00', 'sha256'), sha256('abc').hexdigest())
+
+    def test__merkle(self):
+        from hashlib import sha256
+        from binascii import unhexlify
+        from kamaki.clients.pithos import _merkle
+        h = [sha256(x).hexdigest() for x in 'abc']
+        self.assertEqual(_merkle([], 'sha256'), sha256('').hexdigest())
+        self.assertEqual(_merkle(h[:1], 'sha256'), h[0])
+        self.assertEqual(_merkle(h[:2], 'sha256'), sha256(
+            unhexlify(h[0]) + unhexlify(h[1])).hexdigest())
+        self.assertEqual(_merkle(h, 'sha256'), sha256(
+            sha256(unhexlify(h[0]) + unhexlify(h[1])).digest()
+            + sha256(unhexlify(h[2]) + '\x00' * 32).digest()).hexdigest())
+
+    def test__pwrite_and__preallocate(self):
+        from kamaki.clients import pithos
+        tmpFile = NamedTemporaryFile()
+        pithos._preallocate(tmpFile, 100)
+        self.assertEqual(pithos.fstat(tmpFile.fileno()).st_size, 100)
+        pithos._preallocate(tmpFile, 50)
+        self.assertEqual(pithos.fstat(tmpFile.fileno()).st_size, 100)
+        fd = tmpFile.fileno()
+        pithos._pwrite(fd, 'abcdefgh', 90)
+        pithos._pwrite(fd, buffer('xxABC', 2), 0)
+        tmpFile.seek(0)
+        self.assertEqual(
+            tmpFile.read(), 'ABC' + '\x00' * 87 + 'abcdefgh' + '\x00' * 2)
+
+    def test_BlockCache(self):
+        from hashlib import sha256
+        from os import utime, path
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from kamaki.clients.pithos.cache import BlockCache
+        cache_dir = mkdtemp()
+        try:
+            cache = BlockCache(path.join(cache_dir, 'blocks'), limit=25)
+            self.assertEqual(cache.get('ab12', 10), None)
+            cache.put('ab12', 'x' * 8 + '\x00' * 2)
+            self.assertEqual(cache.get('AB12', 10), 'x' * 8 + '\x00' * 2)
+            self.assertEqual(cache.get('ab12', 12), 'x' * 8 + '\x00' * 4)
+            self.assertEqual(cache.get('ab12', 5), None)
+            for invalid in ('../ab12', 'ab 12', '', None):
+                cache.put(invalid, 'data')
+                self.assertEqual(cache.get(invalid, 4), None)
+            self.assertEqual(listdir(cache.path), ['ab12'])
+
+            utime(path.join(cache.path, 'ab12'), (1, 1))
+            cache.put('cd34', 'y' * 10)
+            utime(path.join(cache.path, 'cd34'), (2, 2))
+            cache.get('ab12', 10)
+            cache.put('ef56', 'z' * 10)
+            self.assertEqual(sorted(listdir(cache.path)), ['ab12', 'ef56'])
+
+            block_hash = sha256('v4l1d').hexdigest()
+            cache.put(block_hash, 'v4l1d')
+            self.assertEqual(cache.get(block_hash, 5, 'sha256'), 'v4l1d')
+            with open(path.join(cache.path, block_hash), 'w') as f:
+                f.write('c0rrupt')
+            self.assertEqual(cache.get(block_hash, 7, 'sha256'), None)
+            self.assertFalse(path.exists(path.join(cache.path, block_hash)))
+        finally:
+            rmtree(cache_dir)
+
 
 class PithosClient(TestCase):
 
@@ -846,6 +926,34 @@ class PithosClient(TestCase):
         for i in range(len(r)):
             self.assert_dicts_are_equal(r[i], container_list[i])
 
+    def test_iter_objects(self):
+        names = ['o%s' % i for i in range(7)]
+
+        def container_get(limit=None, marker=None, **kwargs):
+            r = FR()
+            page = [dict(name=n) for n in names if n > (marker or '')]
+            r.json, r.status_code = page[:min(limit, 3)], 200 if page else 204
+            return r
+
+        with patch(
+                '%s.container_get' % pithos_pkg,
+                side_effect=container_get) as CG:
+            for prefetch in (True, False):
+                CG.reset_mock()
+                r = self.client.iter_object_pages(
+                    page_size=5, prefetch=prefetch, prefix='o')
+                self.assertEqual(len(CG.mock_calls), 1)
+                pages = [[o['name'] for o in page] for page in r]
+                self.assertEqual(pages, [names[:3], names[3:6], names[6:]])
+                self.assertEqual(CG.mock_calls[-1], call(
+                    limit=5, marker='o6', prefix='o', success=(200, 204)))
+
+            r = self.client.iter_objects(page_size=2, limit=5, marker='o0')
+            self.assertEqual([o['name'] for o in r], names[1:6])
+            self.assertEqual(
+                [c[2]['limit'] for c in CG.mock_calls[-3:]], [2, 2, 1])
+            self.assertEqual(list(self.client.iter_objects(limit=0)), [])
+
     @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
     @patch('%s.container_post' % pithos_pkg, return_value=FR())
     @patch('%s.object_put' % pithos_pkg, return_value=FR())
@@ -970,6 +1078,230 @@ class PithosClient(TestCase):
         self.assertEqual(OP.mock_calls[-1][2]['if_etag_not_match'], '*')
         self.assertEqual(OP.mock_calls[-1][2]['etag'], etag)
 
+    def test__hash_blocks(self):
+        num_of_blocks, blocksize = 5, 4 * 1024 * 1024
+        tmpFile = self._create_temp_file(num_of_blocks)
+        size = num_of_blocks * blocksize - 100
+        expected = []
+        for i in range(num_of_blocks):
+            block = tmpFile.read(min(blocksize, size - i * blocksize))
+            expected.append((
+                pithos._pithos_hash(block, 'sha256'),
+                i * blocksize,
+                len(block)))
+        for threads in (1, 2, 8):
+            self.client.HASH_THREADS = threads
+            tmpFile.seek(0)
+            r = list(self.client._hash_blocks(
+                tmpFile, blocksize, 'sha256', size))
+            self.assertEqual(r, expected)
+            self.assertEqual(self.client.hash_pool.size, threads)
+
+        tmpFile.seek(0)
+        self.assertRaises(
+            ValueError, list,
+            self.client._hash_blocks(tmpFile, blocksize, 'n0h@5h', size))
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    @patch('%s.container_post' % pithos_pkg, return_value=FR())
+    @patch('%s.object_put' % pithos_pkg, return_value=FR())
+    def test_upload_object_with_hashmap_cache(self, OP, CP, GCI):
+        from os import utime
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from kamaki.clients.pithos.cache import HashmapCache
+        num_of_blocks = 4
+        tmpFile = self._create_temp_file(num_of_blocks)
+        cache_dir = mkdtemp()
+        try:
+            cache = HashmapCache(cache_dir)
+            with patch(
+                    'kamaki.clients.pithos._pithos_hash',
+                    wraps=pithos._pithos_hash) as PH:
+                self.client.upload_object(obj, tmpFile, hashmap_cache=cache)
+                self.assertEqual(len(PH.mock_calls), num_of_blocks)
+                hashes = OP.mock_calls[-1][2]['json']['hashes']
+
+                tmpFile.seek(0)
+                self.client.upload_object(obj, tmpFile, hashmap_cache=cache)
+                self.assertEqual(len(PH.mock_calls), num_of_blocks)
+                self.assertEqual(
+                    OP.mock_calls[-1][2]['json']['hashes'], hashes)
+
+                tmpFile.seek(0)
+                utime(tmpFile.name, (0, 0))
+                self.client.upload_object(obj, tmpFile, hashmap_cache=cache)
+                self.assertEqual(len(PH.mock_calls), 2 * num_of_blocks)
+
+                tmpFile.seek(1)
+                self.client.upload_object(
+                    obj, tmpFile, size=num_of_blocks * 4 * 1024 * 1024 - 1,
+                    hashmap_cache=cache)
+                self.assertEqual(len(PH.mock_calls), 3 * num_of_blocks)
+        finally:
+            rmtree(cache_dir)
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    @patch('%s._put_block' % pithos_pkg)
+    @patch('%s._create_object_or_get_missing_hashes' % pithos_pkg)
+    def test_upload_object_failed_blocks(self, COGMH, PB, GCI):
+        tmpFile = self._create_temp_file(2)
+        COGMH.side_effect = lambda path, json, **kwargs: (
+            json['hashes'], dict())
+        PB.side_effect = ClientError('Quota exceeded', 413)
+        try:
+            self.client.upload_object(obj, tmpFile)
+            self.fail('ClientError not raised')
+        except ClientError as ce:
+            self.assertEqual(('%s' % ce).strip(), '2 blocks failed to upload')
+            self.assertEqual(
+                [d.strip() for d in ce.details], ['Quota exceeded'] * 2)
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    @patch('%s.object_put' % pithos_pkg, return_value=FR())
+    @patch('%s._put_block' % pithos_pkg)
+    @patch('%s._create_object_or_get_missing_hashes' % pithos_pkg)
+    def test_upload_object_pipelined(self, COGMH, PB, OP, GCI):
+        num_of_blocks = 7
+        tmpFile = self._create_temp_file(num_of_blocks)
+        exp_headers = dict(id='object id')
+        COGMH.return_value = None, exp_headers
+        r = self.client.upload_object(obj, tmpFile, pipeline=True)
+        self.assertEqual(r, exp_headers)
+        COGMH.assert_called_once()
+        self.assertEqual(COGMH.mock_calls[0][1][0], obj)
+        hashes = COGMH.mock_calls[0][1][1]['hashes']
+        self.assertEqual(len(hashes), num_of_blocks)
+        uploaded = sorted(c[1]['hash'] for c in PB.call_args_list)
+        self.assertEqual(uploaded, sorted(hashes))
+
+        #  Repeated blocks are uploaded once, failed ones by upload_object
+        PB.reset_mock()
+        COGMH.reset_mock()
+        block_size = container_info['x-container-block-size']
+        tmpFile = NamedTemporaryFile()
+        tmpFile.write('a' * block_size * 3 + 'b' * block_size)
+        tmpFile.flush()
+        tmpFile.seek(0)
+        failed = []
+
+        def put_block(data, hash):
+            if data[0] == 'b' and not failed:
+                failed.append(hash)
+                raise ClientError('Failed to put block')
+
+        def negotiate(path, json, **kwargs):
+            if len(COGMH.mock_calls) == 1:
+                return list(failed), dict()
+            return None, exp_headers
+
+        PB.side_effect, COGMH.side_effect = put_block, negotiate
+        r = self.client.upload_object(obj, tmpFile, pipeline=True)
+        self.assertEqual(r, OP.return_value.headers)
+        uploaded = [c[1]['hash'] for c in PB.call_args_list]
+        self.assertEqual(len(uploaded), 3)
+        self.assertEqual(uploaded[1:], failed * 2)
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    @patch('%s._put_block' % pithos_pkg)
+    @patch('%s._create_object_or_get_missing_hashes' % pithos_pkg)
+    def test_upload_object_pipelined_overlap(self, COGMH, PB, GCI):
+        from threading import Event
+        tmpFile = self._create_temp_file(4)
+        uploading, overlapped = Event(), []
+
+        def hash_cb(n):
+            for i in range(n + 1):
+                if i == 2:
+                    overlapped.append(uploading.wait(5) or False)
+                yield
+
+        def put_block(data, hash):
+            uploading.set()
+
+        COGMH.return_value = None, dict()
+        PB.side_effect = put_block
+        self.client.MAX_THREADS = 4
+        self.client.upload_object(
+            obj, tmpFile, hash_cb=hash_cb, pipeline=True)
+        self.assertEqual(overlapped, [True])
+        self.assertEqual(len(PB.mock_calls), 4)
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    @patch('%s.get_object_hashmap' % pithos_pkg)
+    @patch('%s.upload_object' % pithos_pkg, return_value=dict(up='load'))
+    @patch('%s._put_block' % pithos_pkg)
+    @patch('%s._create_object_or_get_missing_hashes' % pithos_pkg)
+    def test_update_object(self, COGMH, PB, UO, GOH, GCI):
+        num_of_blocks = 4
+        tmpFile = self._create_temp_file(num_of_blocks)
+        block_size = container_info['x-container-block-size']
+        hashes = [pithos._pithos_hash(
+            tmpFile.read(block_size), 'sha256') for i in range(num_of_blocks)]
+        tmpFile.seek(0)
+        remote = dict(
+            block_size=block_size, block_hash='sha256', bytes=0,
+            hashes=hashes[:2] + ['0ld'] + hashes[:1])
+        GOH.return_value = remote
+        exp_headers = dict(id='object id')
+        COGMH.return_value = None, exp_headers
+
+        r = self.client.update_object(obj, tmpFile, content_type='text/x')
+        self.assertEqual(r, exp_headers)
+        uploaded = sorted(c[1]['hash'] for c in PB.call_args_list)
+        self.assertEqual(uploaded, sorted(hashes[2:]))
+        COGMH.assert_called_once_with(
+            obj, dict(bytes=num_of_blocks * block_size, hashes=hashes),
+            content_type='text/x', size=num_of_blocks * block_size,
+            if_etag_match=None, content_encoding=None,
+            content_disposition=None, permissions=None, public=None)
+        self.assertFalse(UO.mock_calls)
+
+        tmpFile.seek(0)
+        GOH.return_value = dict(remote, block_hash='md5')
+        self.assertEqual(
+            self.client.update_object(obj, tmpFile), dict(up='load'))
+        GOH.side_effect = ClientError('Not Found', 404)
+        self.assertEqual(
+            self.client.update_object(obj, tmpFile), dict(up='load'))
+        self.assertEqual(len(UO.mock_calls), 2)
+
+    @patch('%s.create_directory' % pithos_pkg, return_value=dict(d='ir'))
+    def test_upload_objects(self, CD):
+        tmpFile = self._create_temp_file(1)
+        clients = set()
+
+        def upload_object(client, obj, f, **kwargs):
+            clients.add(client)
+            self.assertEqual(f.name, tmpFile.name)
+            self.assertNotEqual(client, self.client)
+            if obj == 'bad':
+                raise ClientError('Failed', 500)
+            return dict(obj=obj, **kwargs)
+
+        uploads = [
+            (None, 'dir', None),
+            (tmpFile.name, 'dir/a', dict(content_type='text/plain')),
+            (tmpFile.name, 'bad', None),
+            (tmpFile.name, 'dir/b', None)]
+        with patch.object(
+                pithos.PithosClient, 'upload_object', autospec=True,
+                side_effect=upload_object):
+            r = list(self.client.upload_objects(
+                iter(uploads), threads=2, public=True))
+        self.assertEqual([x[:2] for x in r], [x[:2] for x in uploads])
+        self.assertEqual(r[0][2], dict(d='ir'))
+        self.assertEqual(r[2][2].status, 500)
+        cache = r[1][2]['container_info_cache']
+        self.assertEqual(r[1][2], dict(
+            obj='dir/a', public=True, content_type='text/plain',
+            container_info_cache=cache))
+        self.assertTrue(r[3][2]['container_info_cache'] is cache)
+        self.assertEqual(len(clients), 3)
+        pools = set(c.worker_pool for c in clients)
+        self.assertEqual(pools, set([self.client.worker_pool]))
+        CD.assert_called_once_with('dir')
+
     @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
     @patch('%s.container_post' % pithos_pkg, return_value=FR())
     @patch('%s.object_put' % pithos_pkg, return_value=FR())
@@ -1318,12 +1650,264 @@ class PithosClient(TestCase):
                 GET.mock_calls[-1][2][k],
                 v or kwargs.get(k))
 
+    @patch('%s.object_get' % pithos_pkg)
+    def test_stream_down(self, GET):
+        from StringIO import StringIO
+        from threading import Lock
+        from time import sleep
+        block_size, num_of_blocks = 10, 13
+        data = urandom(block_size * num_of_blocks - 3)
+        hashmap = dict(
+            block_size=block_size, bytes=len(data),
+            hashes=['h%s' % i for i in range(num_of_blocks)])
+        lock, counters = Lock(), dict(flying=0, max_flying=0)
+
+        def get(obj, data_range=None, **kwargs):
+            with lock:
+                counters['flying'] += 1
+                counters['max_flying'] = max(
+                    counters['max_flying'], counters['flying'])
+            start, end = data_range.split('=')[1].split('-')
+            sleep(0.01 * randint(0, 3))
+            r = FR()
+            r.content = data[int(start):int(end) + 1]
+            with lock:
+                counters['flying'] -= 1
+            return r
+
+        GET.side_effect = get
+        self.client.MAX_THREADS = 8
+        for buffer_blocks in (2, 4):
+            counters['max_flying'] = 0
+            dst = StringIO()
+            self.client.stream_down(
+                obj, dst, buffer_blocks=buffer_blocks, hashmap=hashmap)
+            self.assertEqual(dst.getvalue(), data)
+            self.assertTrue(counters['max_flying'] <= buffer_blocks)
+        self.assertEqual(len(GET.mock_calls), 2 * num_of_blocks)
+
+        dst = StringIO()
+        self.client.stream_down(
+            obj, dst, buffer_blocks=3, hashmap=hashmap, range_str='15-33',
+            if_match='e74g', if_unmodified_since='d473')
+        self.assertEqual(dst.getvalue(), data[15:34])
+        for c in GET.mock_calls[2 * num_of_blocks:]:
+            self.assertEqual(c[2]['if_etag_match'], 'e74g')
+            self.assertEqual(c[2]['if_unmodified_since'], 'd473')
+
+    @patch('%s.get_object_hashmap' % pithos_pkg)
+    @patch('%s.object_get' % pithos_pkg)
+    def test_download_with_block_cache(self, GET, GOH):
+        from StringIO import StringIO
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from kamaki.clients.pithos.cache import BlockCache
+        block_size = 16
+        blocks = [urandom(block_size) for i in range(3)] + ['t41l']
+        data = ''.join(blocks)
+        GOH.return_value = dict(
+            block_hash='sha256', block_size=block_size, bytes=len(data),
+            hashes=[pithos._pithos_hash(b, 'sha256') for b in blocks])
+
+        def get(obj, data_range=None, async_headers=dict(), **kwargs):
+            data_range = data_range or async_headers['Range']
+            start, end = data_range.split('=')[1].split('-')
+            r = FR()
+            r.content = data[int(start):int(end) + 1]
+            return r
+
+        GET.side_effect = get
+        cache_dir = mkdtemp()
+        try:
+            self.client.block_cache = BlockCache(cache_dir)
+            self.assertEqual(self.client.download_to_string(obj), data)
+            self.assertEqual(len(GET.mock_calls), len(blocks))
+            self.assertEqual(self.client.download_to_string(obj), data)
+            dst = StringIO()
+            self.client.stream_down(obj, dst, buffer_blocks=2)
+            self.assertEqual(dst.getvalue(), data)
+            tmpFile = NamedTemporaryFile()
+            self.client.download_object(obj, tmpFile)
+            tmpFile.seek(0)
+            self.assertEqual(tmpFile.read(), data)
+            self.assertEqual(len(GET.mock_calls), len(blocks))
+
+            self.assertEqual(
+                self.client.download_to_string(obj, range_str='3-20'),
+                data[3:21])
+            self.assertEqual(len(GET.mock_calls), len(blocks) + 2)
+        finally:
+            self.client.block_cache = None
+            rmtree(cache_dir)
+
+    @patch('%s.get_object_hashmap' % pithos_pkg)
+    @patch('%s.object_get' % pithos_pkg)
+    def test_download_corrupted_block(self, GET, GOH):
+        from StringIO import StringIO
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from kamaki.clients.pithos.cache import BlockCache
+        block_size = 16
+        blocks = [urandom(block_size) for i in range(2)]
+        hashes = [pithos._pithos_hash(b, 'sha256') for b in blocks]
+        GOH.return_value = dict(
+            block_hash='sha256', block_size=block_size,
+            bytes=2 * block_size, hashes=hashes)
+        served = 'c0rrupt' * 2 + '!!' + blocks[1]
+
+        def get(obj, data_range=None, async_headers=dict(), **kwargs):
+            data_range = data_range or async_headers['Range']
+            start, end = data_range.split('=')[1].split('-')
+            r = FR()
+            r.content = served[int(start):int(end) + 1]
+            return r
+
+        GET.side_effect = get
+        cache_dir = mkdtemp()
+        try:
+            self.client.block_cache = BlockCache(cache_dir)
+            self.assertEqual(
+                self.client.download_to_string(obj), served)
+            self.client.stream_down(obj, StringIO(), buffer_blocks=2)
+            self.client.download_object(obj, NamedTemporaryFile())
+            self.assertEqual(listdir(cache_dir), [hashes[1]])
+            self.assertEqual(len(GET.mock_calls), 4)
+        finally:
+            self.client.block_cache = None
+            rmtree(cache_dir)
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    def test_diff_tree(self, GCI):
+        from os import path, makedirs
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        from kamaki.clients.pithos.cache import HashmapCache
+        tmp_dir = mkdtemp()
+        try:
+            local_dir = path.join(tmp_dir, 'local')
+            makedirs(path.join(local_dir, 'sub'))
+            for name, data in (('same', 's4m3'), ('changed', 'l0c4l')):
+                with open(path.join(local_dir, name), 'w') as f:
+                    f.write(data)
+            with open(path.join(local_dir, 'sub', 'new'), 'w') as f:
+                f.write('n3w')
+
+            def obj(name, data, **kwargs):
+                return dict(
+                    name='d1r/%s' % name, bytes=len(data),
+                    hash=pithos._pithos_hash(data, 'sha256'), **kwargs)
+
+            objects = [
+                obj('same', 's4m3'), obj('changed', 'r3m0t'),
+                obj('sub', '', content_type='application/directory'),
+                obj('remote', 'r3m0t')]
+            cache = HashmapCache(path.join(tmp_dir, 'cache'))
+            with patch(
+                    '%s.iter_objects' % pithos_pkg,
+                    return_value=objects) as IO:
+                r = self.client.diff_tree(
+                    local_dir, '/d1r/', hashmap_cache=cache)
+                IO.assert_called_once_with(prefix='d1r/')
+
+            def local(*names):
+                return path.join(local_dir, *names)
+
+            self.assertEqual(r, [
+                ('changed', local('changed'), objects[1], False),
+                ('remote', None, objects[3], False),
+                ('same', local('same'), objects[0], True),
+                ('sub', local('sub'), objects[2], True),
+                ('sub/new', local('sub', 'new'), None, False)])
+            self.assertEqual(len(listdir(cache.path)), 2)
+        finally:
+            rmtree(tmp_dir)
+
+    @patch('%s.get_container_info' % pithos_pkg, return_value=container_info)
+    @patch('%s.download_object' % pithos_pkg)
+    @patch('%s.object_get' % pithos_pkg)
+    def test_download_objects(self, GET, DO, GCI):
+        from os import path
+        from shutil import rmtree
+        from tempfile import mkdtemp
+        small = 'sm4ll d4t4'
+        r = FR()
+        r.content = small
+        GET.return_value = r
+
+        def download_object(obj, dst, **kwargs):
+            if obj == 'bad':
+                raise ClientError('Failed', 404)
+            dst.write('l4rg3')
+
+        DO.side_effect = download_object
+        info = dict(
+            bytes=len(small), hash=pithos._pithos_hash(small, 'sha256'))
+        large = dict(bytes=container_info['x-container-block-size'] + 1)
+        tmp_dir = mkdtemp()
+        try:
+            downloads = [
+                ('a', path.join(tmp_dir, 'a'), info, None),
+                ('b', path.join(tmp_dir, 'b'), large, dict(resume=True)),
+                ('bad', path.join(tmp_dir, 'c'), None, None)]
+            r = list(self.client.download_objects(iter(downloads), threads=2))
+            self.assertEqual([x[:2] for x in r], [x[:2] for x in downloads])
+            self.assertEqual(r[0][2], info)
+            self.assertEqual(r[2][2].status, 404)
+            GET.assert_called_once_with('a')
+            self.assertEqual([c[1][0] for c in DO.mock_calls], ['b', 'bad'])
+            self.assertEqual(DO.mock_calls[0][2]['resume'], True)
+            GCI.assert_called_once_with()
+            for name, content in (('a', small), ('b', 'l4rg3')):
+                with open(path.join(tmp_dir, name)) as f:
+                    self.assertEqual(f.read(), content)
+
+            #  Versions and conditions are not served from the listing
+            for kwargs in (
+                    dict(version='v0'), dict(if_match='3t4g'),
+                    dict(if_modified_since='d473')):
+                DO.reset_mock()
+                r = list(self.client.download_objects(
+                    iter(downloads[:1]), **kwargs))
+                self.assertEqual(DO.mock_calls[0][1][0], 'a')
+                self.assertEqual(
+                    dict(kwargs, resume=False, headers={}),
+                    DO.mock_calls[0][2])
+            GET.assert_called_once_with('a')
+
+            #  A body of other size than the listed one is an error
+            info['bytes'] += 1
+            r = list(self.client.download_objects(iter(downloads[:1])))
+            self.assertTrue(isinstance(r[0][2], ClientError))
+        finally:
+            rmtree(tmp_dir)
+
+    @patch('%s.get_object_hashmap' % pithos_pkg, return_value=object_hashmap)
+    @patch('%s.object_get' % pithos_pkg, return_value=FR())
+    def test_download_object_short_block(self, GET, GOH):
+        tmpFile = self._create_temp_file(1)
+        GET.return_value = FR()
+        GET.return_value.content = 'short block'
+        self.assertRaises(
+            ClientError, self.client.download_object, obj, tmpFile)
+
     @patch('%s.get_object_hashmap' % pithos_pkg, return_value=object_hashmap)
     @patch('%s.object_get' % pithos_pkg, return_value=FR())
     def test_download_object(self, GET, GOH):
         num_of_blocks = 8
         tmpFile = self._create_temp_file(num_of_blocks)
         FR.content = tmpFile.read(4 * 1024 * 1024)
+
+        def ranged_get(*args, **kwargs):
+            r = FR()
+            rng = kwargs.get('async_headers', {}).get('Range')
+            if not rng:
+                return r
+            first, last = rng.split('=')[1].split('-')
+            r.content = FR.content[int(first) % len(FR.content):][
+                :int(last) - int(first) + 1]
+            return r
+
+        GET.side_effect = ranged_get
         tmpFile = self._create_temp_file(num_of_blocks)
         num_of_blocks = len(object_hashmap['hashes'])
         kwargs = dict(
@@ -1599,6 +2183,86 @@ class PithosClient(TestCase):
             self.client.del_object(obj, **kwarg)
             self.assertEqual(delete.mock_calls[-1], call(obj, **kwarg))
 
+    @patch('kamaki.clients.pithos.sleep')
+    def test_delete_objects(self, sleep):
+        objects = [
+            dict(name='a.log', bytes=10, last_modified='2013-01-01T10:00:00'),
+            dict(name='b.log', bytes=300,
+                 last_modified='2013-01-01T12:00:00.5+02:00'),
+            dict(name='c.txt', bytes=20, last_modified='2013-01-02T00:00:00'),
+            dict(name='d.log', bytes=30, last_modified='2013-01-03T00:00:00'),
+            dict(name='e.log', bytes=40, last_modified='2012-12-31T00:00:00'),
+            dict(subdir='f/')]
+        day = pithos._parse_last_modified('2013-01-02T00:00:00+00:00')
+        self.assertEqual(
+            pithos._parse_last_modified(objects[1]['last_modified']),
+            day - 14 * 3600)
+        filters = dict(
+            name_pattern='*.log', modified_before=day, max_size=100)
+        failures = {
+            'a.log': [ClientError('busy', 503), None],
+            'e.log': [ClientError('forbidden', 403)]}
+
+        def delete(path, **kwargs):
+            errors = failures.get(path.split('/')[-1], [None])
+            error = errors.pop(0) if len(errors) > 1 else errors[0]
+            if error:
+                raise error
+
+        with patch('%s.iter_objects' % pithos_pkg, return_value=objects):
+            with patch('%s.delete' % pithos_pkg, side_effect=delete) as D:
+                r = self.client.delete_objects(dry_run=True, **filters)
+                self.assertEqual(
+                    [o['name'] for o in r['objects']], ['a.log', 'e.log'])
+                self.assertEqual(r['matched'], 2)
+                self.assertEqual(r['bytes'], 50)
+                self.assertFalse(D.mock_calls)
+
+                r = self.client.delete_objects(until='u', **filters)
+                self.assertFalse('objects' in r)
+                self.assertEqual((r['matched'], r['deleted']), (2, 1))
+                self.assertEqual(r['failed'].keys(), ['e.log'])
+                self.assertEqual(r['failed']['e.log'].status, 403)
+                self.assertEqual(len(D.mock_calls), 3)
+                self.assertEqual(D.mock_calls[-1][2], dict(
+                    async_params=dict(until='u'), success=204))
+                sleep.assert_called_once_with(0.1)
+                self.assertEqual(self.client.concurrency.transfers, 0)
+
+    def test_delete_objects_tree(self):
+        names = [
+            'logs', 'logs-archive', 'logs/a', 'logs/b/c', 'logs2', 'logs2/d']
+
+        def iter_objects(prefix=None, limit=None, **kwargs):
+            listed = [dict(name=name, bytes=1) for name in names if (
+                name.startswith(prefix or ''))]
+            return iter(listed[:limit])
+
+        with patch(
+                '%s.iter_objects' % pithos_pkg,
+                side_effect=iter_objects) as IO:
+            with patch('%s.delete' % pithos_pkg) as D:
+                for tree in ('logs', 'logs/'):
+                    r = self.client.delete_objects(tree=tree, dry_run=True)
+                    self.assertEqual(
+                        [o['name'] for o in r['objects']],
+                        ['logs', 'logs/a', 'logs/b/c'])
+                self.assertEqual(IO.mock_calls[-2:], [
+                    call(prefix='logs', limit=1), call(prefix='logs/')])
+
+                names.remove('logs')
+                r = self.client.delete_objects(tree='logs')
+                self.assertEqual(r['deleted'], 2)
+                deleted = sorted(c[1][0].split('/', 3)[-1] for c in (
+                    D.mock_calls))
+                self.assertEqual(deleted, ['logs/a', 'logs/b/c'])
+
+                IO.reset_mock()
+                r = self.client.delete_objects(objects=[dict(name='logs2')])
+                self.assertEqual(r['deleted'], 1)
+                self.assertFalse(IO.mock_calls)
+                self.assertTrue(D.mock_calls[-1][1][0].endswith('/logs2'))
+
     @patch('%s.object_post' % pithos_pkg, return_value=FR())
     def test_set_object_meta(self, post):
         metas = dict(k1='v1', k2='v2', k3='v3')
@@ -38,7 +38,8 @@ from inspect import getmembers, isclass
 from itertools import product
 from random import randint
 
-from kamaki.clients.utils.test import Utils
+from kamaki.clients.utils.test import (
+    Utils, MetricsCollector, ConnectionPool)
 from kamaki.clients.astakos.test import (
     AstakosClient, LoggedAstakosClient, CachedAstakosClient)
 from kamaki.clients.compute.test import ComputeClient, ComputeRestClient
@@ -127,15 +128,49 @@ class RequestManager(TestCase):
             self.assertEqual(req.headers, headers)
         self.assertRaises(AssertionError, self.RM, 'GOT', '', '', '', {}, {})
 
+    @patch('httplib.HTTPConnection.connect')
     @patch('httplib.HTTPConnection.getresponse')
     @patch('httplib.HTTPConnection.request')
-    def test_perform(self, request, getresponse):
+    def test_perform(self, request, getresponse, connect):
         from httplib import HTTPConnection
-        self.RM('GET', 'http://example.com', '/').perform(
-            HTTPConnection('http', 'example.com'))
+        from socket import timeout
+        from kamaki.clients import ClientError
+        req = self.RM('GET', 'http://example.com', '/')
+        req.connect_timeout, req.read_timeout = 1.0, 2.0
+        conn = HTTPConnection('http', 'example.com')
+        req.perform(conn)
+        connect.assert_called_once_with()
         expected = dict(body=None, headers={}, url='/', method='GET')
         request.assert_called_once_with(**expected)
         getresponse.assert_called_once_with()
+        self.assertEqual(conn.timeout, 2.0)
+        self.assertEqual(
+            sorted(req.timings.keys()), ['connect', 'send', 'wait'])
+
+        getresponse.side_effect = timeout('timed out')
+        self.assertRaises(ClientError, req.perform, conn)
+        connect.side_effect = timeout('timed out')
+        self.assertRaises(ClientError, req.perform, conn)
+        self.assertEqual(getresponse.call_count, 2)
+
+    @patch('kamaki.clients.utils.escape_ctrl_chars', return_value='')
+    def test_dump_log(self, ECC):
+        from kamaki.clients import sendlog, DEBUGV
+        traces = []
+        req = self.RM('PUT', 'http://example.com', '/p', data='d4t4')
+        req.LOG_DATA, req.TRACER = True, lambda *args: traces.append(args)
+        level = sendlog.level
+        try:
+            sendlog.setLevel(DEBUGV + 1)
+            req.dump_log()
+            self.assertFalse(ECC.mock_calls)
+            sendlog.setLevel(DEBUGV)
+            req.dump_log()
+            ECC.assert_called_once_with('d4t4')
+        finally:
+            sendlog.setLevel(level)
+        self.assertEqual(traces, 2 * [('request', dict(
+            method='PUT', url='http://example.com/p', size=4))])
 
 
 class FakeResp(object):
@@ -153,6 +188,19 @@ class FakeResp(object):
         return self.HEADERS.items()
 
 
+class FakeStreamResp(FakeResp):
+
+    def __init__(self):
+        from StringIO import StringIO
+        self._body = StringIO(self.READ)
+
+    def read(self, amt=None):
+        return self._body.read() if amt is None else self._body.read(amt)
+
+    def isclosed(self):
+        return self._body.tell() == len(self.READ)
+
+
 class ResponseManager(TestCase):
 
     def setUp(self):
@@ -205,6 +253,101 @@ class ResponseManager(TestCase):
         self.assertEqual(self.RM.json, FakeResp.HEADERS)
         self.assertTrue(isinstance(perform.call_args[0][0], self.HTTPC))
 
+    @patch('kamaki.clients.RequestManager.perform')
+    def test_iter_content(self, perform):
+        from kamaki.clients import ResponseManager, RequestManager
+        perform.return_value = FakeResp()
+        self.assertEqual(
+            list(self.RM.iter_content(5)), ['somet', 'hing ', 'to re', 'ad'])
+        self.assertEqual(self.RM.streamed_bytes, 0)
+
+        for chunk_size, expected in (
+                (5, ['somet', 'hing ', 'to re', 'ad']),
+                (None, [FakeResp.READ])):
+            perform.return_value = FakeStreamResp()
+            rm = ResponseManager(
+                RequestManager('GET', 'http://ok', '/'), stream=True)
+            self.assertEqual(rm.status_code, FakeResp.status)
+            self.assertTrue(rm._connection)
+            self.assertEqual(list(rm.iter_content(chunk_size)), expected)
+            self.assertEqual(rm.streamed_bytes, len(FakeResp.READ))
+            self.assertEqual(rm._connection, None)
+            self.assertEqual(list(rm.iter_content(chunk_size)), [])
+
+        perform.return_value = FakeStreamResp()
+        rm = ResponseManager(
+            RequestManager('GET', 'http://ok', '/'), stream=True)
+        self.assertEqual(rm.content, FakeResp.READ)
+        self.assertEqual(rm._connection, None)
+
+        perform.return_value = FakeStreamResp()
+        rm = ResponseManager(
+            RequestManager('GET', 'http://ok', '/'), stream=True)
+        chunks = rm.iter_content(5)
+        self.assertEqual(chunks.next(), 'somet')
+        connection = rm._connection.obj
+        with patch.object(connection, 'close') as close:
+            chunks.close()
+            close.assert_called_once_with()
+        self.assertEqual(rm._connection, None)
+
+    @patch('kamaki.clients.RequestManager.perform')
+    def test_iter_content_truncated(self, perform):
+        from httplib import HTTPResponse
+        from StringIO import StringIO
+        from kamaki.clients import (
+            ResponseManager, RequestManager, ClientError)
+
+        class FakeSocket(object):
+            def makefile(self, *args, **kwargs):
+                return StringIO(
+                    'HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n'
+                    + 50 * 'x')
+
+        for stream in (False, True):
+            r = HTTPResponse(FakeSocket())
+            r.begin()
+            perform.return_value = r
+            rm = ResponseManager(
+                RequestManager('GET', 'http://ok', '/'), stream=stream)
+            self.assertRaises(ClientError, list, rm.iter_content(30))
+            self.assertEqual(rm.streamed_bytes, 50 if stream else 0)
+
+    @patch('kamaki.clients.RequestManager.perform')
+    def test_tracer(self, perform):
+        from kamaki.clients import ResponseManager, RequestManager
+        traces = []
+
+        def tracer(event, info):
+            traces.append((event, info))
+            raise Exception('Tracer errors should be ignored')
+
+        for stream in (False, True):
+            perform.return_value = FakeStreamResp() if stream else FakeResp()
+            rm = ResponseManager(
+                RequestManager('GET', 'http://ok', '/'), stream=stream)
+            rm.TRACER = tracer
+            self.assertEqual(rm.content, FakeResp.READ)
+            event, info = traces[-2 if stream else -1]
+            self.assertEqual(event, 'response')
+            self.assertTrue(info.pop('elapsed') >= 0)
+            timings = info.pop('timings')
+            self.assertEqual('receive' in timings, not stream)
+            self.assertEqual(info, dict(
+                method='GET', url='http://ok/', status=FakeResp.status,
+                size=None if stream else len(FakeResp.READ), retries=0))
+        event, info = traces[-1]
+        self.assertTrue(info.pop('elapsed') >= 0)
+        self.assertEqual((event, info), ('stream', dict(
+            method='GET', url='http://ok/', size=len(FakeResp.READ))))
+
+        perform.side_effect = ValueError('f41l')
+        rm = ResponseManager(RequestManager('GET', 'http://ok', '/'))
+        rm.TRACER = tracer
+        self.assertRaises(ValueError, rm._get_response)
+        self.assertEqual(traces[-1][0], 'error')
+        self.assertEqual('%s' % traces[-1][1]['error'], 'f41l')
+
     @patch('kamaki.clients.RequestManager.perform', return_value=FakeResp())
     def test_all(self, perform):
         self.assertEqual(self.RM.content, FakeResp.READ)
@@ -269,6 +412,162 @@ class SilentEvent(TestCase):
                 self.assertFalse(t.exception)
 
 
+class WorkerPool(TestCase):
+
+    def setUp(self):
+        from kamaki.clients import WorkerPool
+        self.WP = WorkerPool
+
+    def test___init__(self):
+        for faulty in (-1, 0, 0.5, 'a string', {}):
+            self.assertRaises(AssertionError, self.WP, faulty)
+        pool = self.WP(3)
+        self.assertEqual(pool.size, 3)
+        self.assertEqual(pool.pending, 0)
+        self.assertEqual(pool.workers, 0)
+
+    def test_submit(self):
+        pool = self.WP(2)
+        events = [pool.submit(lambda x: 2 * x, i) for i in range(10)]
+        for i, event in enumerate(events):
+            event.join()
+            self.assertFalse(event.isAlive())
+            self.assertFalse(event.exception)
+            self.assertEqual(event.value, 2 * i)
+        self.assertTrue(pool.workers <= 2)
+
+        def fail(x):
+            raise Exception('Some exception')
+
+        event = pool.submit(fail, 42)
+        event.join()
+        self.assertTrue(isinstance(event.exception, Exception))
+        self.assertEqual(event.args, (42, ))
+
+    def test_bounded(self):
+        from threading import Lock
+        pool, lock = self.WP(3), Lock()
+        self.running, self.max_running = 0, 0
+
+        def count():
+            with lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            sleep(0.02)
+            with lock:
+                self.running -= 1
+
+        for i in range(12):
+            pool.submit(count)
+            self.assertTrue(pool.pending <= 3)
+        pool.join()
+        self.assertEqual(pool.pending, 0)
+        self.assertTrue(0 < self.max_running <= 3)
+
+    def test_resize(self):
+        pool = self.WP(1)
+        self.assertRaises(AssertionError, pool.resize, 0)
+        pool.resize(4)
+        self.assertEqual(pool.size, 4)
+
+    def test_client_worker_pool(self):
+        from kamaki.clients import Client
+        client = Client('http://example.com/v1', 's0m370k3n==')
+        pool = client.worker_pool
+        self.assertTrue(isinstance(pool, self.WP))
+        self.assertEqual(pool.size, client.concurrency.window)
+        client.MAX_THREADS = 7
+        client.concurrency.window = 5
+        self.assertEqual(pool, client.worker_pool)
+        self.assertEqual(pool.size, 5)
+        client.concurrency.window = 42
+        self.assertEqual(client.worker_pool.size, 7)
+
+    def test_idle_timeout(self):
+        pool = self.WP(2, idle_timeout=0.05)
+        pool.submit(sleep, 0.01).join()
+        wait = 0.1
+        while pool.workers and wait < 4:
+            sleep(wait)
+            wait *= 2
+        self.assertEqual(pool.workers, 0)
+
+
+class ConcurrencyController(TestCase):
+
+    def setUp(self):
+        from kamaki.clients import ConcurrencyController, AIMDController
+        self.CC, self.AIMD = ConcurrencyController, AIMDController
+
+    def _round(self, controller, nbytes, failed=False):
+        for i in range(controller.window):
+            controller.record(nbytes, 0.01, failed)
+
+    def test___init__(self):
+        self.assertRaises(AssertionError, self.CC, 0)
+        self.assertRaises(AssertionError, self.CC, 2, 3)
+        cc = self.CC(8)
+        self.assertEqual(cc.window, 8)
+        self.assertEqual(self.CC(8, window=42).window, 8)
+        self.assertEqual(self.AIMD(8).window, 1)
+
+    def test_window(self):
+        cc = self.CC(8, 2)
+        for window, exp in ((1, 2), (5, 5), (9, 8)):
+            cc.window = window
+            self.assertEqual(cc.window, exp)
+        cc.max_window = 4
+        self.assertEqual(cc.window, 4)
+
+    def test_record(self):
+        cc = self.CC(4)
+        for i in range(3):
+            cc.record(100, 0.1)
+        self.assertEqual(cc.throughput, 0.0)
+        cc.record(100, 0.1, failed=True)
+        self.assertEqual(cc.transfers, 4)
+        self.assertEqual(cc.errors, 1)
+        self.assertEqual(cc.transferred_bytes, 400)
+        self.assertEqual(cc.error_rate, 0.25)
+        self.assertTrue(cc.throughput > 0)
+        self.assertEqual(cc.window, 4)
+
+    def test_aimd(self):
+        #  Wall clock throughput may vary, ignore drops until tested
+        aimd = self.AIMD(16, tolerance=1.0)
+        for exp in (2, 4, 8, 16, 16):
+            self._round(aimd, 1024 * 1024)
+            self.assertEqual(aimd.window, exp)
+        self._round(aimd, 1024, failed=True)
+        self.assertEqual(aimd.window, 8)
+        aimd._last_throughput = 0
+        self._round(aimd, 1024 * 1024)
+        self.assertEqual(aimd.window, 9)
+        aimd._last_throughput, aimd.tolerance = 1e12, 0.1
+        self._round(aimd, 1024)
+        self.assertEqual(aimd.window, 8)
+
+    def test_client_concurrency(self):
+        from kamaki.clients import Client
+        client = Client('http://example.com/v1', 's0m370k3n==')
+        client.MAX_THREADS = 6
+        self.assertEqual(type(client.concurrency), self.CC)
+        self.assertEqual(client.concurrency.window, 6)
+        client.concurrency = self.AIMD(client.MAX_THREADS)
+        self.assertEqual(client.worker_pool.size, 1)
+
+    def test__response_size(self):
+        from kamaki.clients import _response_size, ResponseManager
+        rm = ResponseManager(None, stream=True)
+        rm._request_performed, rm._response = True, 'unread'
+        rm._headers = {'content-length': '42'}
+        self.assertEqual(_response_size(rm), 42)
+        self.assertEqual(rm._response, 'unread')
+        rm.streamed_bytes = 24
+        self.assertEqual(_response_size(rm), 24)
+        self.assertEqual(_response_size(FR()), 0)
+
+
 class FR(object):
     json = None
     text = None
@@ -36,6 +36,8 @@ import httplib
 import socket
 import ssl
 import os.path
+from time import time
+from threading import Lock, Thread
 from objpool import http
 
 log = logging.getLogger(__name__)
@@ -53,6 +55,8 @@ class HTTPSClientAuthConnection(httplib.HTTPSConnection):
     """HTTPS connection, with full client-based SSL Authentication support"""
 
     ca_file, ignore_ssl = None, False
+    #  Seconds spent on the last connect, as dict(connect=..., tls=...)
+    timings = None
 
     def __init__(self, *args, **kwargs):
         """ Extent HTTPSConnection to support SSL authentication
@@ -81,11 +85,14 @@ class HTTPSClientAuthConnection(httplib.HTTPSConnection):
         source_address = getattr(self, 'source_address', None)
         socket_args = [(self.host, self.port), self.timeout] + (
             [source_address, ] if source_address else [])
+        start = time()
         sock = socket.create_connection(*socket_args)
         if self._tunnel_host:
             self.sock = sock
             self._tunnel()
+        self.timings = dict(connect=time() - start)
 
+        start = time()
         try:
             if self.ignore_ssl:
                 self.sock = ssl.wrap_socket(
@@ -112,10 +119,183 @@ class HTTPSClientAuthConnection(httplib.HTTPSConnection):
                             'SSL cred. file %s does not exist (IOError:%s)' % (
                                 f, ioe))
             raise
+        self.timings['tls'] = time() - start
 
 
 http.HTTPConnectionPool._scheme_to_class['https'] = HTTPSClientAuthConnection
-PooledHTTPConnection = http.PooledHTTPConnection
+
+IDLE_TIMEOUT = 30.0  # seconds a pooled connection may stay open unused
+_pools, _pools_lock = dict(), Lock()
+
+
+class HTTPConnectionPool(http.HTTPConnectionPool):
+    """The connection pool of a host, with idle connection eviction,
+    resizing, prewarming and reuse counters
+
+    An acquired connection counts as a hit if it is still connected (kept
+    alive) and as a miss if it has to connect first.
+    """
+
+    idle_timeout = IDLE_TIMEOUT
+
+    def __init__(self, scheme, netloc, size=None):
+        super(HTTPConnectionPool, self).__init__(scheme, netloc, size=size)
+        self.hits, self.misses, self.evictions = 0, 0, 0
+        self._busy, self._retire = 0, 0
+
+    def _idle(self, conn, now):
+        return conn.sock is not None and (
+            now - getattr(conn, '_pool_idle_since', now) > self.idle_timeout)
+
+    def _pool_verify(self, conn):
+        if not super(HTTPConnectionPool, self)._pool_verify(conn):
+            if conn is not None:
+                conn.close()
+                with self._mutex:
+                    self.evictions += 1
+            return False
+        evicted = self._idle(conn, time())
+        if evicted:
+            conn.close()
+        with self._mutex:
+            self.evictions += 1 if evicted else 0
+            if conn.sock is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return True
+
+    def _pool_cleanup(self, conn):
+        closed = super(HTTPConnectionPool, self)._pool_cleanup(conn)
+        if not closed:
+            conn._pool_idle_since = time()
+        return closed
+
+    def pool_get(self, *args, **kwargs):
+        conn = super(HTTPConnectionPool, self).pool_get(*args, **kwargs)
+        with self._mutex:
+            self._busy += 1
+        return conn
+
+    def pool_put(self, conn):
+        with self._mutex:
+            self._busy -= 1
+            retire, self._retire = self._retire > 0, max(self._retire - 1, 0)
+        if not retire:
+            return super(HTTPConnectionPool, self).pool_put(conn)
+        #  Shrinking: keep the allocation, drop the connection
+        if conn is not None:
+            conn.close()
+
+    def resize(self, size):
+        """Change the maximum number of connections to the host. When
+        shrinking below the connections in use, the excess connections are
+        dropped as they are released"""
+        assert int(size) > 0, 'Invalid pool size %s' % size
+        with self._mutex:
+            delta, self.size = int(size) - self.size, int(size)
+            while delta < 0 and self._semaphore.acquire(False):
+                delta += 1
+            self._retire -= min(delta, 0)
+            while delta > 0 and self._retire:
+                delta, self._retire = delta - 1, self._retire - 1
+        for i in range(max(delta, 0)):
+            self._semaphore.release()
+
+    def evict_idle(self):
+        """Close the pooled connections that are idle for too long
+
+        :returns: (int) the number of connections closed
+        """
+        now, evicted = time(), 0
+        with self._mutex:
+            for conn in self._set:
+                if self._idle(conn, now):
+                    conn.close()
+                    evicted += 1
+            self.evictions += evicted
+        return evicted
+
+    def prewarm(self, count, timeout=None):
+        """Connect in the background, so that count connections (in use or
+        idle) are available, up to the pool size
+
+        :param timeout: (float) the connect timeout in seconds
+
+        :returns: (list) the (daemon) threads that open the connections
+        """
+        with self._mutex:
+            ready = self._busy + len(
+                [c for c in self._set if c.sock is not None])
+            count = min(count, self.size) - ready
+
+        def connect():
+            conn = self._pool_create()
+            conn.timeout = timeout
+            try:
+                conn.connect()
+            except Exception as e:
+                log.debug('Failed to prewarm %s connection: %s' % (
+                    self.netloc, e))
+                return conn.close()
+            conn._pool_idle_since = time()
+            with self._mutex:
+                self._set.add(conn)
+
+        threads = [Thread(target=connect) for i in range(max(count, 0))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        return threads
+
+    def stats(self):
+        """:returns: (dict) size, busy, idle, hits, misses, evictions"""
+        with self._mutex:
+            return dict(
+                size=self.size, busy=self._busy,
+                idle=len([c for c in self._set if c.sock is not None]),
+                hits=self.hits, misses=self.misses, evictions=self.evictions)
+
+
+def get_pool(netloc, scheme='http', size=None):
+    """
+    :param size: (int) grow the pool to this many connections, if smaller.
+        New pools default to objpool.http.default_pool_size
+
+    :returns: (HTTPConnectionPool) the connection pool of a host
+    """
+    with _pools_lock:
+        pool = _pools.get((scheme, netloc))
+        if pool is None:
+            pool = _pools[(scheme, netloc)] = HTTPConnectionPool(
+                scheme, netloc, size=size or http.default_pool_size)
+    if size and size > pool.size:
+        pool.resize(size)
+    return pool
+
+
+def pool_stats():
+    """:returns: (dict) {scheme://netloc: pool stats}"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return dict([
+        ('%s://%s' % key, pool.stats()) for key, pool in pools.items()])
+
+
+def evict_idle():
+    """Close the idle connections of all pools"""
+    with _pools_lock:
+        pools = _pools.values()
+    return sum([pool.evict_idle() for pool in pools])
+
+
+class PooledHTTPConnection(http.PooledHTTPConnection):
+    """A connection from the (managed) pool of its host"""
+
+    def get_pool(self):
+        kwargs = self._pool_kwargs
+        return kwargs.get('pool') or get_pool(
+            kwargs['netloc'], kwargs['scheme'], kwargs.get('size'))
 
 
 def patch_with_certs(ca_file):
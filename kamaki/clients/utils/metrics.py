@@ -0,0 +1,129 @@
+# Copyright 2014-2015 GRNET S.A. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or
+# without modification, are permitted provided that the following
+# conditions are met:
+#
+#   1. Redistributions of source code must retain the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials
+#      provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY GRNET S.A. ``AS IS'' AND ANY EXPRESS
+# OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL GRNET S.A OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF
+# USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and
+# documentation are those of the authors and should not be
+# interpreted as representing official policies, either expressed
+# or implied, of GRNET S.A.
+
+
+from bisect import bisect_left
+from threading import Lock
+from urlparse import urlparse
+
+#  Request phases, as timed by RequestManager.perform and ResponseManager
+PHASES = ('connect', 'tls', 'send', 'wait', 'receive')
+
+
+class MetricsCollector(object):
+    """Aggregate request traces into metrics per endpoint and method
+
+    Set an instance as the TRACER of a client class (e.g., Client.TRACER)
+    to count requests, errors, retries and bytes transferred, add up the
+    time spent on each request phase (connect, tls, send, wait for the
+    first byte, receive) and keep a latency histogram. The endpoint of a
+    request is the scheme://netloc part of its url. Latencies are measured
+    up to the response headers for streamed responses.
+    """
+
+    #  Upper bounds (in seconds) of the histogram buckets, plus an open one
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.metrics = dict()
+        self._lock = Lock()
+
+    def _get(self, info):
+        url = urlparse(info.get('url') or '')
+        key = ('%s://%s' % (url.scheme, url.netloc), info.get('method'))
+        m = self.metrics.get(key)
+        if m is None:
+            m = self.metrics[key] = dict(
+                requests=0, errors=0, retries=0, sent=0, received=0,
+                phases=dict([(phase, 0.0) for phase in PHASES]),
+                histogram=[0] * (len(self.BUCKETS) + 1))
+        return m
+
+    def __call__(self, event, info):
+        with self._lock:
+            m = self._get(info)
+            if event == 'request':
+                m['sent'] += info.get('size') or 0
+            elif event == 'response':
+                m['requests'] += 1
+                m['retries'] += info.get('retries') or 0
+                m['received'] += info.get('size') or 0
+                for phase, seconds in (info.get('timings') or {}).items():
+                    m['phases'][phase] = m['phases'].get(phase, 0) + seconds
+                bucket = bisect_left(self.BUCKETS, info.get('elapsed') or 0)
+                m['histogram'][bucket] += 1
+            elif event == 'stream':
+                m['received'] += info.get('size') or 0
+                m['phases']['receive'] += info.get('elapsed') or 0
+            elif event == 'error':
+                m['errors'] += 1
+
+    def percentile(self, histogram, q):
+        """
+        :param histogram: (list) bucket counts, as in metrics values
+
+        :param q: (float) in (0, 100]
+
+        :returns: (float) the upper bound of the bucket where the q-th
+            percentile falls, None if it is the open bucket or no requests
+        """
+        total, count = sum(histogram), 0
+        for bucket, bucket_count in enumerate(histogram):
+            count += bucket_count
+            if total and count * 100.0 >= total * q:
+                return self.BUCKETS[bucket] if (
+                    bucket < len(self.BUCKETS)) else None
+        return None
+
+    def summary(self):
+        """
+        :returns: (list) of dicts with endpoint, method, requests, errors,
+            retries, sent, received, phases (seconds per phase) and
+            p50/p90/p99 (latency percentile upper bounds), ordered by
+            endpoint and method
+        """
+        with self._lock:
+            items = sorted(self.metrics.items())
+            return [dict(
+                endpoint=endpoint, method=method,
+                requests=m['requests'], errors=m['errors'],
+                retries=m['retries'], sent=m['sent'],
+                received=m['received'], phases=dict(m['phases']),
+                p50=self.percentile(m['histogram'], 50),
+                p90=self.percentile(m['histogram'], 90),
+                p99=self.percentile(m['histogram'], 99)) for (
+                    endpoint, method), m in items]
+
+    def reset(self):
+        with self._lock:
+            self.metrics = dict()
@@ -157,7 +157,98 @@ class Utils(TestCase):
                 esc_str = word1 + esc_char + word2
                 self.assertEqual(utils.escape_ctrl_chars(orig_str), esc_str)
 
+
+class MetricsCollector(TestCase):
+
+    def test_call(self):
+        from kamaki.clients.utils.metrics import MetricsCollector
+        mc, url = MetricsCollector(), 'https://example.com/v1/a/c'
+        mc('request', dict(method='PUT', url=url, size=10))
+        mc('error', dict(method='PUT', url=url, error=Exception()))
+        mc('response', dict(
+            method='PUT', url=url, status=201, size=2, elapsed=0.2,
+            retries=1, timings=dict(connect=0.1, send=0.05, wait=0.05)))
+        mc('response', dict(
+            method='GET', url=url + '/o', status=200, size=None,
+            elapsed=20.0, retries=0, timings=dict(wait=1.0)))
+        mc('stream', dict(method='GET', url=url, size=100, elapsed=2.0))
+        put, get = mc.metrics[('https://example.com', 'PUT')], mc.metrics[
+            ('https://example.com', 'GET')]
+        self.assertEqual(
+            (put['requests'], put['errors'], put['retries']), (1, 1, 1))
+        self.assertEqual((put['sent'], put['received']), (10, 2))
+        self.assertEqual(put['phases']['connect'], 0.1)
+        self.assertEqual(put['histogram'][mc.BUCKETS.index(0.25)], 1)
+        self.assertEqual((get['received'], get['histogram'][-1]), (100, 1))
+        self.assertEqual(get['phases']['receive'], 2.0)
+
+        summary = mc.summary()
+        self.assertEqual(
+            [(m['method'], m['p50']) for m in summary],
+            [('GET', None), ('PUT', 0.25)])
+        mc.reset()
+        self.assertEqual(mc.summary(), [])
+
+    def test_percentile(self):
+        from kamaki.clients.utils.metrics import MetricsCollector
+        mc = MetricsCollector()
+        histogram = [0] * (len(mc.BUCKETS) + 1)
+        self.assertEqual(mc.percentile(histogram, 50), None)
+        histogram[0], histogram[3] = 9, 1
+        self.assertEqual(mc.percentile(histogram, 50), mc.BUCKETS[0])
+        self.assertEqual(mc.percentile(histogram, 90), mc.BUCKETS[0])
+        self.assertEqual(mc.percentile(histogram, 99), mc.BUCKETS[3])
+
+
+class ConnectionPool(TestCase):
+
+    def test_pool(self):
+        from socket import socketpair
+        from kamaki.clients.utils.https import HTTPConnectionPool
+        pool = HTTPConnectionPool('http', 'example.com', size=2)
+        conn = pool.pool_get()
+        self.assertEqual((pool.misses, pool.hits), (1, 0))
+        conn.sock, peer = socketpair()
+        pool.pool_put(conn)
+        self.assertEqual(pool.stats(), dict(
+            size=2, busy=0, idle=1, hits=0, misses=1, evictions=0))
+        self.assertEqual(pool.pool_get(), conn)
+        self.assertEqual((pool.misses, pool.hits), (1, 1))
+        pool.pool_put(conn)
+
+        self.assertEqual(pool.evict_idle(), 0)
+        conn._pool_idle_since -= 2 * pool.idle_timeout
+        self.assertEqual(pool.evict_idle(), 1)
+        self.assertEqual(conn.sock, None)
+        peer.close()
+
+        pool.resize(1)
+        conn = pool.pool_get()
+        self.assertRaises(Exception, pool.pool_get, blocking=False)
+        pool.pool_put(conn)
+        pool.resize(3)
+        conns = [pool.pool_get(blocking=False) for i in range(3)]
+        self.assertEqual(pool.stats()['busy'], 3)
+        for conn in conns:
+            pool.pool_put(conn)
+
+    def test_get_pool(self):
+        from kamaki.clients.utils import https
+        pool = https.get_pool('example.org:8080', 'https', size=2)
+        self.assertEqual(https.get_pool('example.org:8080', 'https'), pool)
+        self.assertEqual(https.get_pool(
+            'example.org:8080', 'https', size=4).size, 4)
+        self.assertEqual(https.get_pool(
+            'example.org:8080', 'https', size=3).size, 4)
+        self.assertEqual(
+            https.pool_stats()['https://example.org:8080'], pool.stats())
+        pooled = https.PooledHTTPConnection('example.org:8080', 'https')
+        self.assertEqual(pooled.get_pool(), pool)
+
+
 if __name__ == '__main__':
     from sys import argv
     from kamaki.clients.test import runTestCase
     runTestCase(Utils, 'clients.utils methods', argv[1:])
+    runTestCase(MetricsCollector, 'clients.utils.metrics', argv[1:])
+    runTestCase(ConnectionPool, 'clients.utils.https pools', argv[1:])
@@ -0,0 +1,133 @@
+# Copyright 2011-2015 GRNET S.A. All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or
+# without modification, are permitted provided that the following
+# conditions are met:
+#
+#   1. Redistributions of source code must retain the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer.
+#
+#   2. Redistributions in binary form must reproduce the above
+#      copyright notice, this list of conditions and the following
+#      disclaimer in the documentation and/or other materials
+#      provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY GRNET S.A. ``AS IS'' AND ANY EXPRESS
+# OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+# PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL GRNET S.A OR
+# CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF
+# USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED
+# AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT
+# LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN
+# ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and
+# documentation are those of the authors and should not be
+# interpreted as representing official policies, either expressed
+# or implied, of GRNET S.A.
+
+"""Protocol and thin front end of the kamaki daemon (kamaki.cli.daemon)
+
+This module is imported by every kamaki-client invocation, so it must not
+import anything from kamaki.cli or kamaki.clients.
+
+A client connects to the UNIX socket of the daemon and sends a sequence of
+chunks, i.e., (type, payload) pairs: one ARG chunk per command line term,
+one ENV chunk per environment variable, a CWD chunk and a RUN chunk. Then,
+it forwards its standard input in STDIN chunks (an empty one for EOF),
+while the daemon replies with STDOUT and STDERR chunks and, finally, an
+EXIT chunk with the exit status of the command.
+"""
+
+import os
+import socket
+from struct import Struct
+from sys import argv, exit, stderr
+from threading import Thread
+
+SOCKET_ENV = 'KAMAKI_SOCKET'
+SOCKET_PATH = os.path.expanduser('~/.kamaki.sock')
+
+ARG, ENV, CWD, RUN = 'A', 'V', 'D', 'R'
+STDIN, STDOUT, STDERR, EXIT = '0', '1', '2', 'X'
+BUFFER_SIZE = 64 * 1024
+
+_header = Struct('!cI')
+
+
+def socket_path():
+    """:returns: (str) the daemon socket path, from $KAMAKI_SOCKET if set"""
+    return os.path.expanduser(os.environ.get(SOCKET_ENV) or SOCKET_PATH)
+
+
+def send_chunk(sock, chunk_type, payload=''):
+    sock.sendall(_header.pack(chunk_type, len(payload)) + payload)
+
+
+def _recv_all(sock, size):
+    buf = ''
+    while len(buf) < size:
+        data = sock.recv(size - len(buf))
+        if not data:
+            raise EOFError('Connection closed')
+        buf += data
+    return buf
+
+
+def recv_chunk(sock):
+    """:returns: (chunk type, payload)
+    :raises EOFError: if the connection is closed
+    """
+    chunk_type, size = _header.unpack(_recv_all(sock, _header.size))
+    return chunk_type, _recv_all(sock, size) if size else ''
+
+
+def _forward_stdin(sock):
+    try:
+        while True:
+            data = os.read(0, BUFFER_SIZE)
+            send_chunk(sock, STDIN, data)
+            if not data:
+                break
+    except (OSError, socket.error):
+        pass
+
+
+def run_client():
+    """Run a kamaki command through the daemon, or in-process if there is
+    no daemon listening on the socket"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path())
+    except socket.error:
+        sock.close()
+        from kamaki.cli import run_one_cmd
+        return run_one_cmd()
+    for term in ['kamaki'] + argv[1:]:
+        send_chunk(sock, ARG, term)
+    for item in os.environ.items():
+        send_chunk(sock, ENV, '%s=%s' % item)
+    send_chunk(sock, CWD, os.getcwd())
+    send_chunk(sock, RUN)
+
+    t = Thread(target=_forward_stdin, args=(sock, ))
+    t.daemon = True
+    t.start()
+    outputs = {STDOUT: 1, STDERR: 2}
+    try:
+        while True:
+            chunk_type, payload = recv_chunk(sock)
+            if chunk_type == EXIT:
+                exit(int(payload))
+            os.write(outputs[chunk_type], payload)
+    except (EOFError, KeyError, ValueError, socket.error) as e:
+        stderr.write('Lost connection to kamaki daemon (%s)\n' % e)
+        exit(1)
+    except KeyboardInterrupt:
+        stderr.write('Canceled by user\n')
+        exit(1)
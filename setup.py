@@ -96,7 +96,9 @@ setup(
     entry_points={
         'console_scripts': [
             'kamaki = kamaki.cli:run_one_cmd',
-            'kamaki-shell = kamaki.cli:run_shell'
+            'kamaki-shell = kamaki.cli:run_shell',
+            'kamaki-daemon = kamaki.cli.daemon:run_daemon',
+            'kamaki-client = kamaki.daemon:run_client'
         ]
     },
     install_requires=requires